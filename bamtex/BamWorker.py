@@ -0,0 +1,70 @@
+from PyQt5.QtCore import QThread, pyqtSignal
+from .MappedBamFile import MappedBamFile
+from .Texture import Texture
+from . import Profiler
+import os, traceback
+
+class Cancelled(Exception):
+    pass
+
+def loadBamFile(progress, filename):
+    bam = MappedBamFile()
+    bam.progress_callback = progress
+
+    with Profiler.span('load', file=os.path.basename(filename)) as span, open(filename, 'rb') as f:
+        bam.load(f)
+        span.set(objects=len(bam.object_map), bytes=len(bam.view))
+
+    bam.progress_callback = None
+
+    with Profiler.span('scan') as span:
+        textures = [texture for texture in bam.object_map.values() if isinstance(texture, Texture)]
+        span.set(textures=len(textures))
+
+    with Profiler.span('sort', textures=len(textures)):
+        textures.sort(key=lambda tex: tex.filename or tex.name)
+
+    return bam, textures
+
+def writeBamFile(progress, snapshot, filename):
+    snapshot.progress_callback = progress
+
+    with Profiler.span('write', file=os.path.basename(filename), changes=len(snapshot.changes or ())):
+        return snapshot.write_temp_file(filename, snapshot.changes)
+
+class BamWorker(QThread):
+    progress = pyqtSignal(int)
+    done = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, function, *args):
+        QThread.__init__(self)
+        self.function = function
+        self.args = args
+        self.cancelRequested = False
+        self.percent = -1
+
+    def cancel(self):
+        self.cancelRequested = True
+
+    def reportProgress(self, done, total):
+        if self.cancelRequested:
+            raise Cancelled()
+
+        percent = min(int(done * 100 / total), 100) if total else 100
+
+        # Only cross the thread boundary when the bar actually moves
+        if percent != self.percent:
+            self.percent = percent
+            self.progress.emit(percent)
+
+    def run(self):
+        try:
+            result = self.function(self.reportProgress, *self.args)
+        except Cancelled:
+            # finished alone restores the window, there is nothing to report
+            pass
+        except:
+            self.failed.emit(traceback.format_exc())
+        else:
+            self.done.emit(result)
@@ -0,0 +1,236 @@
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from panda3d.core import Texture as P3Texture
+from p3bamboo.BamFactory import BamFactory
+from .MappedBamFile import MappedBamFile
+from .OptionGlobals import *
+from .Texture import Texture
+from . import Globals
+import fnmatch, itertools, os, struct, time
+
+# Items submitted ahead per worker, so results never pile up in memory
+PENDING_PER_WORKER = 4
+
+FLOAT32 = struct.Struct('<f')
+COLOR32 = struct.Struct('<4f')
+
+# Fields that are only written when other fields of the texture call for them,
+# as guard(getField) over the values the texture will be saved with
+GUARDS = {
+    'usage_hint': lambda getField: getField('texture_type') == P3Texture.TT_buffer_texture,
+    'simple_x_size': lambda getField: getField('has_simple_ram_image'),
+    'simple_y_size': lambda getField: getField('has_simple_ram_image'),
+    'simple_image_date_generated': lambda getField: getField('has_simple_ram_image'),
+    'simple_ram_image': lambda getField: getField('has_simple_ram_image'),
+    'clear_color': lambda getField: getField('has_clear_color')
+}
+
+def registerTypes():
+    Texture.zero_copy = True
+
+    if 'Texture' not in BamFactory.types:
+        BamFactory.register_type('Texture', Texture)
+
+OPTIONS = {option.field: option for _, options in Globals.TextureFields for option in options}
+
+def findOption(field):
+    return OPTIONS.get(field)
+
+def parseVersion(text):
+    major, _, minor = text.partition('.')
+    return (int(major), int(minor or 0))
+
+def parseAssignments(assignments):
+    values = {}
+
+    for assignment in assignments:
+        field, sep, text = assignment.partition('=')
+        field = field.strip()
+
+        if not sep:
+            raise ValueError(f'Expected field=value, got "{assignment}".')
+
+        option = findOption(field)
+
+        if option is None:
+            raise ValueError(f'Unknown texture field "{field}".')
+
+        try:
+            values[field] = option.parseText(text.strip())
+        except ValueError as e:
+            raise ValueError(f'{field}: {e}')
+
+    return values
+
+def storesVersion(option, version):
+    """
+    Returns whether files of a bam version store the field of option at all.
+    """
+    return option.bam_version is None or version >= option.bam_version
+
+def storesField(option, getField):
+    """
+    Returns whether a datagram stores the optional field of option, reading the
+    fields that guard it through getField. getField may return NumPy columns,
+    in which case so does this.
+    """
+    guard = GUARDS.get(option.field)
+    return True if guard is None else guard(getField)
+
+def isStored(option, texture, values=None):
+    """
+    Returns whether the datagram of texture stores the field of option once
+    values are assigned to it.
+    """
+    values = values or {}
+    return storesVersion(option, texture.bam_version) and storesField(option, lambda field: values[field] if field in values else getattr(texture, field))
+
+def toStored(option, value, stdfloatDouble):
+    """
+    Returns value as it reads back once encoded: floats are single precision
+    unless the file stores doubles, and colors always are.
+    """
+    if option.field_type == FLOAT:
+        return float(value) if stdfloatDouble else FLOAT32.unpack(FLOAT32.pack(value))[0]
+    elif option.field_type == COLOR:
+        return COLOR32.unpack(COLOR32.pack(value[0], value[1], value[2], value[3]))
+    elif option.field_type == BLOB:
+        return bytes(value)
+    elif option.field_type == BOOL:
+        return bool(value)
+
+    return value
+
+def assignFields(texture, values, formatted=False):
+    """
+    Assigns values to texture and marks it dirty if it changed.
+    Fields its datagram does not store are skipped, and so are values that read
+    back the same as the current ones once encoded, or once formatted as they
+    are exported if formatted is set.
+    Returns (changed, skipped fields).
+    """
+    stdfloatDouble = texture.bam_file.stdfloat_double
+    changed = False
+    skipped = []
+
+    for field, value in values.items():
+        option = OPTIONS[field]
+
+        if not isStored(option, texture, values):
+            skipped.append(field)
+            continue
+
+        current = getattr(texture, field)
+
+        if toStored(option, current, stdfloatDouble) == toStored(option, value, stdfloatDouble):
+            continue
+
+        if formatted and option.formatValue(current) == option.formatValue(value):
+            continue
+
+        setattr(texture, field, value)
+        changed = True
+
+    if changed:
+        texture.dirty = True
+
+    return changed, skipped
+
+def findBamFiles(paths):
+    # Checked before anything is yielded, so a typo fails the command up front
+    for path in paths:
+        if not os.path.exists(path):
+            raise ValueError(f'{path} does not exist.')
+
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+
+            for filename in sorted(files):
+                if filename.lower().endswith('.bam'):
+                    yield os.path.join(root, filename)
+
+def loadBamFile(filename):
+    bam = MappedBamFile()
+
+    with open(filename, 'rb') as f:
+        bam.load(f)
+
+    return bam
+
+def saveBamFile(bam, filename):
+    # Only dirty textures are re-encoded, everything else is copied verbatim
+    tempFilename, _ = bam.write_temp_file(filename, bam.get_changes())
+    bam.release()
+    os.replace(tempFilename, filename)
+
+def getTextures(bam):
+    return [obj for obj in bam.object_map.values() if isinstance(obj, Texture)]
+
+class TextureFilter(object):
+
+    def __init__(self, names=None, versions=None):
+        self.names = names or []
+        self.versions = versions or []
+
+    def matchesFile(self, bam):
+        return not self.versions or bam.version in self.versions
+
+    def matches(self, texture):
+        if not self.names:
+            return True
+
+        return any(fnmatch.fnmatch(texture.filename, name) or fnmatch.fnmatch(texture.name, name) for name in self.names)
+
+def addFilterArguments(parser):
+    parser.add_argument('--name', action='append', default=[], metavar='GLOB', help='only touch textures whose filename or name matches GLOB')
+    parser.add_argument('--bam-version', action='append', default=[], type=parseVersion, metavar='X.Y', help='only touch files with this bam version')
+
+def addPoolArguments(parser):
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='number of worker processes (default: core count)')
+
+def runInPool(function, items, jobs, *args, ordered=False):
+    """
+    Runs function(item, *args) in a process pool, yielding results as they complete,
+    or in the order of items if ordered is set.
+    Only a few items per worker are in flight at once, and each result is dropped
+    once it is yielded, so memory does not grow with the number of items.
+    """
+    items = iter(items)
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=registerTypes) as executor:
+        window = (jobs or os.cpu_count() or 1) * PENDING_PER_WORKER
+        pending = deque(executor.submit(function, item, *args) for item in itertools.islice(items, window))
+
+        while pending:
+            if ordered:
+                future = pending.popleft()
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                future = done.pop()
+                pending.remove(future)
+
+            for item in itertools.islice(items, 1):
+                pending.append(executor.submit(function, item, *args))
+
+            yield future.result()
+
+class Throughput(object):
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.files = 0
+        self.bytes = 0
+
+    def add(self, size):
+        self.files += 1
+        self.bytes += size
+
+    def summary(self):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        megabytes = self.bytes / (1024 * 1024)
+        return f'{self.files} files, {megabytes:.1f} MB in {elapsed:.2f}s ({self.files / elapsed:.1f} files/s, {megabytes / elapsed:.1f} MB/s)'
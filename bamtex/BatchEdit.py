@@ -0,0 +1,67 @@
+from . import Batch
+import os, time, traceback
+
+"""
+  Headless batch editing of texture fields across whole asset trees.
+
+  python -m bamtex batch phase_3/ "minfilter=Mipmap Trilinear" anisotropic_degree=4 --name "*maps/gui/*"
+"""
+
+def editFile(filename, values, textureFilter, dryRun):
+    start = time.perf_counter()
+    result = {'filename': filename, 'size': os.path.getsize(filename), 'changed': 0, 'skipped': [], 'error': None}
+
+    try:
+        bam = Batch.loadBamFile(filename)
+
+        if textureFilter.matchesFile(bam):
+            result['version'] = '%d.%d' % bam.version
+
+            for texture in Batch.getTextures(bam):
+                if not textureFilter.matches(texture):
+                    continue
+
+                # Fields the texture does not store would be dropped on save
+                changed, skipped = Batch.assignFields(texture, values)
+                result['skipped'].extend(field for field in skipped if field not in result['skipped'])
+
+                if changed:
+                    result['changed'] += 1
+
+        if result['changed'] and not dryRun:
+            Batch.saveBamFile(bam, filename)
+    except Exception:
+        result['error'] = traceback.format_exc()
+
+    result['time'] = time.perf_counter() - start
+    return result
+
+def addArguments(parser):
+    parser.add_argument('path', help='BAM file or directory tree to edit')
+    parser.add_argument('assignments', nargs='+', metavar='field=value', help='texture fields to assign; enums may be given by name')
+    parser.add_argument('-n', '--dry-run', action='store_true', help='report what would change without writing')
+    Batch.addFilterArguments(parser)
+    Batch.addPoolArguments(parser)
+
+def run(args):
+    values = Batch.parseAssignments(args.assignments)
+    textureFilter = Batch.TextureFilter(args.name, args.bam_version)
+    files = list(Batch.findBamFiles([args.path]))
+    throughput = Batch.Throughput()
+    failed = 0
+
+    for result in Batch.runInPool(editFile, files, args.jobs, values, textureFilter, args.dry_run):
+        throughput.add(result['size'])
+
+        if result['error']:
+            failed += 1
+            print(f'{result["filename"]}: FAILED in {result["time"] * 1000:.1f}ms\n{result["error"]}')
+            continue
+
+        print(f'{result["filename"]}: {result["changed"]} textures changed in {result["time"] * 1000:.1f}ms')
+
+        if result['skipped']:
+            print(f'{result["filename"]}: {", ".join(result["skipped"])} not stored by some textures of this bam {result["version"]} file, skipped')
+
+    print(throughput.summary())
+    return 1 if failed else 0
@@ -0,0 +1,243 @@
+from concurrent.futures import ProcessPoolExecutor
+from .OpenBenchmark import getPeakRss
+from .SyntheticBam import generateBamFile
+from . import Batch
+import io, json, os, platform, sys, tempfile, time
+
+"""
+  Benchmarks the load, save and GUI paths on synthetic BAM files, and compares
+  the results with a JSON baseline from an earlier run.
+
+  python -m bamtex benchmark --save          # record a baseline
+  python -m bamtex benchmark                 # compare against it
+"""
+
+DEFAULT_BASELINE = 'benchmark.json'
+
+DEFAULT_VERSIONS = ['6.14', '6.45']
+
+# Stages measured in a fresh process each, so peak RSS is not shared between them
+STAGES = ['parse', 'write', 'roundtrip', 'gui']
+
+def loadFile(filename):
+    bam = Batch.loadBamFile(filename)
+    return bam, Batch.getTextures(bam)
+
+def prepareParse(filename):
+    return lambda: loadFile(filename)
+
+def prepareWrite(filename):
+    # Every texture is re-encoded, through the same incremental path as a save
+    bam, textures = loadFile(filename)
+
+    for texture in textures:
+        texture.dirty = True
+
+    def write():
+        f = io.BytesIO()
+        bam.write_changes(f, bam.get_changes())
+        return f
+
+    return write
+
+def prepareRoundTrip(filename):
+    def roundTrip():
+        bam, textures = loadFile(filename)
+
+        for texture in textures:
+            texture.dirty = True
+
+        tempFilename, _ = bam.write_temp_file(filename, bam.get_changes())
+
+        try:
+            loadFile(tempFilename)
+
+            with open(filename, 'rb') as original, open(tempFilename, 'rb') as written:
+                if original.read() != written.read():
+                    raise ValueError(f'{filename} did not round trip byte for byte.')
+        finally:
+            os.remove(tempFilename)
+
+    return roundTrip
+
+def measureGui(filename):
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+    from PyQt5.QtWidgets import QApplication
+    from .MainWidget import MainWidget
+
+    app = QApplication.instance() or QApplication([])
+    widget = MainWidget(None)
+    widget.show()
+    app.processEvents()
+
+    populateTimes = []
+    bamLoaded = widget.bamLoaded
+
+    def timedBamLoaded(result):
+        start = time.perf_counter()
+        bamLoaded(result)
+        populateTimes.append(time.perf_counter() - start)
+
+    # startWorker() connects whatever bamLoaded is at the time
+    widget.bamLoaded = timedBamLoaded
+    start = time.perf_counter()
+    widget.openFile(filename)
+
+    while widget.worker is not None:
+        app.processEvents()
+
+    app.processEvents()
+    elapsed = time.perf_counter() - start
+
+    if not populateTimes:
+        raise ValueError(f'The editor could not open {filename}.')
+
+    widget.close()
+    return elapsed, populateTimes[0]
+
+# Each returns the operation a stage times, with its setup already done.
+# The pytest-benchmark suite in tests/ times the same operations.
+PREPARERS = {
+    'parse': prepareParse,
+    'write': prepareWrite,
+    'roundtrip': prepareRoundTrip
+}
+
+def measureStage(stage, filename):
+    if stage == 'gui':
+        return measureGui(filename)
+
+    function = PREPARERS[stage](filename)
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+def measure(stage, filename):
+    Batch.registerTypes()
+    baseline = getPeakRss()
+    result = measureStage(stage, filename)
+    peak = getPeakRss()
+    return result, None if peak is None else peak - baseline
+
+def runStage(stage, filename, repeat):
+    """
+    Returns the best of repeat runs of stage on filename, each in a fresh process.
+    """
+    best = None
+
+    for _ in range(repeat):
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            result, peak = executor.submit(measure, stage, filename).result()
+
+        seconds, populate = result if isinstance(result, tuple) else (result, None)
+
+        if best is None or seconds < best['seconds']:
+            best = {'seconds': seconds, 'peak_rss': peak}
+
+            if populate is not None:
+                best['populate_seconds'] = populate
+
+    return best
+
+def runBenchmarks(args, directory):
+    results = {}
+
+    for text in args.versions:
+        version = Batch.parseVersion(text)
+        filename = os.path.join(directory, f'synthetic_{version[0]}_{version[1]}.bam')
+        generateBamFile(filename, args.count, version, args.simple_size, args.data_size)
+        size = os.path.getsize(filename)
+        entry = results[f'{version[0]}.{version[1]}'] = {'file_size': size}
+
+        for stage in args.stages:
+            result = runStage(stage, filename, args.repeat)
+            result['mb_per_s'] = size / (1024 * 1024) / max(result['seconds'], 1e-9)
+            result['textures_per_s'] = args.count / max(result['seconds'], 1e-9)
+            entry[stage] = result
+
+    return results
+
+def compare(current, baseline, threshold):
+    """
+    Prints how every stage moved against the baseline.
+    Returns the number of stages that got slower by more than threshold percent.
+    """
+    regressions = 0
+
+    for version, stages in current['results'].items():
+        for stage, result in stages.items():
+            if not isinstance(result, dict):
+                continue
+
+            previous = baseline.get('results', {}).get(version, {}).get(stage)
+
+            if not previous:
+                continue
+
+            change = (result['seconds'] / max(previous['seconds'], 1e-9) - 1) * 100
+            flag = ''
+
+            if change > threshold:
+                regressions += 1
+                flag = '  REGRESSION'
+
+            print(f'  {version} {stage}: {previous["seconds"] * 1000:.1f}ms -> {result["seconds"] * 1000:.1f}ms ({change:+.1f}%){flag}')
+
+    return regressions
+
+def formatPeak(peak):
+    return 'n/a' if peak is None else f'{peak / (1024 * 1024):.1f} MB'
+
+def addArguments(parser):
+    parser.add_argument('-n', '--count', type=int, default=5000, help='number of textures per synthetic file')
+    parser.add_argument('--versions', nargs='+', default=DEFAULT_VERSIONS, metavar='X.Y', help=f'bam versions to generate (default: {" ".join(DEFAULT_VERSIONS)})')
+    parser.add_argument('--simple-size', type=int, default=16, help='edge length of each simple RAM image, 0 for none')
+    parser.add_argument('--data-size', type=int, default=4096, help='raw texture data bytes per texture')
+    parser.add_argument('--stages', nargs='+', default=STAGES, choices=STAGES, help='stages to measure')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='number of runs per stage')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help=f'baseline JSON file (default: {DEFAULT_BASELINE})')
+    parser.add_argument('--save', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=10.0, help='percent slowdown reported as a regression')
+
+def run(args):
+    with tempfile.TemporaryDirectory() as directory:
+        results = runBenchmarks(args, directory)
+
+    current = {
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'config': {'count': args.count, 'simple_size': args.simple_size, 'data_size': args.data_size, 'repeat': args.repeat},
+        'results': results
+    }
+
+    for version, stages in results.items():
+        print(f'bam {version}: {args.count} textures, {stages["file_size"] / (1024 * 1024):.1f} MB')
+
+        for stage in args.stages:
+            result = stages[stage]
+            line = f'  {stage}: {result["seconds"] * 1000:.1f}ms, {result["mb_per_s"]:.1f} MB/s, {result["textures_per_s"]:.0f} textures/s, peak RSS growth {formatPeak(result["peak_rss"])}'
+
+            if 'populate_seconds' in result:
+                line += f', list populated in {result["populate_seconds"] * 1000:.1f}ms'
+
+            print(line)
+
+    regressions = 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        if baseline.get('config') != current['config']:
+            print(f'{args.baseline} was recorded with {baseline.get("config")}, results are not comparable.')
+        else:
+            print(f'Compared with {args.baseline}:')
+            regressions = compare(current, baseline, args.threshold)
+
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump(current, f, indent=2)
+
+        print(f'Baseline saved to {args.baseline}.')
+
+    return 1 if regressions and not args.save else 0
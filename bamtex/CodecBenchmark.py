@@ -0,0 +1,123 @@
+from panda3d.core import ATS_unspecified, Geom, LColorf
+from panda3d.core import Texture as P3Texture
+from p3bamboo.BamFile import BamFile
+from p3bamboo.BamGlobals import read_vec4
+from p3bamboo.StructDatagram import StructDatagramIterator
+from .Texture import Texture, extract_payload
+import time
+
+"""
+  Compares the field-by-field Texture decoder with the precompiled struct codec
+  on synthetic texture datagrams for every bam version with a different layout.
+"""
+
+VERSIONS = [(4, 2), (4, 3), (5, 0), (6, 1), (6, 16), (6, 21), (6, 28), (6, 32), (6, 36), (6, 44), (6, 45)]
+
+def legacyLoad(self, di):
+    # The decoder Texture.load used before TextureCodec, kept as the reference
+    self.name = di.get_string()
+    self.filename = di.get_string()
+    self.alpha_filename = di.get_string()
+    self.primary_file_num_channels = di.get_uint8() if self.bam_version >= (4, 2) else 0
+    self.alpha_file_channel = di.get_uint8() if self.bam_version >= (4, 3) else 0
+    self.has_rawdata = di.get_bool()
+    self.texture_type = di.get_uint8()
+    self.has_read_mipmaps = di.get_bool() if self.bam_version >= (6, 32) else False
+    self.wrap_u = di.get_uint8()
+    self.wrap_v = di.get_uint8()
+    self.wrap_w = di.get_uint8()
+    self.minfilter = di.get_uint8()
+    self.magfilter = di.get_uint8()
+    self.anisotropic_degree = di.get_int16()
+    self.border_color = read_vec4(di)
+
+    if self.bam_version >= (6, 36):
+        self.min_lod = self.bam_file.read_stdfloat(di)
+        self.max_lod = self.bam_file.read_stdfloat(di)
+        self.lod_bias = self.bam_file.read_stdfloat(di)
+    else:
+        self.min_lod = -1000
+        self.max_lod = 1000
+        self.lod_bias = 0
+
+    self.compression = di.get_uint8() if self.bam_version >= (6, 1) else P3Texture.CM_default
+    self.quality_level = di.get_uint8() if self.bam_version >= (6, 16) else P3Texture.QL_default
+    self.tex_format = di.get_uint8()
+    self.num_components = di.get_uint8()
+    self.usage_hint = di.get_uint8() if self.texture_type == P3Texture.TT_buffer_texture else Geom.UH_unspecified
+    self.auto_texture_scale = di.get_uint8() if self.bam_version >= (6, 28) else ATS_unspecified
+    self.orig_file_x_size = di.get_uint32()
+    self.orig_file_y_size = di.get_uint32()
+    self.has_simple_ram_image = di.get_bool()
+
+    if self.has_simple_ram_image:
+        self.simple_x_size = di.get_uint32()
+        self.simple_y_size = di.get_uint32()
+        self.simple_image_date_generated = di.get_int32()
+        self.simple_ram_image = extract_payload(di, di.get_uint32())
+    else:
+        self.simple_x_size = 0
+        self.simple_y_size = 0
+        self.simple_image_date_generated = 0
+        self.simple_ram_image = b''
+
+    self.has_clear_color = False
+    self.clear_color = LColorf(1, 1, 1, 1)
+
+    if self.bam_version >= (6, 45):
+        self.has_clear_color = di.get_bool()
+
+        if self.has_clear_color:
+            self.clear_color = read_vec4(di)
+
+    self.texture_data = extract_payload(di, di.get_remaining_size())
+
+def makeDatagram(version):
+    bam = BamFile()
+    bam.stdfloat_double = False
+    texture = Texture(bam, version)
+    texture.__dict__.update(
+        name='bench', filename='maps/bench.png', alpha_filename='maps/bench_a.rgb',
+        primary_file_num_channels=3, alpha_file_channel=1, has_rawdata=False,
+        texture_type=P3Texture.TT_2d_texture, has_read_mipmaps=False,
+        wrap_u=P3Texture.WM_repeat, wrap_v=P3Texture.WM_clamp, wrap_w=P3Texture.WM_repeat,
+        minfilter=P3Texture.FT_linear_mipmap_linear, magfilter=P3Texture.FT_linear,
+        anisotropic_degree=4, border_color=(0.0, 0.25, 0.5, 1.0), min_lod=-1000.0, max_lod=1000.0, lod_bias=0.0,
+        compression=P3Texture.CM_default, quality_level=P3Texture.QL_default,
+        tex_format=P3Texture.F_rgba, num_components=4, usage_hint=Geom.UH_unspecified,
+        auto_texture_scale=ATS_unspecified, orig_file_x_size=256, orig_file_y_size=256,
+        has_simple_ram_image=True, simple_x_size=16, simple_y_size=16, simple_image_date_generated=1600000000,
+        simple_ram_image=bytes(16 * 16 * 4), has_clear_color=True, clear_color=(1.0, 0.0, 0.0, 1.0),
+        texture_data=b''
+    )
+    return bam, texture.to_binary(version)
+
+def timeLoad(bam, version, data, load, count):
+    start = time.perf_counter()
+
+    for _ in range(count):
+        texture = Texture(bam, version)
+        load(texture, StructDatagramIterator(data))
+
+    return (time.perf_counter() - start) / count, texture
+
+def addArguments(parser):
+    parser.add_argument('-n', '--count', type=int, default=20000, help='number of textures decoded per version')
+
+def run(args):
+    print(f'{"version":>8} {"field-by-field":>15} {"codec":>10} {"speedup":>8}')
+
+    for version in VERSIONS:
+        bam, data = makeDatagram(version)
+        before, expected = timeLoad(bam, version, data, legacyLoad, args.count)
+        after, actual = timeLoad(bam, version, data, Texture.load, args.count)
+
+        if vars(expected) != vars(actual):
+            raise ValueError(f'Codec decodes bam {version[0]}.{version[1]} differently from the reference decoder.')
+
+        if actual.to_binary(version) != data:
+            raise ValueError(f'Codec does not round trip bam {version[0]}.{version[1]}.')
+
+        print(f'{version[0]:>6}.{version[1]:<2} {before * 1e6:>13.2f}us {after * 1e6:>8.2f}us {before / after:>7.2f}x')
+
+    return 0
@@ -1,3 +1,4 @@
+from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QColor, QFont
 from PyQt5.QtWidgets import QColorDialog, QHBoxLayout, QLineEdit, QWidget, QPushButton
 from . import Globals
@@ -26,43 +27,57 @@ class ColorWidget(QWidget):
     def clear(self):
         self.lineEdit.clear()
 
-    def setColor(self, color):
+    def setMixed(self):
+        self.color = None
+        self.lineEdit.clear()
+        self.lineEdit.setPlaceholderText('Mixed')
+
+    def setColor(self, color, notify=True):
         self.color = color
 
-        if self.callback:
+        if notify and self.callback:
             self.callback(color)
 
     def connect(self, callback):
         self.callback = callback
 
-    def loadColor(self, color):
+    def loadColor(self, color, notify=True):
         if not color.isValid():
             return
 
         text = color.name(QColor.HexArgb)
+        self.lineEdit.setPlaceholderText('')
 
         if self.lineEdit.text() != text:
             self.lineEdit.setText(text)
 
-        self.setColor(color)
+        self.setColor(color, notify)
 
-    def loadPandaColor(self, color):
-        r = int(color.getX() * 255.0)
-        g = int(color.getY() * 255.0)
-        b = int(color.getZ() * 255.0)
-        a = int(color.getW() * 255.0)
-        self.loadColor(QColor(r, g, b, a))
+    def loadPandaColor(self, color, notify=True):
+        # Colors may be LVecBase4f or plain tuples, depending on the p3bamboo version
+        r, g, b, a = [int(color[i] * 255.0) for i in range(4)]
+        self.loadColor(QColor(r, g, b, a), notify)
 
     def pickColor(self):
-        self.loadColor(QColorDialog.getColor(self.color, options=QColorDialog.ShowAlphaChannel))
+        self.loadColor(QColorDialog.getColor(self.color or QColor(Qt.white), options=QColorDialog.ShowAlphaChannel))
 
     def textChanged(self):
         value = self.lineEdit.text()
+
+        if not value and self.color is None:
+            # Left a mixed value untouched
+            return
+
         color = Globals.hexToColor(value)
 
         if color is None:
-            self.loadColor(self.color)
+            if self.color is None:
+                self.lineEdit.clear()
+            else:
+                self.loadColor(self.color)
+
             Globals.showError(f'The original value {self.lineEdit.text()} has been restored.')
             return
 
-        self.setColor(color)
+        if color != self.color:
+            self.setColor(color)
@@ -0,0 +1,38 @@
+from . import Benchmark, BatchEdit, CodecBenchmark, Dedup, OpenBenchmark, RecordBenchmark, Rules, Server, SimpleImage, TextureDiff, TextureExport, TextureIndex, TextureScanner, TextureTable, Verify
+import argparse
+
+COMMANDS = [
+    ('batch', BatchEdit.addArguments, BatchEdit.run, 'assign texture fields across a tree of BAM files'),
+    ('bench-open', OpenBenchmark.addArguments, OpenBenchmark.run, 'compare open latency and peak RSS of the read and mmap load paths'),
+    ('benchmark', Benchmark.addArguments, Benchmark.run, 'measure parse, write, round trip and GUI population on synthetic BAM files against a baseline'),
+    ('bench-codec', CodecBenchmark.addArguments, CodecBenchmark.run, 'compare the field-by-field and precompiled struct Texture decoders'),
+    ('bench-memory', RecordBenchmark.addArguments, RecordBenchmark.run, 'compare the memory held per texture by Texture objects and compact records'),
+    ('scan', TextureScanner.addArguments, TextureScanner.run, 'list the textures in a tree of BAM files without loading other objects'),
+    ('index', TextureIndex.addIndexArguments, TextureIndex.runIndex, 'record every texture field of a tree of BAM files in an SQLite index'),
+    ('query', TextureIndex.addQueryArguments, TextureIndex.runQuery, 'find textures in an SQLite index by field values'),
+    ('rules', Rules.addArguments, Rules.run, 'match textures against a JSON rules file and assign the fields the rules set'),
+    ('diff', TextureDiff.addArguments, TextureDiff.run, 'report the texture fields that differ between two BAM files or directory trees'),
+    ('export', TextureExport.addExportArguments, TextureExport.runExport, 'write the texture fields of a tree of BAM files to JSON Lines or CSV'),
+    ('import', TextureExport.addImportArguments, TextureExport.runImport, 'apply texture fields from an edited JSON Lines or CSV export'),
+    ('serve', Server.addArguments, Server.run, 'keep BAM files parsed and answer JSON-RPC requests about their textures'),
+    ('verify', Verify.addArguments, Verify.run, 'check that re-encoding every texture of a tree of BAM files reproduces the original bytes'),
+    ('simple-image', SimpleImage.addArguments, SimpleImage.run, 'regenerate simple RAM images from image files or embedded raw data'),
+    ('dedup', Dedup.addArguments, Dedup.run, 'report embedded payloads and sampler states repeated across a tree of BAM files'),
+    ('table', TextureTable.addArguments, TextureTable.run, 'filter and bulk-assign texture fields with NumPy expressions over a tree of BAM files')
+]
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='bamtex', description='Headless BamTeXEditor tools.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    for name, addArguments, run, description in COMMANDS:
+        subparser = subparsers.add_parser(name, help=description, description=description)
+        addArguments(subparser)
+        subparser.set_defaults(run=run)
+
+    args = parser.parse_args(argv)
+
+    try:
+        return args.run(args)
+    except ValueError as e:
+        parser.error(str(e))
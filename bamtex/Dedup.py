@@ -0,0 +1,270 @@
+from .TextureScanner import scanTextures
+from . import Batch
+import hashlib, os, time, traceback, zlib
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+"""
+  Finds embedded texture payloads and sampler states that are repeated across
+  an asset tree, and optionally strips embedded raw data that can be loaded
+  from the texture's own image file instead.
+
+  python -m bamtex dedup phase_3/ phase_4/
+  python -m bamtex dedup phase_3/ --strip
+"""
+
+PAYLOADS = ('simple_ram_image', 'texture_data')
+
+SAMPLER_FIELDS = ('wrap_u', 'wrap_v', 'wrap_w', 'minfilter', 'magfilter', 'anisotropic_degree', 'border_color', 'min_lod', 'max_lod', 'lod_bias')
+
+def hashPayload(data):
+    # xxHash when it is installed; CRC32 is just as quick to compute but may collide,
+    # so its matches are confirmed with confirmPayloads()
+    if xxhash is not None:
+        return xxhash.xxh3_128_hexdigest(data)
+
+    return '%08x' % zlib.crc32(data)
+
+def isCollisionFree():
+    return xxhash is not None
+
+def hashPayloads(filename):
+    """
+    Hashes the payloads of every texture of filename in a worker process.
+    """
+    result = {'filename': filename, 'size': os.path.getsize(filename), 'textures': [], 'error': None}
+
+    try:
+        for texture in scanTextures(filename):
+            payloads = {}
+
+            for field in PAYLOADS:
+                data = getattr(texture, field)
+
+                if len(data):
+                    payloads[field] = (hashPayload(data), len(data))
+
+            sampler = tuple(tuple(value) if field == 'border_color' else value for field, value in ((field, getattr(texture, field)) for field in SAMPLER_FIELDS))
+            result['textures'].append({
+                'obj_id': texture.obj_id,
+                'name': texture.name,
+                'filename': texture.filename,
+                'has_rawdata': texture.has_rawdata,
+                'payloads': payloads,
+                'sampler': sampler
+            })
+    except Exception:
+        result['error'] = traceback.format_exc()
+
+    return result
+
+def confirmPayloads(update):
+    """
+    Hashes the payloads of one (filename, [(obj_id, field)]) pair with BLAKE2 in a
+    worker process, to tell CRC32 matches apart from collisions.
+    """
+    filename, payloads = update
+    payloads = set(map(tuple, payloads))
+    result = {'filename': filename, 'digests': {}, 'error': None}
+
+    try:
+        for texture in scanTextures(filename):
+            for field in PAYLOADS:
+                if (texture.obj_id, field) in payloads:
+                    result['digests'][(texture.obj_id, field)] = hashlib.blake2b(getattr(texture, field), digest_size=16).hexdigest()
+    except Exception:
+        result['error'] = traceback.format_exc()
+
+    return result
+
+class DedupReport(object):
+
+    def __init__(self):
+        self.groups = {}
+        self.samplers = {}
+        self.textures = 0
+
+    def add(self, result):
+        for texture in result['textures']:
+            self.textures += 1
+            self.samplers.setdefault(texture['sampler'], []).append((result['filename'], texture))
+
+            for field, (digest, size) in texture['payloads'].items():
+                self.groups.setdefault((field, digest, size), []).append((result['filename'], texture))
+
+    def getCandidates(self):
+        """
+        Returns {bam filename: [(obj_id, field)]} of every payload in a duplicate group.
+        """
+        candidates = {}
+
+        for (field, _, _), members in self.groups.items():
+            if len(members) > 1:
+                for filename, texture in members:
+                    candidates.setdefault(filename, []).append((texture['obj_id'], field))
+
+        return candidates
+
+    def confirm(self, results):
+        """
+        Splits the duplicate groups by the digests of confirmPayloads() results,
+        so payloads whose weak hashes merely collide are no longer grouped.
+        Payloads of files that could not be read again are left out.
+        """
+        digests = {}
+
+        for result in results:
+            for (obj_id, field), digest in result['digests'].items():
+                digests[(result['filename'], obj_id, field)] = digest
+
+        groups = {}
+
+        for (field, digest, size), members in self.groups.items():
+            if len(members) == 1:
+                groups[(field, digest, size)] = members
+                continue
+
+            for filename, texture in members:
+                strong = digests.get((filename, texture['obj_id'], field))
+
+                if strong is not None:
+                    groups.setdefault((field, strong, size), []).append((filename, texture))
+
+        self.groups = groups
+
+    def getDuplicates(self):
+        """
+        Returns (field, size, members) for every payload stored more than once,
+        most redundant bytes first.
+        """
+        duplicates = [(field, size, members) for (field, _, size), members in self.groups.items() if len(members) > 1]
+        duplicates.sort(key=lambda group: group[1] * (len(group[2]) - 1), reverse=True)
+        return duplicates
+
+    def getRedundantBytes(self, field=None):
+        return sum(size * (len(members) - 1) for groupField, size, members in self.getDuplicates() if field is None or groupField == field)
+
+    def getStrippable(self):
+        """
+        Returns {bam filename: [obj_id]} of the textures whose duplicated raw data
+        can be dropped because the texture names an image file to load instead.
+        """
+        strippable = {}
+
+        for field, size, members in self.getDuplicates():
+            if field != 'texture_data':
+                continue
+
+            for filename, texture in members:
+                if texture['filename'] and texture['has_rawdata']:
+                    strippable.setdefault(filename, []).append(texture['obj_id'])
+
+        return strippable
+
+def stripFile(update):
+    """
+    Drops the embedded raw data of the textures of one (filename, obj_ids) pair.
+    """
+    filename, obj_ids = update
+    start = time.perf_counter()
+    result = {'filename': filename, 'size': os.path.getsize(filename), 'changed': 0, 'saved': 0, 'error': None}
+
+    try:
+        bam = Batch.loadBamFile(filename)
+        obj_ids = set(obj_ids)
+
+        for texture in Batch.getTextures(bam):
+            if texture.obj_id in obj_ids and texture.has_rawdata:
+                result['saved'] += len(texture.texture_data)
+                texture.has_rawdata = False
+                texture.texture_data = b''
+                texture.dirty = True
+                result['changed'] += 1
+
+        if result['changed']:
+            Batch.saveBamFile(bam, filename)
+    except Exception:
+        result['error'] = traceback.format_exc()
+
+    result['time'] = time.perf_counter() - start
+    return result
+
+def formatSize(size):
+    return f'{size / (1024 * 1024):.2f} MB' if size >= 1024 * 1024 else f'{size} bytes'
+
+def addArguments(parser):
+    parser.add_argument('paths', nargs='+', help='BAM files or directory trees to analyze')
+    parser.add_argument('--top', type=int, default=20, help='number of duplicate groups and sampler states listed')
+    parser.add_argument('--strip', action='store_true', help='drop duplicated embedded raw data of textures that name an image file')
+    parser.add_argument('-n', '--dry-run', action='store_true', help='with --strip, report what would be dropped without writing')
+    Batch.addPoolArguments(parser)
+
+def run(args):
+    files = list(Batch.findBamFiles(args.paths))
+    throughput = Batch.Throughput()
+    report = DedupReport()
+    failed = 0
+
+    for result in Batch.runInPool(hashPayloads, files, args.jobs):
+        throughput.add(result['size'])
+
+        if result['error']:
+            failed += 1
+            print(f'{result["filename"]}: FAILED\n{result["error"]}')
+        else:
+            report.add(result)
+
+    if not isCollisionFree():
+        # Only files holding a CRC32 match are read again
+        confirmed = []
+
+        for result in Batch.runInPool(confirmPayloads, list(report.getCandidates().items()), args.jobs):
+            if result['error']:
+                failed += 1
+                print(f'{result["filename"]}: FAILED\n{result["error"]}')
+
+            confirmed.append(result)
+
+        report.confirm(confirmed)
+
+    duplicates = report.getDuplicates()
+    print(f'{report.textures} textures hashed with {"xxHash" if isCollisionFree() else "CRC32, matches confirmed with BLAKE2"}')
+    print(throughput.summary())
+
+    for field in PAYLOADS:
+        groups = sum(1 for groupField, _, _ in duplicates if groupField == field)
+        print(f'{field}: {groups} duplicate groups, {formatSize(report.getRedundantBytes(field))} redundant')
+
+    for field, size, members in duplicates[:args.top]:
+        names = sorted(set(texture['filename'] or texture['name'] for _, texture in members))
+        print(f'  {field}, {len(members)} copies of {formatSize(size)} ({formatSize(size * (len(members) - 1))} redundant): {", ".join(names[:5])}{" ..." if len(names) > 5 else ""}')
+
+    samplers = sorted(report.samplers.items(), key=lambda item: len(item[1]), reverse=True)
+    print(f'{len(samplers)} distinct sampler states')
+
+    for sampler, members in samplers[:args.top]:
+        print(f'  {len(members)} textures: {", ".join(f"{field}={value}" for field, value in zip(SAMPLER_FIELDS, sampler))}')
+
+    if args.strip:
+        strippable = report.getStrippable()
+        textures = sum(len(obj_ids) for obj_ids in strippable.values())
+
+        if args.dry_run:
+            print(f'{textures} textures in {len(strippable)} files would have their embedded raw data stripped')
+        else:
+            saved = 0
+
+            for result in Batch.runInPool(stripFile, list(strippable.items()), args.jobs):
+                if result['error']:
+                    failed += 1
+                    print(f'{result["filename"]}: FAILED in {result["time"] * 1000:.1f}ms\n{result["error"]}')
+                else:
+                    saved += result['saved']
+                    print(f'{result["filename"]}: {result["changed"]} textures stripped, {formatSize(result["saved"])} saved in {result["time"] * 1000:.1f}ms')
+
+            print(f'{formatSize(saved)} of embedded raw data stripped')
+
+    return 1 if failed else 0
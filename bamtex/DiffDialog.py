@@ -0,0 +1,118 @@
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QDialog, QFileDialog, QHBoxLayout, QLabel, QLineEdit, QPushButton, QTreeWidget, QTreeWidgetItem, QVBoxLayout
+from .BamWorker import BamWorker
+from .TextureDiff import diffFiles
+from . import Globals
+import os
+
+def runDiff(progress, pair):
+    return diffFiles(pair)
+
+class DiffDialog(QDialog):
+    """
+    Shows the texture fields that differ between the open file, as saved, and another file.
+    Activating a texture of the open file selects it in the editor.
+    """
+
+    def __init__(self, parent, filename, callback):
+        QDialog.__init__(self, parent)
+        self.setWindowTitle(f'Compare {os.path.basename(filename)}')
+        self.resize(800, 500)
+        self.filename = filename
+        self.callback = callback
+        self.worker = None
+
+        self.otherEdit = QLineEdit(self)
+        self.otherEdit.setReadOnly(True)
+        self.otherEdit.setPlaceholderText('No file to compare with')
+        self.browseButton = QPushButton('Browse', self)
+        self.browseButton.clicked.connect(self.browseFile)
+
+        self.tree = QTreeWidget(self)
+        self.tree.setHeaderLabels(['Texture', 'Other file', 'This file'])
+        self.tree.setColumnWidth(0, 300)
+        self.tree.itemActivated.connect(self.itemActivated)
+        self.statusLabel = QLabel('Unsaved changes are not compared.', self)
+
+        self.otherLayout = QHBoxLayout()
+        self.otherLayout.addWidget(self.otherEdit)
+        self.otherLayout.addWidget(self.browseButton)
+
+        self.layout = QVBoxLayout(self)
+        self.layout.addLayout(self.otherLayout)
+        self.layout.addWidget(self.tree)
+        self.layout.addWidget(self.statusLabel)
+
+    def browseFile(self):
+        filename, _ = QFileDialog.getOpenFileName(self, 'Compare with a Panda3D model!', os.path.dirname(self.filename), 'Panda3D BAM models (*.bam)')
+
+        if filename:
+            self.compare(filename)
+
+    def compare(self, otherFilename):
+        if self.worker is not None:
+            return
+
+        self.otherEdit.setText(otherFilename)
+        self.browseButton.setEnabled(False)
+        self.tree.clear()
+        self.statusLabel.setText('Comparing...')
+
+        # The other file is the old side, so added textures are the ones in this file
+        self.worker = BamWorker(runDiff, (self.filename, otherFilename, self.filename))
+        self.worker.done.connect(self.showResult)
+        self.worker.failed.connect(Globals.showError)
+        self.worker.finished.connect(self.workerFinished)
+        self.worker.start()
+
+    def workerFinished(self):
+        self.worker = None
+        self.browseButton.setEnabled(True)
+
+    def addTexture(self, status, label, obj_id=None):
+        item = QTreeWidgetItem(self.tree, [f'{status} {label}'])
+        item.setData(0, Qt.UserRole, obj_id)
+        item.setToolTip(0, label)
+        return item
+
+    def showResult(self, result):
+        if result['error']:
+            self.statusLabel.setText('The files could not be compared.')
+            Globals.showError(result['error'])
+            return
+
+        for label, obj_id, differences in result['changed']:
+            item = self.addTexture('~', label, obj_id)
+
+            for field, oldText, newText in differences:
+                QTreeWidgetItem(item, [field, oldText, newText]).setData(0, Qt.UserRole, obj_id)
+
+            item.setExpanded(True)
+
+        for label in result['removed']:
+            self.addTexture('-', label).setText(1, 'only in the other file')
+
+        for label, obj_id in result['added']:
+            self.addTexture('+', label, obj_id).setText(2, 'only in this file')
+
+        if result['identical_file']:
+            status = 'The files are identical.'
+        else:
+            status = f'{result["identical"]} identical, {len(result["changed"])} changed, {len(result["added"])} only in this file, {len(result["removed"])} only in the other'
+
+            if 'versions' in result:
+                status += ' (bam %s and %s)' % result['versions']
+
+        self.statusLabel.setText(f'{status}, compared in {result["time"] * 1000:.1f}ms. Unsaved changes are not compared.')
+
+    def itemActivated(self, item, column):
+        obj_id = item.data(0, Qt.UserRole)
+
+        if obj_id is not None:
+            self.callback(self.filename, obj_id)
+
+    def closeEvent(self, event):
+        if self.worker is not None:
+            self.worker.wait()
+
+        QDialog.closeEvent(self, event)
@@ -165,8 +165,8 @@ TextureFields = [
         Option('simple_y_size', 'Y size', OptionGlobals.UINT32),
         Option('simple_image_date_generated', 'Date generated', OptionGlobals.INT32),
         Option('simple_ram_image', 'Image data', OptionGlobals.BLOB),
-        Option('has_clear_color', 'Clear color enabled', OptionGlobals.BOOL),
-        Option('clear_color', 'Clear color', OptionGlobals.COLOR)
+        Option('has_clear_color', 'Clear color enabled', OptionGlobals.BOOL, bam_version=(6, 45)),
+        Option('clear_color', 'Clear color', OptionGlobals.COLOR, bam_version=(6, 45))
     ]]
 ]
 
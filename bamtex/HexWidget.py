@@ -0,0 +1,361 @@
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QColor, QFont, QFontMetrics, QPainter
+from PyQt5.QtWidgets import QAbstractScrollArea, QFileDialog, QHBoxLayout, QLabel, QPushButton, QVBoxLayout, QWidget
+from . import Globals
+
+BYTES_PER_ROW = 16
+
+HEX_DIGITS = '0123456789abcdef'
+
+# Printable ASCII is shown as is, everything else as a dot
+ASCII_TABLE = ''.join(chr(i) if 32 <= i < 127 else '.' for i in range(256))
+
+class HexView(QAbstractScrollArea):
+    """
+    A hex and ASCII view that only formats the rows currently on screen.
+
+    Byte edits are kept in an overlay over the original buffer, so nothing is
+    copied until they are applied.
+    """
+
+    def __init__(self, parent, editCallback):
+        QAbstractScrollArea.__init__(self, parent)
+        self.editCallback = editCallback
+        self.data = b''
+        self.edits = {}
+        self.cursor = 0
+        self.lowNibble = False
+        self.asciiFocus = False
+        self.message = ''
+
+        font = QFont('Courier New', 11)
+        font.setStyleHint(QFont.Monospace)
+        self.setFont(font)
+        self.viewport().setFont(font)
+        self.setFocusPolicy(Qt.StrongFocus)
+
+        metrics = QFontMetrics(font)
+        self.charWidth = metrics.horizontalAdvance('0')
+        self.rowHeight = metrics.height()
+        self.ascent = metrics.ascent()
+
+        # offset, two spaces, three characters per byte, one space, then the ASCII column
+        self.hexColumn = 10
+        self.asciiColumn = self.hexColumn + BYTES_PER_ROW * 3 + 1
+        self.setMinimumHeight(self.rowHeight * 8)
+        self.setMinimumWidth(self.charWidth * (self.asciiColumn + BYTES_PER_ROW + 1) + self.verticalScrollBar().sizeHint().width())
+
+    def setData(self, data, message='', keepPosition=False):
+        self.data = data
+        self.edits = {}
+        self.lowNibble = False
+        self.message = message
+
+        if keepPosition and data:
+            self.cursor = min(self.cursor, len(data) - 1)
+        else:
+            self.cursor = 0
+            self.verticalScrollBar().setValue(0)
+
+        self.updateScrollBar()
+        self.viewport().update()
+
+    def getSize(self):
+        return len(self.data)
+
+    def getEditedData(self):
+        data = bytearray(self.data)
+
+        for offset, value in self.edits.items():
+            data[offset] = value
+
+        return bytes(data)
+
+    def discardEdits(self):
+        self.edits = {}
+        self.viewport().update()
+
+    def getByte(self, offset):
+        value = self.edits.get(offset)
+        return self.data[offset] if value is None else value
+
+    def getRowCount(self):
+        return (len(self.data) + BYTES_PER_ROW - 1) // BYTES_PER_ROW
+
+    def getVisibleRows(self):
+        return max(self.viewport().height() // self.rowHeight, 1)
+
+    def updateScrollBar(self):
+        visibleRows = self.getVisibleRows()
+        scrollBar = self.verticalScrollBar()
+        scrollBar.setRange(0, max(self.getRowCount() - visibleRows, 0))
+        scrollBar.setPageStep(visibleRows)
+
+    def resizeEvent(self, event):
+        QAbstractScrollArea.resizeEvent(self, event)
+        self.updateScrollBar()
+
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        painter.fillRect(self.viewport().rect(), self.palette().base())
+
+        if self.message:
+            painter.drawText(self.charWidth, self.ascent, self.message)
+            return
+
+        firstRow = self.verticalScrollBar().value()
+        lastRow = min(firstRow + self.getVisibleRows() + 1, self.getRowCount())
+        cursorRow = self.cursor // BYTES_PER_ROW
+
+        for row in range(firstRow, lastRow):
+            start = row * BYTES_PER_ROW
+            values = bytes(self.data[start:start + BYTES_PER_ROW])
+            y = (row - firstRow) * self.rowHeight
+
+            if self.edits:
+                values = bytes(self.getByte(offset) for offset in range(start, start + len(values)))
+
+            if row == cursorRow and self.hasFocus():
+                column = self.cursor % BYTES_PER_ROW
+                hexX = (self.hexColumn + column * 3 + (1 if self.lowNibble else 0)) * self.charWidth
+                asciiX = (self.asciiColumn + column) * self.charWidth
+                painter.fillRect(hexX, y, self.charWidth * (1 if not self.asciiFocus else 2), self.rowHeight, self.palette().highlight())
+                painter.fillRect(asciiX, y, self.charWidth, self.rowHeight, self.palette().highlight() if self.asciiFocus else self.palette().alternateBase())
+
+            text = f'{start:08x}  ' + ' '.join(f'{value:02x}' for value in values).ljust(BYTES_PER_ROW * 3) + ' ' + ''.join(ASCII_TABLE[value] for value in values)
+            painter.setPen(self.palette().text().color())
+            painter.drawText(0, y + self.ascent, text)
+
+            if self.edits:
+                # Edited bytes are drawn again on top in red
+                painter.setPen(QColor(Qt.red))
+
+                for offset in range(start, start + len(values)):
+                    if offset in self.edits:
+                        column = offset % BYTES_PER_ROW
+                        value = self.edits[offset]
+                        painter.drawText((self.hexColumn + column * 3) * self.charWidth, y + self.ascent, f'{value:02x}')
+                        painter.drawText((self.asciiColumn + column) * self.charWidth, y + self.ascent, ASCII_TABLE[value])
+
+    def ensureCursorVisible(self):
+        row = self.cursor // BYTES_PER_ROW
+        scrollBar = self.verticalScrollBar()
+
+        if row < scrollBar.value():
+            scrollBar.setValue(row)
+        elif row >= scrollBar.value() + self.getVisibleRows():
+            scrollBar.setValue(row - self.getVisibleRows() + 1)
+
+        self.viewport().update()
+
+    def moveCursor(self, offset):
+        if not self.data:
+            return
+
+        self.cursor = min(max(offset, 0), len(self.data) - 1)
+        self.lowNibble = False
+        self.ensureCursorVisible()
+
+    def setByte(self, value):
+        if value == self.data[self.cursor]:
+            self.edits.pop(self.cursor, None)
+        else:
+            self.edits[self.cursor] = value
+
+        self.editCallback()
+
+    def mousePressEvent(self, event):
+        if self.message or not self.data:
+            return
+
+        column = int(event.pos().x() // self.charWidth)
+        row = self.verticalScrollBar().value() + int(event.pos().y() // self.rowHeight)
+
+        if self.hexColumn <= column < self.asciiColumn - 1:
+            self.asciiFocus = False
+            byte = (column - self.hexColumn) // 3
+        elif self.asciiColumn <= column < self.asciiColumn + BYTES_PER_ROW:
+            self.asciiFocus = True
+            byte = column - self.asciiColumn
+        else:
+            return
+
+        self.moveCursor(row * BYTES_PER_ROW + byte)
+
+    def keyPressEvent(self, event):
+        if self.message or not self.data:
+            return QAbstractScrollArea.keyPressEvent(self, event)
+
+        key = event.key()
+        pageBytes = self.getVisibleRows() * BYTES_PER_ROW
+        moves = {
+            Qt.Key_Left: -1,
+            Qt.Key_Right: 1,
+            Qt.Key_Up: -BYTES_PER_ROW,
+            Qt.Key_Down: BYTES_PER_ROW,
+            Qt.Key_PageUp: -pageBytes,
+            Qt.Key_PageDown: pageBytes
+        }
+
+        if key in moves:
+            self.moveCursor(self.cursor + moves[key])
+        elif key == Qt.Key_Home:
+            self.moveCursor(0 if event.modifiers() & Qt.ControlModifier else self.cursor - self.cursor % BYTES_PER_ROW)
+        elif key == Qt.Key_End:
+            self.moveCursor(len(self.data) - 1 if event.modifiers() & Qt.ControlModifier else self.cursor - self.cursor % BYTES_PER_ROW + BYTES_PER_ROW - 1)
+        elif key == Qt.Key_Tab:
+            self.asciiFocus = not self.asciiFocus
+            self.lowNibble = False
+            self.viewport().update()
+        elif self.asciiFocus and len(event.text()) == 1 and 32 <= ord(event.text()) < 127:
+            self.setByte(ord(event.text()))
+            self.moveCursor(self.cursor + 1)
+        elif not self.asciiFocus and len(event.text()) == 1 and event.text().lower() in HEX_DIGITS:
+            digit = HEX_DIGITS.index(event.text().lower())
+            value = self.getByte(self.cursor)
+
+            if self.lowNibble:
+                self.setByte((value & 0xF0) | digit)
+                self.moveCursor(self.cursor + 1)
+            else:
+                self.setByte((digit << 4) | (value & 0x0F))
+                self.lowNibble = True
+                self.viewport().update()
+        else:
+            QAbstractScrollArea.keyPressEvent(self, event)
+
+    def focusOutEvent(self, event):
+        # Like a line edit, leaving the view finishes the edit
+        QAbstractScrollArea.focusOutEvent(self, event)
+        self.parent().applyEdits()
+
+    def focusNextPrevChild(self, next):
+        # Tab switches between the hex and ASCII columns instead of leaving the view
+        return False
+
+class HexWidget(QWidget):
+    """
+    Views and edits a byte payload, such as the simple RAM image.
+    Byte edits are applied with the Apply button or Enter; whole payloads can
+    be loaded from and saved to files.
+    """
+
+    def __init__(self, parent, *args, **kwargs):
+        QWidget.__init__(self, parent, *args, **kwargs)
+
+        self.view = HexView(self, self.updateStatus)
+        self.statusLabel = QLabel(self)
+        self.applyButton = QPushButton('Apply', self)
+        self.revertButton = QPushButton('Revert', self)
+        self.loadButton = QPushButton('Load from file...', self)
+        self.saveButton = QPushButton('Save to file...', self)
+
+        # The buttons must not take focus, which would apply the edits first
+        for button in (self.applyButton, self.revertButton, self.loadButton, self.saveButton):
+            button.setFocusPolicy(Qt.NoFocus)
+
+        self.applyButton.clicked.connect(self.applyEdits)
+        self.revertButton.clicked.connect(self.revertEdits)
+        self.loadButton.clicked.connect(self.loadFromFile)
+        self.saveButton.clicked.connect(self.saveToFile)
+
+        self.buttonLayout = QHBoxLayout()
+        self.buttonLayout.setContentsMargins(0, 0, 0, 0)
+        self.buttonLayout.addWidget(self.statusLabel, 1)
+        self.buttonLayout.addWidget(self.applyButton)
+        self.buttonLayout.addWidget(self.revertButton)
+        self.buttonLayout.addWidget(self.loadButton)
+        self.buttonLayout.addWidget(self.saveButton)
+
+        self.layout = QVBoxLayout(self)
+        self.layout.setContentsMargins(0, 0, 0, 0)
+        self.layout.addWidget(self.view)
+        self.layout.addLayout(self.buttonLayout)
+
+        self.mixed = False
+        self.callback = None
+        self.clear()
+
+    def connect(self, callback):
+        self.callback = callback
+
+    def clear(self):
+        self.mixed = False
+        self.view.setData(b'')
+        self.updateStatus()
+
+    def setMixed(self):
+        self.mixed = True
+        self.view.setData(b'', 'Mixed')
+        self.updateStatus()
+
+    def loadData(self, data):
+        self.mixed = False
+        self.view.setData(data)
+        self.updateStatus()
+
+    def updateStatus(self):
+        edits = len(self.view.edits)
+        self.applyButton.setEnabled(bool(edits))
+        self.revertButton.setEnabled(bool(edits))
+        self.saveButton.setEnabled(not self.mixed)
+        self.view.viewport().update()
+
+        if self.mixed:
+            self.statusLabel.setText('Mixed')
+        elif edits:
+            self.statusLabel.setText(f'{self.view.getSize()} bytes, {edits} edited')
+        else:
+            self.statusLabel.setText(f'{self.view.getSize()} bytes')
+
+    def setData(self, data):
+        if self.callback:
+            self.callback(data)
+
+        # The textures now hold data, so show it without the edit overlay
+        self.mixed = False
+        self.view.setData(data, keepPosition=True)
+        self.updateStatus()
+
+    def applyEdits(self):
+        if self.view.edits:
+            self.setData(self.view.getEditedData())
+
+    def revertEdits(self):
+        self.view.discardEdits()
+        self.updateStatus()
+
+    def loadFromFile(self):
+        filename, _ = QFileDialog.getOpenFileName(self, 'Load payload from file', '', 'All files (*)')
+
+        if not filename:
+            return
+
+        try:
+            with open(filename, 'rb') as f:
+                data = f.read()
+        except OSError as e:
+            Globals.showError(f'Unfortunately, we could not read {filename}.\n\n{e}')
+            return
+
+        self.setData(data)
+
+    def saveToFile(self):
+        filename, _ = QFileDialog.getSaveFileName(self, 'Save payload to file', '', 'All files (*)')
+
+        if not filename:
+            return
+
+        try:
+            with open(filename, 'wb') as f:
+                f.write(self.view.getEditedData() if self.view.edits else self.view.data)
+        except OSError as e:
+            Globals.showError(f'Unfortunately, we could not write {filename}.\n\n{e}')
+
+    def keyPressEvent(self, event):
+        if event.key() in (Qt.Key_Return, Qt.Key_Enter):
+            self.applyEdits()
+        elif event.key() == Qt.Key_Escape:
+            self.revertEdits()
+        else:
+            QWidget.keyPressEvent(self, event)
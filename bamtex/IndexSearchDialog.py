@@ -0,0 +1,102 @@
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QFont
+from PyQt5.QtWidgets import QDialog, QFileDialog, QHBoxLayout, QLabel, QLineEdit, QListWidget, QListWidgetItem, QPushButton, QVBoxLayout
+from .TextureIndex import TextureIndex
+import os, sqlite3, time
+
+MAX_RESULTS = 1000
+
+class IndexSearchDialog(QDialog):
+
+    def __init__(self, parent, callback):
+        QDialog.__init__(self, parent)
+        self.setWindowTitle('Search texture index')
+        self.resize(800, 500)
+        self.callback = callback
+        self.index = None
+
+        font = QFont('Helvetica', 13)
+
+        self.databaseEdit = QLineEdit(self)
+        self.databaseEdit.setReadOnly(True)
+        self.databaseEdit.setPlaceholderText('No index selected')
+        self.browseButton = QPushButton('Browse', self)
+        self.browseButton.clicked.connect(self.browseDatabase)
+
+        self.searchEdit = QLineEdit(self)
+        self.searchEdit.setFont(font)
+        self.searchEdit.setPlaceholderText('Filename, name or field=value...')
+        self.searchEdit.textChanged.connect(self.search)
+
+        self.resultList = QListWidget(self)
+        self.resultList.itemActivated.connect(self.resultActivated)
+        self.statusLabel = QLabel(self)
+
+        self.databaseLayout = QHBoxLayout()
+        self.databaseLayout.addWidget(self.databaseEdit)
+        self.databaseLayout.addWidget(self.browseButton)
+
+        self.layout = QVBoxLayout(self)
+        self.layout.addLayout(self.databaseLayout)
+        self.layout.addWidget(self.searchEdit)
+        self.layout.addWidget(self.resultList)
+        self.layout.addWidget(self.statusLabel)
+
+    def browseDatabase(self):
+        filename, _ = QFileDialog.getOpenFileName(self, 'Open a texture index!', '', 'Texture indexes (*.db);;All files (*)')
+
+        if filename:
+            self.openDatabase(filename)
+
+    def openDatabase(self, filename):
+        if self.index is not None:
+            self.index.close()
+
+        self.index = TextureIndex(filename)
+        self.databaseEdit.setText(filename)
+        self.search()
+
+    def search(self):
+        self.resultList.clear()
+
+        if self.index is None:
+            return
+
+        text = self.searchEdit.text().strip()
+
+        if not text:
+            self.statusLabel.clear()
+            return
+
+        start = time.perf_counter()
+
+        try:
+            results = self.index.search(text, MAX_RESULTS).fetchall()
+        except (ValueError, sqlite3.Error) as e:
+            self.statusLabel.setText(str(e))
+            return
+
+        for path, obj_id, name, filename in results:
+            item = QListWidgetItem(f'{os.path.basename(path)}: {filename or name}')
+            item.setData(Qt.UserRole, path)
+            item.setToolTip(path)
+            self.resultList.addItem(item)
+
+        self.statusLabel.setText(f'{len(results)} results in {(time.perf_counter() - start) * 1000:.1f}ms')
+
+    def resultActivated(self, item):
+        self.callback(item.data(Qt.UserRole))
+
+    def showEvent(self, event):
+        # The dialog is reused, so an index closed with it is opened again
+        if self.index is None and self.databaseEdit.text():
+            self.openDatabase(self.databaseEdit.text())
+
+        QDialog.showEvent(self, event)
+
+    def closeEvent(self, event):
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+
+        QDialog.closeEvent(self, event)
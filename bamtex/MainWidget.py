@@ -1,10 +1,20 @@
-from PyQt5.QtCore import Qt
-from PyQt5.QtWidgets import QMessageBox, QShortcut, QTabWidget, QWidget, QAction, QMenuBar, QVBoxLayout, QHBoxLayout, QListView, QLabel, QFormLayout, QFileDialog
-from PyQt5.QtGui import QIcon, QKeySequence, QStandardItemModel, QStandardItem, QFont
-from p3bamboo.BamFile import BamFile
-from .Texture import Texture
-from . import Globals
-import traceback, webbrowser, os
+from PyQt5.QtCore import QSignalBlocker, QSize, Qt
+from PyQt5.QtWidgets import QAbstractItemView, QMessageBox, QShortcut, QTabWidget, QWidget, QAction, QMenuBar, QVBoxLayout, QHBoxLayout, QListView, QLabel, QLineEdit, QFormLayout, QFileDialog, QProgressBar, QPushButton, QStatusBar, QTabBar
+from PyQt5.QtGui import QIcon, QKeySequence, QFont, QPixmap
+from .BamWorker import BamWorker, loadBamFile, writeBamFile
+from .DiffDialog import DiffDialog
+from .IndexSearchDialog import IndexSearchDialog
+from .TextureBinding import TextureBinding
+from .TextureListModel import TextureListModel
+from .ThumbnailCache import THUMBNAIL_SIZE, ThumbnailCache
+from .Workspace import Workspace
+from . import Globals, Profiler
+import bisect, traceback, webbrowser, os
+
+# Largest edge of the simple RAM image preview
+PREVIEW_SIZE = 128
+
+SIMPLE_IMAGE_FIELDS = ('has_simple_ram_image', 'simple_x_size', 'simple_y_size', 'simple_ram_image')
 
 class MainWidget(QWidget):
 
@@ -13,6 +23,13 @@ class MainWidget(QWidget):
         self.base = base
         self.bam = None
         self.textures = []
+        self.filename = None
+        self.workspace = Workspace()
+        self.worker = None
+        self.workerAction = None
+        self.indexSearchDialog = None
+        self.thumbnails = ThumbnailCache(parent=self)
+        self.thumbnails.ready.connect(self.thumbnailReady)
 
         self.setWindowIcon(QIcon('icon.ico'))
         self.setWindowTitle('BamTeXEditor')
@@ -24,30 +41,83 @@ class MainWidget(QWidget):
         self.openAction = QAction('Open', self)
         self.saveAction = QAction('Save', self)
         self.saveAction.setEnabled(False)
+        self.closeAction = QAction('Close', self)
+        self.closeAction.setEnabled(False)
+        self.compareAction = QAction('Compare with...', self)
+        self.compareAction.setEnabled(False)
+        self.searchIndexAction = QAction('Search index...', self)
         self.gitHubAction = QAction('GitHub', self)
 
         self.fileMenu.addAction(self.openAction)
         self.fileMenu.addAction(self.saveAction)
+        self.fileMenu.addAction(self.closeAction)
+        self.fileMenu.addSeparator()
+        self.fileMenu.addAction(self.compareAction)
+        self.fileMenu.addAction(self.searchIndexAction)
         self.fileMenu.addSeparator()
         self.fileMenu.addAction(self.gitHubAction)
 
+        self.viewMenu = self.menuBar.addMenu('View')
+        self.thumbnailsAction = QAction('Thumbnails', self)
+        self.thumbnailsAction.setCheckable(True)
+        self.thumbnailsAction.setChecked(True)
+        self.viewMenu.addAction(self.thumbnailsAction)
+        self.thumbnailsAction.toggled.connect(self.showThumbnails)
+
         self.openAction.triggered.connect(self.openBamFile)
         self.saveAction.triggered.connect(self.saveBamFile)
+        self.closeAction.triggered.connect(self.closeCurrentTab)
+        self.compareAction.triggered.connect(self.openDiff)
+        self.searchIndexAction.triggered.connect(self.openIndexSearch)
         self.gitHubAction.triggered.connect(self.openGitHubPage)
 
         self.saveShortcut = QShortcut(QKeySequence("Ctrl+S"), self)
         self.saveShortcut.activated.connect(self.saveBamFile)
+        self.closeShortcut = QShortcut(QKeySequence("Ctrl+W"), self)
+        self.closeShortcut.activated.connect(self.closeCurrentTab)
+
+        # One tab per open file; their parsed files are kept in the workspace
+        self.tabBar = QTabBar()
+        self.tabBar.setTabsClosable(True)
+        self.tabBar.setExpanding(False)
+        self.tabBar.setDocumentMode(True)
+        self.tabBar.currentChanged.connect(self.tabChanged)
+        self.tabBar.tabCloseRequested.connect(self.closeTab)
+        # Clicking the current tab retries a file that could not be loaded
+        self.tabBar.tabBarClicked.connect(self.tabChanged)
+        self.tabBar.hide()
 
         self.baseWidget = QWidget()
         self.baseWidget.setContentsMargins(0, 0, 0, 0)
 
+        self.listWidget = QWidget()
+        self.searchEdit = QLineEdit()
+        self.searchEdit.setPlaceholderText('Search textures...')
+        self.searchEdit.setClearButtonEnabled(True)
+        self.searchEdit.textChanged.connect(self.filterTextures)
+
         self.listView = QListView()
+        self.listView.setUniformItemSizes(True)
+        self.listView.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.listView.setIconSize(QSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        self.listModel = TextureListModel([], self.listView)
+        self.listView.setModel(self.listModel)
+        self.listView.selectionModel().selectionChanged.connect(self.textureSelected)
+
+        self.listLayout = QVBoxLayout(self.listWidget)
+        self.listLayout.setContentsMargins(0, 0, 0, 0)
+        self.listLayout.addWidget(self.searchEdit)
+        self.listLayout.addWidget(self.listView)
 
+        self.settingsContainer = QWidget()
         self.settingsWidget = QTabWidget()
         self.settingsWidget.setContentsMargins(0, 0, 0, 0)
 
         font = QFont('Helvetica', 13)
         self.options = []
+        self.previewLabel = QLabel()
+        self.previewLabel.setMinimumSize(PREVIEW_SIZE, PREVIEW_SIZE)
+        self.previewLabel.setAlignment(Qt.AlignLeft | Qt.AlignTop)
 
         for name, options in Globals.TextureFields:
             tab = QWidget()
@@ -61,16 +131,49 @@ class MainWidget(QWidget):
                 tabLayout.addRow(optionLabel, optionWidget)
                 self.options.append(option)
 
+                if option.field == 'simple_ram_image':
+                    previewLabel = QLabel('Preview:')
+                    previewLabel.setFont(font)
+                    tabLayout.addRow(previewLabel, self.previewLabel)
+
             self.settingsWidget.addTab(tab, name)
 
+        self.binding = TextureBinding(self.options)
+        self.binding.changeCallback = self.texturesChanged
+        self.refreshLabel = QLabel()
+
+        self.settingsLayout = QVBoxLayout(self.settingsContainer)
+        self.settingsLayout.setContentsMargins(0, 0, 0, 0)
+        self.settingsLayout.addWidget(self.settingsWidget)
+        self.settingsLayout.addWidget(self.refreshLabel)
+
         self.horizontalLayout = QHBoxLayout(self.baseWidget)
-        self.horizontalLayout.addWidget(self.listView)
-        self.horizontalLayout.addWidget(self.settingsWidget)
+        self.horizontalLayout.addWidget(self.listWidget)
+        self.horizontalLayout.addWidget(self.settingsContainer)
+
+        self.progressWidget = QWidget()
+        self.progressBar = QProgressBar()
+        self.progressLabel = QLabel()
+        self.cancelButton = QPushButton('Cancel')
+        self.cancelButton.clicked.connect(self.cancelWorker)
+
+        self.progressLayout = QHBoxLayout(self.progressWidget)
+        self.progressLayout.addWidget(self.progressLabel)
+        self.progressLayout.addWidget(self.progressBar)
+        self.progressLayout.addWidget(self.cancelButton)
+        self.progressWidget.hide()
 
         self.baseLayout = QVBoxLayout(self)
         self.baseLayout.setContentsMargins(0, 0, 0, 0)
         self.baseLayout.addWidget(self.menuBar)
+        self.baseLayout.addWidget(self.tabBar)
         self.baseLayout.addWidget(self.baseWidget)
+        self.baseLayout.addWidget(self.progressWidget)
+
+        # Per-stage timings, only while profiling
+        self.statusBar = QStatusBar()
+        self.statusBar.setVisible(Profiler.isEnabled())
+        self.baseLayout.addWidget(self.statusBar)
 
         self.clear()
 
@@ -81,72 +184,381 @@ class MainWidget(QWidget):
         self.setPalette(palette)
 
     def clear(self):
-        for option in self.options:
-            option.clear()
-            option.disable()
+        self.binding.clear()
+        self.refreshLabel.clear()
+        self.previewLabel.clear()
 
     def openGitHubPage(self):
         webbrowser.open('https://github.com/P3DCAT/BamTeXEditor')
 
-    def openBamFile(self):
-        self.filename, _ = QFileDialog.getOpenFileName(self, "Open a Panda3D model!", "", "Panda3D BAM models (*.bam)")
+    def openIndexSearch(self):
+        if self.indexSearchDialog is None:
+            self.indexSearchDialog = IndexSearchDialog(self, self.openFile)
+
+        self.indexSearchDialog.show()
+        self.indexSearchDialog.raise_()
 
-        if not self.filename:
+    def openDiff(self):
+        if self.filename is None:
             return
 
-        self.bam = BamFile()
+        dialog = DiffDialog(self, self.filename, self.selectTexture)
+        dialog.setAttribute(Qt.WA_DeleteOnClose)
+        dialog.show()
+        dialog.browseFile()
 
-        try:
-            with open(self.filename, 'rb') as f:
-                self.bam.load(f)
-        except:
-            Globals.showError(f'Unfortunately, we could not load this model.\n\n{traceback.format_exc()}')
+    def selectTexture(self, filename, obj_id):
+        if filename != self.filename:
+            self.openFile(filename)
+
+            # Files that have to be parsed again are selected by hand once loaded
+            if filename != self.filename:
+                return
+
+        for i, texture in enumerate(self.textures):
+            if texture.obj_id == obj_id:
+                break
+        else:
             return
 
-        self.clear()
-        self.saveAction.setEnabled(True)
-        self.textures = [texture for texture in self.bam.object_map.values() if isinstance(texture, Texture)]
-        self.textures.sort(key=lambda tex: tex.filename or tex.name)
-        self.listModel = QStandardItemModel(self.listView)
+        # Filtered rows are kept in ascending order
+        rows = self.listModel.rows
+        row = bisect.bisect_left(rows, i)
 
-        for texture in self.textures:
-            item = QStandardItem(texture.filename or texture.name)
-            item.setEditable(False)
-            self.listModel.appendRow(item)
+        if row >= len(rows) or rows[row] != i:
+            # Filtered out, so the filter goes
+            self.searchEdit.clear()
+            row = i
 
-        self.listView.setModel(self.listModel)
-        self.listView.selectionModel().selectionChanged.connect(self.textureSelected)
+        index = self.listModel.index(row)
+        self.listView.setCurrentIndex(index)
+        self.listView.scrollTo(index)
+        self.raise_()
+        self.activateWindow()
+
+    def closeEvent(self, event):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker.wait()
+
+        self.thumbnails.stop()
+        QWidget.closeEvent(self, event)
+
+    def startWorker(self, action, text, callback, function, *args):
+        self.workerAction = action
+        self.openAction.setEnabled(False)
+        self.saveAction.setEnabled(False)
+        self.closeAction.setEnabled(False)
+        self.tabBar.setEnabled(False)
+        self.progressLabel.setText(text)
+        self.progressBar.setValue(0)
+        self.progressWidget.show()
+
+        self.worker = BamWorker(function, *args)
+        self.worker.progress.connect(self.progressBar.setValue)
+        self.worker.done.connect(callback)
+        self.worker.failed.connect(self.workerFailed)
+        self.worker.finished.connect(self.workerFinished)
+        self.worker.start()
+
+    def cancelWorker(self):
+        if self.worker is not None:
+            self.worker.cancel()
+
+    def workerFailed(self, error):
+        Globals.showError(f'Unfortunately, we could not {self.workerAction} this model.\n\n{error}')
+
+    def workerFinished(self):
+        self.worker = None
+        self.progressWidget.hide()
+        self.openAction.setEnabled(True)
+        self.saveAction.setEnabled(self.bam is not None)
+        self.closeAction.setEnabled(self.bam is not None)
+        self.tabBar.setEnabled(True)
+
+        # A tab whose file failed to load goes back to the file on screen
+        self.selectTab(self.filename)
+        self.updateStatus()
+
+    def openBamFile(self):
+        if self.worker is not None:
+            return
+
+        filename, _ = QFileDialog.getOpenFileName(self, "Open a Panda3D model!", "", "Panda3D BAM models (*.bam)")
+
+        if filename:
+            self.openFile(filename)
+
+    def openFile(self, filename):
+        if self.worker is not None:
+            return
+
+        filename = os.path.abspath(filename)
+
+        index = self.findTab(filename)
+
+        if index >= 0:
+            self.tabBar.setCurrentIndex(index)
+        else:
+            self.loadFile(filename)
+
+    def loadFile(self, filename):
+        self.startWorker('load', 'Loading...', self.bamLoaded, loadBamFile, filename)
+
+    def bamLoaded(self, result):
+        bam, textures = result
+        filename = self.worker.args[0]
+
+        # Pinned first, so making room for it can never evict it
+        self.workspace.pin(filename)
+        self.workspace.put(filename, bam, textures)
+
+        if self.findTab(filename) < 0:
+            blocker = QSignalBlocker(self.tabBar)
+            index = self.tabBar.addTab(os.path.basename(filename))
+            self.tabBar.setTabToolTip(index, filename)
+            self.tabBar.setTabData(index, filename)
+            blocker.unblock()
+            self.tabBar.show()
+
+        self.showFile(filename, bam, textures)
+
+    def showFile(self, filename, bam, textures):
+        if self.filename != filename:
+            if self.filename is not None:
+                self.workspace.unpin(self.filename)
+
+            self.workspace.pin(filename)
+
+        self.bam, self.textures, self.filename = bam, textures, filename
+        self.selectTab(filename)
+
+        with Profiler.span('populate', textures=len(self.textures)):
+            self.clear()
+            self.thumbnails.clear()
+            listModel = TextureListModel(self.textures, self.listView)
+            listModel.setFilter(self.searchEdit.text())
+
+            if self.thumbnailsAction.isChecked():
+                listModel.setThumbnails(self.thumbnails)
+
+            self.setListModel(listModel)
 
         self.setWindowTitle(f'BamTeXEditor - {os.path.basename(self.filename)}')
+        self.saveAction.setEnabled(self.worker is None)
+        self.closeAction.setEnabled(self.worker is None)
+        self.compareAction.setEnabled(True)
 
         if self.textures:
-            self.openTexture(0)
+            self.openTexture(self.textures[0])
+
+    def clearFile(self):
+        if self.filename is not None:
+            self.workspace.unpin(self.filename)
+
+        self.bam, self.textures, self.filename = None, [], None
+        self.clear()
+        self.thumbnails.clear()
+        self.setListModel(TextureListModel(self.textures, self.listView))
+        self.setWindowTitle('BamTeXEditor')
+        self.saveAction.setEnabled(False)
+        self.closeAction.setEnabled(False)
+        self.compareAction.setEnabled(False)
+
+    def setListModel(self, listModel):
+        oldModel = self.listModel
+        oldSelection = self.listView.selectionModel()
+
+        self.listModel = listModel
+        self.listView.setModel(listModel)
+        self.listView.selectionModel().selectionChanged.connect(self.textureSelected)
+
+        # The view owns neither, so they would hold on to their texture lists for the life of the window
+        oldModel.setThumbnails(None)
+        oldModel.deleteLater()
+        oldSelection.deleteLater()
+
+    def findTab(self, filename):
+        for i in range(self.tabBar.count()):
+            if self.tabBar.tabData(i) == filename:
+                return i
+
+        return -1
+
+    def selectTab(self, filename):
+        index = self.findTab(filename)
+
+        if index >= 0 and index != self.tabBar.currentIndex():
+            blocker = QSignalBlocker(self.tabBar)
+            self.tabBar.setCurrentIndex(index)
+            blocker.unblock()
+
+    def updateTabText(self):
+        index = self.findTab(self.filename)
+
+        if index >= 0:
+            self.tabBar.setTabText(index, os.path.basename(self.filename) + (' *' if self.bam.is_dirty() else ''))
+
+    def tabChanged(self, index):
+        if index < 0:
+            self.clearFile()
+            self.tabBar.hide()
+            return
+
+        filename = self.tabBar.tabData(index)
+
+        if filename == self.filename or self.worker is not None:
+            return
+
+        entry = self.workspace.get(filename)
+
+        if entry is not None:
+            self.showFile(filename, *entry)
+        else:
+            # Evicted to stay under the memory cap, so it is parsed again
+            self.loadFile(filename)
+
+    def closeCurrentTab(self):
+        if self.tabBar.currentIndex() >= 0:
+            self.closeTab(self.tabBar.currentIndex())
+
+    def closeTab(self, index):
+        if self.worker is not None:
+            return
+
+        filename = self.tabBar.tabData(index)
+        entry = self.workspace.get(filename)
+
+        if entry is not None and entry[0].is_dirty():
+            if QMessageBox.question(self, 'BamTeXEditor', f'{os.path.basename(filename)} has unsaved changes. Close it anyway?', QMessageBox.Yes | QMessageBox.No, QMessageBox.No) != QMessageBox.Yes:
+                return
+
+        if filename == self.filename:
+            self.clearFile()
+
+        self.workspace.unpin(filename)
+        self.workspace.remove(filename)
+
+        # The next tab, or nothing, is shown through tabChanged()
+        self.tabBar.removeTab(index)
 
     def saveBamFile(self):
-        if not self.saveAction.isEnabled():
+        if not self.saveAction.isEnabled() or self.worker is not None:
+            return
+
+        if not self.bam.is_dirty():
+            QMessageBox.information(self, 'BamTeXEditor', 'There are no changes to save.', QMessageBox.Ok)
             return
 
         if QMessageBox.question(self, 'BamTeXEditor', 'Are you sure you want to save your changes?', QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes) != QMessageBox.Yes:
             return
 
         try:
-            with open(self.filename, 'wb') as f:
-                self.bam.write(f)
+            # Edits made while the file is being written are not part of this save
+            snapshot = self.bam.snapshot()
         except:
             Globals.showError(f'Unfortunately, we could not save this model.\n\n{traceback.format_exc()}')
             return
 
+        self.startWorker('save', 'Saving...', self.bamSaved, writeBamFile, snapshot, self.filename)
+
+    def bamSaved(self, result):
+        tempFilename, spans = result
+        snapshot = self.worker.args[0]
+
+        # Widgets such as the hex view show payloads in place, so they let go of
+        # the mapping before it is released and are loaded again from the new one
+        textures = self.binding.getTextures()
+        self.binding.clear()
+
+        try:
+            # The original must be unmapped before it can be replaced
+            self.bam.release()
+            os.replace(tempFilename, self.filename)
+
+            if spans is not None:
+                with open(self.filename, 'rb') as f:
+                    self.bam.remap(f, spans)
+        except:
+            Globals.showError(f'Unfortunately, we could not save this model.\n\n{traceback.format_exc()}')
+            return
+
+        self.bam.mark_clean(snapshot)
+
+        if textures:
+            self.openTextures(textures)
+
+        # Refreshes its memory estimate; clean files may be evicted again
+        self.workspace.put(self.filename, self.bam, self.textures)
+        self.updateTabText()
         QMessageBox.information(self, 'BamTeXEditor', f'{os.path.basename(self.filename)} has been saved!', QMessageBox.Ok)
 
-    def openTexture(self, index):
-        self.index = index
-        texture = self.textures[index]
+    def openTexture(self, texture):
+        self.openTextures([texture])
+
+    def openTextures(self, textures):
+        with Profiler.span('openTexture', textures=len(textures)):
+            # Every option edits all of the selected textures at once
+            self.binding.setTextures(textures, self.bam.version)
+            self.refreshLabel.setText(f'{len(textures)} selected, refreshed in {self.binding.lastRefreshTime * 1000:.1f}ms')
+            self.updatePreview()
+
+        self.updateStatus()
+
+    def updateStatus(self):
+        if Profiler.isEnabled():
+            self.statusBar.showMessage(Profiler.formatSummary())
+
+    def updatePreview(self):
+        textures = self.binding.getTextures()
+
+        if len(textures) != 1:
+            self.previewLabel.setText('Mixed' if textures else '')
+            return
+
+        texture = textures[0]
+
+        if not texture.has_simple_ram_image:
+            self.previewLabel.setText('No image')
+            return
+
+        entry = self.thumbnails.getEntry(texture)
+
+        if entry is None:
+            # The preview is filled in by thumbnailReady() once decoded
+            self.previewLabel.setText('Decoding...')
+        elif entry[1] is None:
+            self.previewLabel.setText('The image does not match its size.')
+        else:
+            image = entry[1].scaled(PREVIEW_SIZE, PREVIEW_SIZE, Qt.KeepAspectRatio, Qt.FastTransformation)
+            self.previewLabel.setPixmap(QPixmap.fromImage(image))
+
+    def thumbnailReady(self, obj_id):
+        textures = self.binding.getTextures()
+
+        if len(textures) == 1 and textures[0].obj_id == obj_id:
+            self.updatePreview()
+
+    def showThumbnails(self, checked):
+        self.listModel.setThumbnails(self.thumbnails if checked else None)
+
+    def texturesChanged(self, textures, changes):
+        self.updateStatus()
+        self.updateTabText()
+
+        if any(field in changes for field in SIMPLE_IMAGE_FIELDS):
+            self.listModel.refreshThumbnails(textures)
+            self.updatePreview()
+
+    def filterTextures(self, text):
+        self.listModel.setFilter(text)
+
+    def textureSelected(self, selected, deselected):
+        textures = []
 
-        for option in self.options:
-            option.setObject(texture)
-            option.enable(self.bam.version)
-            option.loadValue()
+        # Walk the selected ranges instead of creating an index per selected row
+        for selectionRange in self.listView.selectionModel().selection():
+            textures.extend(self.listModel.textureAt(row) for row in range(selectionRange.top(), selectionRange.bottom() + 1))
 
-    def textureSelected(self, selection):
-        index = selection.indexes()[0].row()
-        self.openTexture(index)
+        if textures:
+            self.openTextures(textures)
@@ -0,0 +1,394 @@
+from p3bamboo.BamFactory import BamFactory
+from p3bamboo.BamFile import BamFile
+from p3bamboo.BamGlobals import BAMException
+from p3bamboo.StructDatagram import StructDatagramException, StructDatagramIterator
+from p3bamboo import BamGlobals
+from collections import OrderedDict
+import copy, mmap, os, struct
+
+# Enough to hold the opcode, type handle definitions and object pointer of nearly every object
+PREFIX_SIZE = 4096
+
+# Unchanged regions are copied in chunks of this size so progress can be reported
+COPY_CHUNK_SIZE = 16 * 1024 * 1024
+
+class MappedDatagramIterator(StructDatagramIterator):
+    """
+    A datagram iterator over a memoryview instead of bytes.
+    """
+
+    def __init__(self, view):
+        StructDatagramIterator.__init__(self)
+        self.data = view
+
+    def get_fixed_string(self, size):
+        return bytes(self.extract_bytes(size)).decode('utf-8')
+
+class MappedBamFile(BamFile):
+    """
+    A BamFile that maps the model instead of reading it.
+
+    Objects keep memoryviews over their bytes in the map, and registered types
+    (such as Texture) are decoded straight from the map. Large vertex and image
+    payloads are not paged in unless they are read or the file is written.
+    """
+
+    def __init__(self):
+        BamFile.__init__(self)
+        self.mapping = None
+        self.view = None
+        self.progress_callback = None
+        self.write_size = 0
+
+    def report_progress(self, done, total):
+        # The callback may raise to cancel the operation
+        if self.progress_callback is not None:
+            self.progress_callback(done, total)
+
+    def load(self, f):
+        offset = self.map_header(f)
+
+        while offset < len(self.view):
+            datagram_start = offset
+            start, offset = self.read_mapped_datagram(offset)
+            self.read_mapped_object_code(datagram_start, start, offset)
+            self.report_progress(offset, len(self.view))
+
+    def scan(self, f, node_type):
+        """
+        Walks the object stream without storing it, decoding and yielding only the
+        objects whose type resolves to node_type through BamFactory.
+        Every other object is skipped by its datagram length.
+        """
+        for obj_id, handle_name, data in self.scan_raw(f, node_type):
+            node = BamFactory.create(self, self.version, handle_name)
+            self.load_mapped_node(node, {'obj_id': obj_id, 'data': data})
+            yield node
+
+    def scan_raw(self, f, node_type):
+        """
+        Same as scan, but yields (obj_id, handle name, data view) of the objects
+        without decoding them.
+        """
+        offset = self.map_header(f)
+        resolved = {}
+
+        while offset < len(self.view):
+            start, offset = self.read_mapped_datagram(offset)
+
+            if self.version >= (6, 21):
+                opcode = self.view[start]
+                start += 1
+            else:
+                opcode = BamGlobals.BOC_adjunct
+
+            if opcode != BamGlobals.BOC_push and opcode != BamGlobals.BOC_adjunct:
+                continue
+
+            handle_id, obj_id, data_start = self.read_mapped_prefix(start, offset)
+
+            if handle_id not in resolved:
+                handle_type = BamFactory.types.get(self.type_handles[handle_id]['name'])
+                resolved[handle_id] = handle_type is not None and issubclass(handle_type, node_type)
+
+            if resolved[handle_id]:
+                yield obj_id, self.type_handles[handle_id]['name'], self.view[data_start:offset]
+
+        # Yielded objects may still hold views, so the map closes once they are gone
+        self.view = None
+        self.mapping = None
+
+    def map_header(self, f):
+        """
+        Maps f and reads the BAM header.
+        Returns the offset of the first object datagram.
+        """
+        self.release()
+
+        # Empty files can not be mapped at all
+        if os.fstat(f.fileno()).st_size < len(self.HEADER):
+            raise BAMException('Invalid BAM header.')
+
+        self.mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mapping)
+
+        if self.view[:len(self.HEADER)] != self.HEADER:
+            raise BAMException('Invalid BAM header.')
+
+        start, end = self.read_mapped_datagram(len(self.HEADER))
+        hdi = StructDatagramIterator(bytes(self.view[start:end]))
+
+        self.bam_major_ver = hdi.get_uint16()
+        self.bam_minor_ver = hdi.get_uint16()
+        self.version = (self.bam_major_ver, self.bam_minor_ver)
+        self.read_long_pointers = False
+        self.type_handles = {}
+        self.file_datas = []
+        self.objects.clear()
+
+        if self.version >= (5, 0):
+            self.file_endian = hdi.get_uint8()
+        else:
+            self.file_endian = 1
+
+        if self.version >= (6, 27):
+            self.stdfloat_double = hdi.get_bool()
+        else:
+            self.stdfloat_double = False
+
+        self.nesting_level = 0
+        self.unknown_handles = []
+        self.object_map = {}
+        self.pta_map = {}
+        return end
+
+    def read_mapped_datagram(self, offset):
+        num_bytes, = struct.unpack_from('<I', self.view, offset)
+        offset += 4
+
+        if num_bytes == 0xFFFFFFFF:
+            extra_bytes, = struct.unpack_from('<I', self.view, offset)
+            num_bytes += extra_bytes
+            offset += 4
+
+        if offset + num_bytes > len(self.view):
+            raise BAMException(f'Truncated datagram at offset {offset}.')
+
+        return offset, offset + num_bytes
+
+    def read_mapped_object_code(self, datagram_start, start, end):
+        payload_start = start
+
+        if self.version >= (6, 21):
+            opcode = self.view[start]
+            start += 1
+        else:
+            opcode = BamGlobals.BOC_adjunct
+
+        if opcode == BamGlobals.BOC_push:
+            self.nesting_level += 1
+            self.read_mapped_object(datagram_start, payload_start, start, end)
+        elif opcode == BamGlobals.BOC_pop:
+            self.nesting_level -= 1
+        elif opcode == BamGlobals.BOC_adjunct:
+            self.read_mapped_object(datagram_start, payload_start, start, end)
+        elif opcode == BamGlobals.BOC_remove:
+            self.read_freed_object_codes(StructDatagramIterator(bytes(self.view[start:end])))
+        elif opcode == BamGlobals.BOC_file_data:
+            self.file_datas.append(self.read_file_data(StructDatagramIterator(bytes(self.view[start:end]))))
+
+    def read_mapped_prefix(self, start, end):
+        type_handles = dict(self.type_handles)
+
+        try:
+            dgi = StructDatagramIterator(bytes(self.view[start:min(end, start + PREFIX_SIZE)]))
+            return self.read_handle(dgi), self.read_pointer(dgi), start + dgi.get_current_index()
+        except StructDatagramException:
+            # Unusually long type definition: forget the partial read and use the whole datagram
+            self.type_handles = type_handles
+            dgi = StructDatagramIterator(bytes(self.view[start:end]))
+            return self.read_handle(dgi), self.read_pointer(dgi), start + dgi.get_current_index()
+
+    def read_mapped_object(self, datagram_start, payload_start, start, end):
+        handle_id, obj_id, data_start = self.read_mapped_prefix(start, end)
+        handle_name = self.type_handles[handle_id]['name']
+        node = BamFactory.create(self, self.version, handle_name)
+        obj = {'handle_id': handle_id, 'handle_name': handle_name, 'obj_id': obj_id, 'data': self.view[data_start:end]}
+
+        # Where the object lives in the file, and its opcode, type handle and pointer
+        # exactly as they were written, so write_changes() can splice in new data
+        obj['span'] = (datagram_start, data_start, end)
+        obj['prefix'] = bytes(self.view[payload_start:data_start])
+
+        if node is not None:
+            self.load_mapped_node(node, obj)
+            self.object_map[obj_id] = node
+        elif handle_name not in self.unknown_handles:
+            self.unknown_handles.append(handle_name)
+
+        if obj_id in self.objects:
+            raise BAMException(f'Object ID {obj_id} ({handle_name}) was encountered twice in the BAM stream!')
+
+        self.objects[obj_id] = obj
+
+    def load_mapped_node(self, node, obj):
+        # Same as BamObject.load_object, which only accepts bytes
+        node.obj_id = obj['obj_id']
+
+        di = MappedDatagramIterator(obj['data'])
+        node.load(di)
+
+        if di.get_remaining_size() > 0:
+            node.extra_data = bytes(di.get_remaining_bytes())
+
+    def write_object(self, dg, opcode, obj=None, written_handles=None):
+        # Registered objects are re-encoded by BamFile.write_object itself
+        if obj is not None and obj['obj_id'] not in self.object_map and isinstance(obj['data'], memoryview):
+            obj = dict(obj, data=bytes(obj['data']))
+
+        BamFile.write_object(self, dg, opcode, obj, written_handles)
+
+        if obj is not None:
+            self.report_progress(dg.get_length(), self.write_size)
+
+    def write(self, f):
+        if self.view is not None:
+            self.write_size = len(self.view)
+        else:
+            self.write_size = sum(len(obj['data']) for obj in self.objects.values())
+
+        BamFile.write(self, f)
+
+    def is_dirty(self):
+        return any(getattr(node, 'dirty', False) for node in self.object_map.values())
+
+    def get_changes(self):
+        return {obj_id: node.to_binary(self.version) for obj_id, node in self.object_map.items() if getattr(node, 'dirty', False)}
+
+    def snapshot(self):
+        """
+        Returns a copy of the object stream that can be written from another thread.
+        Dirty objects are serialized now, so later edits do not leak into the
+        snapshot; everything else is shared with this file.
+        """
+        snapshot = copy.copy(self)
+        snapshot.mapping = None
+        snapshot.progress_callback = None
+
+        if self.view is not None:
+            snapshot.changes = self.get_changes()
+            return snapshot
+
+        # Nothing to splice into: fall back to writing every object
+        snapshot.changes = None
+        snapshot.objects = OrderedDict()
+        snapshot.object_map = {}
+        snapshot.file_datas = list(self.file_datas)
+
+        for obj_id, obj in self.objects.items():
+            instance = self.object_map.get(obj_id)
+
+            if instance is not None:
+                obj = dict(obj, data=instance.to_binary(self.version))
+
+            snapshot.objects[obj_id] = obj
+
+        return snapshot
+
+    def copy_mapped_range(self, f, start, end):
+        while start < end:
+            chunk_end = min(end, start + COPY_CHUNK_SIZE)
+            f.write(self.view[start:chunk_end])
+            start = chunk_end
+            self.report_progress(start, len(self.view))
+
+    def write_changes(self, f, changes):
+        """
+        Writes the mapped file with the data of the changed objects replaced,
+        copying every other byte through verbatim.
+        Returns the new span of every object, to be passed to remap().
+        """
+        spans = {}
+        position = 0
+        delta = 0
+
+        for obj_id, obj in self.objects.items():
+            start, data_start, end = obj['span']
+
+            if obj_id not in changes:
+                spans[obj_id] = (start + delta, data_start + delta, end + delta)
+                continue
+
+            self.copy_mapped_range(f, position, start)
+
+            data = obj['prefix'] + changes[obj_id]
+
+            if len(data) >= 0xFFFFFFFF:
+                header = struct.pack('<II', 0xFFFFFFFF, len(data) - 0xFFFFFFFF)
+            else:
+                header = struct.pack('<I', len(data))
+
+            f.write(header)
+            f.write(data)
+
+            new_start = start + delta
+            new_data_start = new_start + len(header) + len(obj['prefix'])
+            delta += len(header) + len(data) - (end - start)
+            spans[obj_id] = (new_start, new_data_start, end + delta)
+            position = end
+
+        self.copy_mapped_range(f, position, len(self.view))
+        return spans
+
+    def write_temp_file(self, filename, changes=None):
+        """
+        Writes next to filename, which may still be mapped, and returns the temporary
+        filename and the new object spans (None after a full write).
+        The caller replaces filename with it once the original is unmapped.
+        """
+        temp_filename = f'{filename}.tmp'
+
+        try:
+            with open(temp_filename, 'wb') as f:
+                if changes is None or self.view is None:
+                    self.write(f)
+                    spans = None
+                else:
+                    spans = self.write_changes(f, changes)
+        except:
+            os.remove(temp_filename)
+            raise
+
+        return temp_filename, spans
+
+    def mark_clean(self, snapshot):
+        # Objects that were edited again while the snapshot was written stay dirty
+        for obj_id, node in self.object_map.items():
+            if not getattr(node, 'dirty', False):
+                continue
+
+            if snapshot.changes is None:
+                written = snapshot.objects[obj_id]['data']
+            else:
+                written = snapshot.changes.get(obj_id)
+
+            if written == node.to_binary(self.version):
+                node.dirty = False
+
+    def remap(self, f, spans):
+        """
+        Maps a file written by write_changes() in place of the original.
+        """
+        self.release()
+
+        self.mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mapping)
+
+        for obj_id, obj in self.objects.items():
+            obj['span'] = spans[obj_id]
+            obj['data'] = self.view[spans[obj_id][1]:spans[obj_id][2]]
+
+    def release(self):
+        """
+        Copies every mapped object into memory and unmaps the file.
+        This must happen before the file is overwritten.
+        """
+        if self.mapping is None:
+            return
+
+        for obj in self.objects.values():
+            if isinstance(obj['data'], memoryview):
+                view = obj['data']
+                obj['data'] = bytes(view)
+                view.release()
+
+        for node in self.object_map.values():
+            for key, value in vars(node).items():
+                if isinstance(value, memoryview):
+                    setattr(node, key, bytes(value))
+                    value.release()
+
+        self.view.release()
+        self.view = None
+        self.mapping.close()
+        self.mapping = None
@@ -0,0 +1,62 @@
+from concurrent.futures import ProcessPoolExecutor
+from p3bamboo.BamFile import BamFile
+from .MappedBamFile import MappedBamFile
+from . import Batch
+import os, sys, time
+
+"""
+  Compares open latency and peak RSS of the regular and memory-mapped load paths.
+  Every measurement runs in a fresh process so peak RSS is not shared between them.
+"""
+
+LOADERS = {
+    'read': BamFile,
+    'mmap': MappedBamFile
+}
+
+def getPeakRss():
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Linux reports kilobytes, macOS reports bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def measureOpen(filename, loader):
+    Batch.registerTypes()
+    baseline = getPeakRss()
+    start = time.perf_counter()
+    bam = LOADERS[loader]()
+
+    with open(filename, 'rb') as f:
+        bam.load(f)
+
+    elapsed = time.perf_counter() - start
+    peak = getPeakRss()
+    return elapsed, len(bam.objects), None if peak is None else peak - baseline
+
+def addArguments(parser):
+    parser.add_argument('files', nargs='+', help='BAM files to open')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='number of runs per load path')
+
+def run(args):
+    for filename in args.files:
+        megabytes = os.path.getsize(filename) / (1024 * 1024)
+        print(f'{filename} ({megabytes:.1f} MB)')
+
+        for loader in LOADERS:
+            times = []
+
+            for _ in range(args.repeat):
+                with ProcessPoolExecutor(max_workers=1) as executor:
+                    elapsed, objects, peak = executor.submit(measureOpen, filename, loader).result()
+
+                times.append(elapsed)
+
+            peak = 'n/a' if peak is None else f'{peak / (1024 * 1024):.1f} MB'
+            print(f'  {loader}: {min(times) * 1000:.1f}ms best of {args.repeat}, {objects} objects, peak RSS growth {peak}')
+
+    return 0
@@ -1,6 +1,8 @@
+from PyQt5.QtCore import QSignalBlocker, Qt
 from PyQt5.QtGui import QDoubleValidator, QFont, QIntValidator
 from PyQt5.QtWidgets import QComboBox, QLineEdit, QCheckBox
 from .ColorWidget import ColorWidget
+from .HexWidget import HexWidget
 from .OptionGlobals import *
 from . import Globals
 
@@ -25,7 +27,8 @@ class Option(object):
         self.enum_type = enum_type
         self.bam_version = bam_version
         self.widget = None
-        self.obj = None
+        self.objects = []
+        self.binding = None
         self.originalValue = None
 
     def getName(self):
@@ -35,17 +38,29 @@ class Option(object):
         return self.widget
 
     def getObject(self):
-        return self.obj
+        return self.objects[0] if self.objects else None
 
-    def setObject(self, obj):
-        self.obj = obj
+    def getObjects(self):
+        return self.objects
+
+    def setObjects(self, objects):
+        self.objects = objects
+
+    def setBinding(self, binding):
+        self.binding = binding
 
     def getValue(self):
-        return getattr(self.obj, self.field)
+        return getattr(self.objects[0], self.field)
+
+    def isMixed(self):
+        value = self.getValue()
+        field = self.field
+        return any(getattr(obj, field) != value for obj in self.objects)
 
     def setValue(self, value):
-        if self.obj is not None:
-            setattr(self.obj, self.field, value)
+        # User edits are applied as change sets through the binding
+        if self.binding is not None and self.objects:
+            self.binding.applyChanges({self.field: value})
 
     def createWidget(self, parent):
         font = QFont('Helvetica', 13)
@@ -53,14 +68,18 @@ class Option(object):
         if self.field_type == BOOL:
             self.widget = QCheckBox(parent)
             self.widget.stateChanged.connect(self.checkboxChecked)
-            self.checkboxChecked(False)
+            # Only the label; creating a widget never writes to the textures of a previous binding
+            self.updateCheckboxText(Qt.Unchecked)
         elif self.field_type == COLOR:
             self.widget = ColorWidget(parent)
             self.widget.connect(self.colorSet)
+        elif self.field_type == BLOB:
+            self.widget = HexWidget(parent)
+            self.widget.connect(self.setValue)
         elif self.field_type == ENUM:
             self.widget = QComboBox(parent)
             self.widget.addItems(Globals.Enums[self.enum_type])
-            self.widget.currentIndexChanged.connect(self.setValue)
+            self.widget.currentIndexChanged.connect(self.enumChanged)
         else:
             self.widget = QLineEdit(parent)
             self.widget.editingFinished.connect(self.textChanged)
@@ -80,13 +99,19 @@ class Option(object):
         return self.widget
 
     def clear(self):
+        blocker = QSignalBlocker(self.widget)
+
         if self.field_type == BOOL:
+            self.widget.setTristate(False)
             self.widget.setChecked(False)
+            self.updateCheckboxText(Qt.Unchecked)
         elif self.field_type == ENUM:
             self.widget.setCurrentIndex(0)
         else:
             self.widget.clear()
 
+        blocker.unblock()
+
     def enable(self, bam_version):
         if self.bam_version is None or bam_version >= self.bam_version:
             self.widget.setEnabled(True)
@@ -98,26 +123,57 @@ class Option(object):
 
     def loadValue(self):
         value = self.getValue()
+        mixed = len(self.objects) > 1 and self.isMixed()
 
-        if self.field_type == BOOL:
-            self.widget.setChecked(value)
-        elif self.field_type == COLOR:
-            self.widget.loadPandaColor(value)
-        elif self.field_type == ENUM:
-            self.widget.setCurrentIndex(value)
+        # Refreshing a widget must never report its new value back as an edit
+        blocker = QSignalBlocker(self.widget)
+
+        try:
+            if self.field_type == BOOL:
+                self.widget.setTristate(mixed)
+                self.widget.setCheckState(Qt.PartiallyChecked if mixed else Qt.Checked if value else Qt.Unchecked)
+                self.updateCheckboxText(self.widget.checkState())
+            elif self.field_type == COLOR:
+                if mixed:
+                    self.widget.setMixed()
+                else:
+                    self.widget.loadPandaColor(value, notify=False)
+            elif self.field_type == BLOB:
+                # Payloads may be memoryviews; they are shown in place, never as a string
+                if mixed:
+                    self.widget.setMixed()
+                else:
+                    self.widget.loadData(value)
+            elif self.field_type == ENUM:
+                self.widget.setCurrentIndex(-1 if mixed else value)
+            else:
+                if mixed:
+                    self.originalValue = ''
+                else:
+                    self.originalValue = str(value)
+
+                self.widget.setPlaceholderText('Mixed' if mixed else '')
+                self.widget.setText(self.originalValue)
+        finally:
+            blocker.unblock()
+
+    def updateCheckboxText(self, state):
+        if state == Qt.PartiallyChecked:
+            self.widget.setText('Mixed')
         else:
-            self.originalValue = str(value)
+            self.widget.setText('Enabled' if state else 'Disabled')
 
-            if self.field_type == BLOB:
-                # Strip b'' from string
-                self.originalValue = self.originalValue[2:-1]
+    def checkboxChecked(self, state):
+        if state != Qt.PartiallyChecked:
+            # Once clicked, a mixed checkbox only toggles between the real values
+            self.widget.setTristate(False)
+            self.setValue(bool(state))
 
-            self.widget.setText(self.originalValue)
+        self.updateCheckboxText(state)
 
-    def checkboxChecked(self, checked):
-        checked = bool(checked)
-        self.setValue(checked)
-        self.widget.setText('Enabled' if checked else 'Disabled')
+    def enumChanged(self, index):
+        if index >= 0:
+            self.setValue(index)
 
     def colorSet(self, color):
         color = Globals.qtColorToPanda(color)
@@ -134,23 +190,80 @@ class Option(object):
             (self.field_type == INT32 and (value < MIN_INT32 or value > MAX_INT32))
         )
 
-    def textChanged(self):
-        value = self.widget.text()
-
-        if self.field_type == FLOAT:
-            value = float(value)
+    def formatValue(self, value):
+        if self.field_type == BOOL:
+            return 'true' if value else 'false'
+        elif self.field_type == ENUM:
+            names = Globals.Enums[self.enum_type]
+            return names[value] if 0 <= value < len(names) else str(value)
+        elif self.field_type == COLOR:
+            r, g, b, a = [int(value[i] * 255.0) for i in range(4)]
+            return f'#{a:02x}{r:02x}{g:02x}{b:02x}'
         elif self.field_type == BLOB:
+            return str(bytes(value))[2:-1]
+
+        return str(value)
+
+    def parseText(self, text):
+        if self.field_type == BOOL:
+            lowered = text.strip().lower()
+
+            if lowered in ('1', 'true', 'yes', 'on', 'enabled'):
+                return True
+            elif lowered in ('0', 'false', 'no', 'off', 'disabled'):
+                return False
+
+            raise ValueError('This value is invalid.')
+        elif self.field_type == ENUM:
+            names = [name.lower() for name in Globals.Enums[self.enum_type]]
+
+            if text.strip().lower() in names:
+                return names.index(text.strip().lower())
+
             try:
-                value = bytes(value, encoding='raw_unicode_escape')
-            except:
-                Globals.showError(f'This value is invalid.\n\nThe original value {self.originalValue} has been restored.')
-                self.restoreText()
-                return
-        elif self.field_type != STRING:
-            value = int(value)
+                value = int(text)
+            except ValueError:
+                raise ValueError('This value is invalid.')
+
+            if value < 0 or value >= len(names):
+                raise ValueError('This value is out of bounds.')
+
+            return value
+        elif self.field_type == COLOR:
+            color = Globals.hexToColor(text)
+
+            if color is None:
+                raise ValueError('This value is invalid.')
+
+            return Globals.qtColorToPanda(color)
+
+        try:
+            if self.field_type == FLOAT:
+                value = float(text)
+            elif self.field_type == BLOB:
+                value = bytes(text, encoding='raw_unicode_escape')
+            elif self.field_type == STRING:
+                value = text
+            else:
+                value = int(text)
+        except ValueError:
+            raise ValueError('This value is invalid.')
 
         if self.isOutOfBounds(value):
-            Globals.showError(f'This value is out of bounds.\n\nThe original value {self.originalValue} has been restored.')
+            raise ValueError('This value is out of bounds.')
+
+        return value
+
+    def textChanged(self):
+        text = self.widget.text()
+
+        if text == self.originalValue:
+            return
+
+        try:
+            value = self.parseText(text)
+        except ValueError as e:
+            Globals.showError(f'{e}\n\nThe original value {self.originalValue} has been restored.')
             self.restoreText()
             return
 
@@ -0,0 +1,147 @@
+import atexit, json, os, threading, time
+
+"""
+  Optional timing spans around the editor's load, populate, edit and save stages.
+
+  Profiling is enabled by starting the editor with a trace file:
+
+  python -m bamtex --trace trace.json
+  BAMTEX_TRACE=trace.json python -m bamtex
+
+  The spans are written there as a Chrome trace when the editor exits, which
+  chrome://tracing and Perfetto can open. While profiling, the editor shows the
+  latest timing and object count of every stage in its status bar.
+"""
+
+TRACE_VARIABLE = 'BAMTEX_TRACE'
+
+# Stages in the order a file goes through them, for the summary
+STAGES = ['load', 'scan', 'sort', 'populate', 'openTexture', 'edit', 'write']
+
+traceFilename = None
+origin = time.perf_counter_ns()
+events = []
+stages = {}
+threadNames = {}
+lock = threading.Lock()
+
+class Span(object):
+    __slots__ = ('name', 'args', 'start')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.start = 0
+
+    def set(self, **args):
+        # Counts are usually only known once the stage is done
+        self.args.update(args)
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        addSpan(self.name, self.start, time.perf_counter_ns(), self.args)
+
+class NullSpan(object):
+    """
+    Returned while profiling is disabled, so spans cost one call and no allocation.
+    """
+
+    def set(self, **args):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+NULL_SPAN = NullSpan()
+
+def isEnabled():
+    return traceFilename is not None
+
+def enable(filename):
+    global traceFilename
+
+    if traceFilename is None:
+        atexit.register(save)
+
+    traceFilename = filename
+
+def enableFromEnvironment():
+    filename = os.environ.get(TRACE_VARIABLE)
+
+    if filename:
+        enable(filename)
+
+def span(name, **args):
+    return Span(name, args) if traceFilename is not None else NULL_SPAN
+
+def addSpan(name, start, end, args):
+    thread = threading.current_thread()
+    event = {
+        'name': name,
+        'ph': 'X',
+        'ts': (start - origin) / 1000,
+        'dur': (end - start) / 1000,
+        'pid': os.getpid(),
+        'tid': thread.ident,
+        'args': args
+    }
+
+    with lock:
+        events.append(event)
+        threadNames[thread.ident] = thread.name
+        count, total, _, _ = stages.get(name, (0, 0, 0, None))
+        stages[name] = (count + 1, total + end - start, end - start, args)
+
+def getStage(name):
+    """
+    Returns (count, total seconds, last seconds, last args) of a stage, or None.
+    """
+    with lock:
+        stage = stages.get(name)
+
+    if stage is None:
+        return None
+
+    count, total, last, args = stage
+    return count, total / 1e9, last / 1e9, args
+
+def formatSummary():
+    parts = []
+
+    for name in STAGES:
+        stage = getStage(name)
+
+        if stage is None:
+            continue
+
+        count, total, last, args = stage
+        part = f'{name} {last * 1000:.1f}ms'
+        details = [f'{value} {key}' for key, value in args.items() if isinstance(value, int)]
+
+        if count > 1:
+            details.append(f'{count} runs, {total * 1000:.1f}ms total')
+
+        if details:
+            part += f' ({", ".join(details)})'
+
+        parts.append(part)
+
+    return ' | '.join(parts)
+
+def getTrace():
+    with lock:
+        metadata = [{'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': ident, 'args': {'name': name}} for ident, name in threadNames.items()]
+        return {'traceEvents': metadata + events, 'displayTimeUnit': 'ms'}
+
+def save():
+    if traceFilename is None:
+        return
+
+    with open(traceFilename, 'w') as f:
+        json.dump(getTrace(), f)
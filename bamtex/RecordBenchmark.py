@@ -0,0 +1,56 @@
+from p3bamboo.StructDatagram import StructDatagramIterator
+from .CodecBenchmark import makeDatagram
+from .Texture import Texture
+from .TextureRecord import TextureRecord
+from .TextureScanner import scanTextures
+from . import Batch
+import gc, tracemalloc
+
+"""
+  Measures the memory held per texture by Texture objects and by TextureRecords.
+  Payloads are left as views over their datagram and are not counted.
+"""
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    items = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return items, size
+
+def decodeSynthetic(count):
+    bam, data = makeDatagram((6, 45))
+
+    for _ in range(count):
+        texture = Texture(bam, (6, 45))
+        texture.load(StructDatagramIterator(data))
+        yield texture
+
+def readTextures(args):
+    if args.paths:
+        return (texture for filename in Batch.findBamFiles(args.paths) for texture in scanTextures(filename))
+
+    return decodeSynthetic(args.count)
+
+def addArguments(parser):
+    parser.add_argument('paths', nargs='*', help='BAM files or directory trees to read textures from (default: synthetic textures)')
+    parser.add_argument('-n', '--count', type=int, default=100000, help='number of synthetic textures')
+
+def run(args):
+    Batch.registerTypes()
+
+    textures, textureSize = measure(lambda: list(readTextures(args)))
+    count = len(textures)
+    del textures
+
+    if not count:
+        raise ValueError('No textures found.')
+
+    # Records are built while decoding, like readRecords(), so they own their strings
+    records, recordSize = measure(lambda: [TextureRecord.fromTexture(texture) for texture in readTextures(args)])
+
+    print(f'{count} textures')
+    print(f'  Texture:       {textureSize / count:8.0f} bytes per texture, {textureSize / (1024 * 1024):.1f} MB')
+    print(f'  TextureRecord: {recordSize / count:8.0f} bytes per texture, {recordSize / (1024 * 1024):.1f} MB')
+    return 0
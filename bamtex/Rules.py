@@ -0,0 +1,359 @@
+from .OptionGlobals import *
+from .TextureRecord import toTuple
+from . import Batch
+import fnmatch, json, operator, os, re, time, traceback
+
+"""
+  Enforces house rules on texture fields across an asset tree.
+
+  A rules file is a JSON list of rules. Every rule matches textures and assigns
+  fields to them; rules apply in order, so later rules win:
+
+  [
+    {"name": "gui", "match": {"filename": "*maps/gui/*"},
+     "set": {"wrap_u": "Clamp", "wrap_v": "Clamp", "minfilter": "Linear", "magfilter": "Linear"}},
+    {"name": "ground", "match": {"name": "re:ground|floor", "texture_type": "2D Texture", "bam_version": ">=6.36"},
+     "set": {"anisotropic_degree": 8, "minfilter": "Mipmap Trilinear"}}
+  ]
+
+  filename and name take globs, or regexes prefixed with re: (matched anywhere).
+  texture_type and tex_format take enum names, and bam_version takes X.Y with an
+  optional comparison. Every condition also takes a list of alternatives.
+
+  python -m bamtex rules house.json phase_3/ -n
+"""
+
+STRING_FIELDS = ['filename', 'name']
+
+ENUM_FIELDS = ['texture_type', 'tex_format']
+
+MATCH_FIELDS = STRING_FIELDS + ENUM_FIELDS + ['bam_version']
+
+COMPARISONS = {
+    '': operator.eq,
+    '==': operator.eq,
+    '>=': operator.ge,
+    '<=': operator.le,
+    '>': operator.gt,
+    '<': operator.lt
+}
+
+VERSION_PATTERN = re.compile(r'^\s*(==|>=|<=|>|<)?\s*(\d+(?:\.\d+)?)\s*$')
+
+def toList(value):
+    return value if isinstance(value, list) else [value]
+
+def toPattern(pattern):
+    """
+    Returns (source, regex) for a match pattern. The source matches from the
+    start of a string and is merged into the RuleSet's regex; the regex tests
+    a string alone with search().
+    """
+    if not isinstance(pattern, str):
+        raise ValueError(f'Expected a pattern string, got {pattern!r}.')
+
+    if pattern.startswith('re:'):
+        try:
+            regex = re.compile(pattern[3:])
+        except re.error as e:
+            raise ValueError(f'Invalid regex "{pattern[3:]}": {e}')
+
+        return f'.*?(?:{pattern[3:]})', regex
+
+    source = fnmatch.translate(pattern)
+    return source, re.compile(r'\A' + source)
+
+def parseVersionCondition(text):
+    match = VERSION_PATTERN.match(str(text))
+
+    if match is None:
+        raise ValueError(f'Invalid bam version condition "{text}".')
+
+    comparison, version = match.groups()
+    return COMPARISONS[comparison or ''], Batch.parseVersion(version)
+
+def parseValue(field, value):
+    option = Batch.findOption(field)
+
+    if option is None or option.field_type == BLOB:
+        raise ValueError(f'Unknown texture field "{field}".')
+
+    if isinstance(value, bool):
+        value = 'true' if value else 'false'
+
+    try:
+        value = option.parseText(str(value))
+    except ValueError as e:
+        raise ValueError(f'{field}: {e}')
+
+    # Colors are compared with the tuples textures load
+    return toTuple(value) if option.field_type == COLOR else value
+
+class Rule(object):
+
+    def __init__(self, index, data):
+        if not isinstance(data, dict):
+            raise ValueError(f'Rule {index + 1} is not a JSON object.')
+
+        self.name = str(data.get('name', f'rule {index + 1}'))
+        self.conditions = data.get('match', {})
+        unknown = set(data) - {'name', 'match', 'set'}
+
+        if unknown:
+            raise ValueError(f'{self.name}: Unknown keys {", ".join(sorted(unknown))}.')
+
+        if not isinstance(self.conditions, dict):
+            raise ValueError(f'{self.name}: "match" must be a JSON object.')
+
+        for field in self.conditions:
+            if field not in MATCH_FIELDS:
+                raise ValueError(f'{self.name}: Can not match on "{field}", only on {", ".join(MATCH_FIELDS)}.')
+
+        try:
+            self.values = {field: parseValue(field, value) for field, value in data.get('set', {}).items()}
+            self.patterns = {field: [toPattern(pattern) for pattern in toList(self.conditions[field])] for field in STRING_FIELDS if field in self.conditions}
+            self.enums = {field: {parseValue(field, value) for value in toList(self.conditions[field])} for field in ENUM_FIELDS if field in self.conditions}
+            self.versions = [parseVersionCondition(text) for text in toList(self.conditions.get('bam_version', []))]
+        except ValueError as e:
+            raise ValueError(f'{self.name}: {e}')
+
+        if not self.values:
+            raise ValueError(f'{self.name}: The rule does not set anything.')
+
+    def matchesVersion(self, version):
+        return not self.versions or any(comparison(version, expected) for comparison, expected in self.versions)
+
+class RuleSet(object):
+    """
+    Every rule compiled into one matcher.
+
+    Rule i is bit i of a mask. Each string field is tested once against a single
+    regex of optional lookaheads, one named group per rule pattern, and enum and
+    version conditions become precomputed masks, so a texture is tested once no
+    matter how many rules there are. Patterns that can not share a regex, such
+    as ones with inline flags or groups of their own, are tested one by one.
+    """
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.allRules = (1 << len(rules)) - 1
+        self.matchers = {}
+
+        for field in STRING_FIELDS:
+            groups = []
+            regexes = []
+            bits = []
+            unconstrained = self.allRules
+
+            for i, rule in enumerate(rules):
+                if field not in rule.patterns:
+                    continue
+
+                unconstrained &= ~(1 << i)
+
+                for source, regex in rule.patterns[field]:
+                    groups.append(f'(?=(?:(?P<r{len(bits)}>{source}))?)')
+                    regexes.append(regex)
+                    bits.append(1 << i)
+
+            if bits:
+                self.matchers[field] = (self.mergePatterns(groups, bits), regexes, bits, unconstrained)
+
+        self.clearCaches()
+
+    @staticmethod
+    def mergePatterns(groups, bits):
+        """
+        Returns the regex of every pattern of a field, or None if they can not be merged.
+        """
+        try:
+            merged = re.compile(''.join(groups))
+        except re.error:
+            # Such as inline flags, which are only allowed at the start of a regex
+            return None
+
+        # Groups of the patterns themselves would shift the rule groups and their backreferences
+        return merged if merged.groups == len(bits) else None
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename) as f:
+            try:
+                data = json.load(f)
+            except ValueError as e:
+                raise ValueError(f'{filename}: {e}')
+
+        if isinstance(data, dict):
+            data = data.get('rules')
+
+        if not isinstance(data, list):
+            raise ValueError(f'{filename}: Expected a list of rules.')
+
+        return cls([Rule(i, rule) for i, rule in enumerate(data)])
+
+    def clearCaches(self):
+        self.enumMasks = {field: {} for field in ENUM_FIELDS}
+        self.mergedValues = {}
+
+    def __getstate__(self):
+        # Caches are rebuilt in every worker process
+        state = dict(self.__dict__)
+        del state['enumMasks'], state['mergedValues']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.clearCaches()
+
+    def getVersionMask(self, version):
+        mask = 0
+
+        for i, rule in enumerate(self.rules):
+            if rule.matchesVersion(version):
+                mask |= 1 << i
+
+        return mask
+
+    def getEnumMask(self, field, value):
+        masks = self.enumMasks[field]
+        mask = masks.get(value)
+
+        if mask is None:
+            mask = 0
+
+            for i, rule in enumerate(self.rules):
+                if field not in rule.enums or value in rule.enums[field]:
+                    mask |= 1 << i
+
+            masks[value] = mask
+
+        return mask
+
+    def getStringMask(self, field, text):
+        matcher = self.matchers.get(field)
+
+        if matcher is None:
+            return self.allRules
+
+        merged, regexes, bits, mask = matcher
+
+        if merged is None:
+            for regex, bit in zip(regexes, bits):
+                if not mask & bit and regex.search(text):
+                    mask |= bit
+
+            return mask
+
+        match = merged.match(text)
+
+        for group, bit in zip(match.groups(), bits):
+            if group is not None:
+                mask |= bit
+
+        return mask
+
+    def match(self, texture, versionMask):
+        """
+        Returns the mask of the rules matching texture.
+        """
+        mask = versionMask
+
+        for field in ENUM_FIELDS:
+            if mask:
+                mask &= self.getEnumMask(field, getattr(texture, field))
+
+        for field in STRING_FIELDS:
+            if mask:
+                mask &= self.getStringMask(field, getattr(texture, field))
+
+        return mask
+
+    def getValues(self, mask):
+        """
+        Returns the fields assigned by the rules in mask, later rules winning.
+        """
+        values = self.mergedValues.get(mask)
+
+        if values is None:
+            values = {}
+
+            for i, rule in enumerate(self.rules):
+                if mask & (1 << i):
+                    values.update(rule.values)
+
+            self.mergedValues[mask] = values
+
+        return values
+
+def applyRules(filename, ruleSet, dryRun):
+    start = time.perf_counter()
+    result = {'filename': filename, 'size': os.path.getsize(filename), 'changed': 0, 'hits': [0] * len(ruleSet.rules), 'skipped': set(), 'error': None}
+
+    try:
+        bam = Batch.loadBamFile(filename)
+        versionMask = ruleSet.getVersionMask(bam.version)
+        hits = result['hits']
+        result['version'] = '%d.%d' % bam.version
+
+        for texture in Batch.getTextures(bam) if versionMask else ():
+            mask = ruleSet.match(texture, versionMask)
+
+            if not mask:
+                continue
+
+            for i in range(len(hits)):
+                if mask & (1 << i):
+                    hits[i] += 1
+
+            # Fields the texture does not store would be dropped on save
+            changed, skipped = Batch.assignFields(texture, ruleSet.getValues(mask))
+            result['skipped'].update(skipped)
+
+            if changed:
+                result['changed'] += 1
+
+        if result['changed'] and not dryRun:
+            Batch.saveBamFile(bam, filename)
+    except Exception:
+        result['error'] = traceback.format_exc()
+
+    result['time'] = time.perf_counter() - start
+    return result
+
+def addArguments(parser):
+    parser.add_argument('rules', help='JSON rules file')
+    parser.add_argument('paths', nargs='+', help='BAM files or directory trees to enforce the rules on')
+    parser.add_argument('-n', '--dry-run', action='store_true', help='report what would change without writing')
+    Batch.addPoolArguments(parser)
+
+def run(args):
+    ruleSet = RuleSet.load(args.rules)
+    files = list(Batch.findBamFiles(args.paths))
+    throughput = Batch.Throughput()
+    hits = [0] * len(ruleSet.rules)
+    changed = 0
+    failed = 0
+
+    for result in Batch.runInPool(applyRules, files, args.jobs, ruleSet, args.dry_run):
+        throughput.add(result['size'])
+
+        if result['error']:
+            failed += 1
+            print(f'{result["filename"]}: FAILED in {result["time"] * 1000:.1f}ms\n{result["error"]}')
+            continue
+
+        hits = [total + count for total, count in zip(hits, result['hits'])]
+        changed += result['changed']
+
+        if result['changed']:
+            print(f'{result["filename"]}: {result["changed"]} textures {"would change" if args.dry_run else "changed"} in {result["time"] * 1000:.1f}ms')
+
+        if result['skipped']:
+            print(f'{result["filename"]}: {", ".join(sorted(result["skipped"]))} not stored by some textures of this bam {result["version"]} file, skipped')
+
+    for rule, count in zip(ruleSet.rules, hits):
+        print(f'{rule.name}: {count} textures matched')
+
+    print(f'{changed} textures {"would change" if args.dry_run else "changed"}')
+    print(throughput.summary())
+    return 1 if failed else 0
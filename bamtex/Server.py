@@ -0,0 +1,368 @@
+from .Texture import Texture
+from .TextureExport import getExportedOptions, parseCell, toExported
+from .Workspace import DEFAULT_CACHE_BYTES, Workspace
+from . import Batch
+import asyncio, contextlib, json, os, signal, stat, time, traceback
+
+"""
+  A long running process that keeps recently used BAM files parsed and answers
+  JSON-RPC 2.0 requests about them, one JSON object per line, over a Unix socket
+  or a localhost TCP port.
+
+  python -m bamtex serve --socket /tmp/bamtex.sock
+  echo '{"jsonrpc": "2.0", "id": 1, "method": "list-textures", "params": {"file": "phase_3/models/gui.bam"}}' | nc -U /tmp/bamtex.sock
+
+  Methods:
+    list-textures {file, fields?}           [{obj_id, name, filename, ...fields}]
+    get-fields    {file, obj_id, fields?}   {field: value}
+    set-fields    {file, obj_ids, values}   {changed}   (or obj_id)
+    save          {file}                    {saved}
+    close         {file, discard?}          {closed}
+    stats         {}                        {files, locks, bytes, max_bytes, dirty}
+
+  Values are exported like python -m bamtex export: enums by name, colors as
+  #aarrggbb. Edits stay in memory until save, and files with unsaved edits are
+  never dropped from the cache. Requests on the same file are serialized.
+"""
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 7830
+
+# Longest request line, for large set-fields batches
+MAX_LINE_SIZE = 16 * 1024 * 1024
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+class RpcError(Exception):
+
+    def __init__(self, code, message):
+        Exception.__init__(self, message)
+        self.code = code
+
+def loadFile(filename):
+    bam = Batch.loadBamFile(filename)
+    return bam, Batch.getTextures(bam)
+
+def saveFile(bam, filename):
+    """
+    Writes the changes of bam over filename, keeping bam mapped to the new file.
+    """
+    snapshot = bam.snapshot()
+    tempFilename, spans = snapshot.write_temp_file(filename, snapshot.changes)
+
+    # The original must be unmapped before it can be replaced
+    bam.release()
+    os.replace(tempFilename, filename)
+
+    if spans is not None:
+        with open(filename, 'rb') as f:
+            bam.remap(f, spans)
+
+    bam.mark_clean(snapshot)
+
+class Server(object):
+
+    def __init__(self, maxBytes=DEFAULT_CACHE_BYTES):
+        self.workspace = Workspace(maxBytes)
+        self.locks = {}
+        self.options = {option.field: option for option in getExportedOptions()}
+        self.methods = {
+            'list-textures': self.listTextures,
+            'get-fields': self.getFields,
+            'set-fields': self.setFields,
+            'save': self.save,
+            'close': self.close,
+            'stats': self.stats
+        }
+
+    @contextlib.asynccontextmanager
+    async def lockFile(self, filename):
+        """
+        Holds the lock of filename. Locks are counted by the requests using them,
+        and dropped once the file is no longer open and nobody waits on them.
+        """
+        entry = self.locks.get(filename)
+
+        if entry is None:
+            entry = self.locks[filename] = [asyncio.Lock(), 0]
+
+        entry[1] += 1
+
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+
+            if filename not in self.workspace:
+                self.dropLock(filename)
+
+    def dropLock(self, filename):
+        entry = self.locks.get(filename)
+
+        if entry is not None and not entry[1]:
+            del self.locks[filename]
+
+    def putFile(self, filename, bam, textures):
+        for evicted in self.workspace.put(filename, bam, textures):
+            self.dropLock(evicted)
+
+    def getFilename(self, params):
+        filename = params.get('file')
+
+        if not isinstance(filename, str):
+            raise RpcError(INVALID_PARAMS, 'Expected a "file" parameter.')
+
+        return os.path.abspath(filename)
+
+    async def getFile(self, filename):
+        """
+        Returns (bam, textures) of filename, parsing it off the event loop if it is not cached.
+        The file's lock must be held.
+        """
+        entry = self.workspace.get(filename)
+
+        if entry is None:
+            if not os.path.isfile(filename):
+                raise RpcError(INVALID_PARAMS, f'{filename} does not exist.')
+
+            entry = await asyncio.get_running_loop().run_in_executor(None, loadFile, filename)
+            self.putFile(filename, *entry)
+
+        return entry
+
+    def getOptions(self, params):
+        fields = params.get('fields')
+
+        if fields is None:
+            return list(self.options.values())
+
+        if not isinstance(fields, list) or any(field not in self.options for field in fields):
+            raise RpcError(INVALID_PARAMS, f'"fields" must be a list of {", ".join(self.options)}.')
+
+        return [self.options[field] for field in fields]
+
+    def getTexture(self, bam, obj_id):
+        texture = bam.object_map.get(obj_id) if isinstance(obj_id, int) else None
+
+        if not isinstance(texture, Texture):
+            raise RpcError(INVALID_PARAMS, f'{obj_id!r} is not the obj_id of a texture.')
+
+        return texture
+
+    def exportFields(self, texture, options):
+        return {option.field: toExported(option, getattr(texture, option.field)) for option in options}
+
+    async def listTextures(self, params):
+        filename = self.getFilename(params)
+        options = self.getOptions(params) if 'fields' in params else []
+
+        async with self.lockFile(filename):
+            _, textures = await self.getFile(filename)
+            return [dict(obj_id=texture.obj_id, name=texture.name, filename=texture.filename, **self.exportFields(texture, options)) for texture in textures]
+
+    async def getFields(self, params):
+        filename = self.getFilename(params)
+        options = self.getOptions(params)
+
+        async with self.lockFile(filename):
+            bam, _ = await self.getFile(filename)
+            return self.exportFields(self.getTexture(bam, params.get('obj_id')), options)
+
+    async def setFields(self, params):
+        filename = self.getFilename(params)
+        obj_ids = [params['obj_id']] if 'obj_id' in params else params.get('obj_ids')
+        values = params.get('values')
+
+        if not isinstance(obj_ids, list) or not isinstance(values, dict):
+            raise RpcError(INVALID_PARAMS, 'Expected "obj_id" or "obj_ids", and "values" parameters.')
+
+        parsed = {}
+
+        for field, value in values.items():
+            option = self.options.get(field)
+
+            if option is None:
+                raise RpcError(INVALID_PARAMS, f'Unknown texture field "{field}".')
+
+            if isinstance(value, bool):
+                value = 'true' if value else 'false'
+
+            try:
+                parsed[field] = parseCell(option, str(value))
+            except ValueError as e:
+                raise RpcError(INVALID_PARAMS, f'{field}: {e}')
+
+        async with self.lockFile(filename):
+            bam, _ = await self.getFile(filename)
+            textures = [self.getTexture(bam, obj_id) for obj_id in obj_ids]
+            changed = 0
+
+            # Fields a texture does not store would be dropped on save
+            for texture in textures:
+                for field in parsed:
+                    if not Batch.isStored(self.options[field], texture, parsed):
+                        raise RpcError(INVALID_PARAMS, f'{field} is not stored by texture {texture.obj_id} of this bam {bam.version[0]}.{bam.version[1]} file.')
+
+            for texture in textures:
+                # Compared as exported too, so resending a value read earlier changes nothing
+                if Batch.assignFields(texture, parsed, formatted=True)[0]:
+                    changed += 1
+
+            return {'changed': changed}
+
+    async def save(self, params):
+        filename = self.getFilename(params)
+
+        async with self.lockFile(filename):
+            entry = self.workspace.get(filename)
+
+            if entry is None or not entry[0].is_dirty():
+                return {'saved': False}
+
+            await asyncio.get_running_loop().run_in_executor(None, saveFile, entry[0], filename)
+
+            # Refreshes its memory estimate; clean files may be evicted again
+            self.putFile(filename, *entry)
+            return {'saved': True}
+
+    async def close(self, params):
+        filename = self.getFilename(params)
+
+        async with self.lockFile(filename):
+            entry = self.workspace.get(filename)
+
+            if entry is not None and entry[0].is_dirty() and not params.get('discard'):
+                raise RpcError(INVALID_PARAMS, f'{filename} has unsaved changes; save it or pass "discard": true.')
+
+            return {'closed': self.workspace.remove(filename)}
+
+    async def stats(self, params):
+        return {
+            'files': len(self.workspace),
+            'locks': len(self.locks),
+            'bytes': self.workspace.totalBytes,
+            'max_bytes': self.workspace.maxBytes,
+            'dirty': [filename for filename, (bam, _, _) in self.workspace.entries.items() if bam.is_dirty()]
+        }
+
+    async def handleRequest(self, request):
+        """
+        Returns the response to one JSON-RPC request, or None for notifications.
+        """
+        if not isinstance(request, dict) or request.get('jsonrpc') != '2.0' or not isinstance(request.get('method'), str):
+            return {'jsonrpc': '2.0', 'id': None, 'error': {'code': INVALID_REQUEST, 'message': 'Invalid request.'}}
+
+        requestId = request.get('id')
+        method = self.methods.get(request['method'])
+        params = request.get('params', {})
+
+        try:
+            if method is None:
+                raise RpcError(METHOD_NOT_FOUND, f'Unknown method "{request["method"]}".')
+
+            if not isinstance(params, dict):
+                raise RpcError(INVALID_PARAMS, 'Expected named parameters.')
+
+            response = {'jsonrpc': '2.0', 'id': requestId, 'result': await method(params)}
+        except RpcError as e:
+            response = {'jsonrpc': '2.0', 'id': requestId, 'error': {'code': e.code, 'message': str(e)}}
+        except Exception as e:
+            response = {'jsonrpc': '2.0', 'id': requestId, 'error': {'code': SERVER_ERROR, 'message': str(e), 'data': traceback.format_exc()}}
+
+        return response if 'id' in request else None
+
+    async def handleLine(self, line):
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            return {'jsonrpc': '2.0', 'id': None, 'error': {'code': PARSE_ERROR, 'message': str(e)}}
+
+        if not isinstance(request, list):
+            return await self.handleRequest(request)
+
+        if not request:
+            return {'jsonrpc': '2.0', 'id': None, 'error': {'code': INVALID_REQUEST, 'message': 'Empty batch.'}}
+
+        responses = [response for response in [await self.handleRequest(item) for item in request] if response is not None]
+        return responses or None
+
+    async def handleConnection(self, reader, writer):
+        # Requests of one connection are answered in order; connections run concurrently
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    writer.write(json.dumps({'jsonrpc': '2.0', 'id': None, 'error': {'code': INVALID_REQUEST, 'message': 'Request too long.'}}).encode('utf-8') + b'\n')
+                    break
+
+                if not line:
+                    break
+
+                if not line.strip():
+                    continue
+
+                response = await self.handleLine(line)
+
+                if response is not None:
+                    writer.write(json.dumps(response).encode('utf-8') + b'\n')
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, socketPath=None, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        if socketPath:
+            server = await asyncio.start_unix_server(self.handleConnection, socketPath, limit=MAX_LINE_SIZE)
+            print(f'Listening on {socketPath}', flush=True)
+        else:
+            server = await asyncio.start_server(self.handleConnection, host, port, limit=MAX_LINE_SIZE)
+            print(f'Listening on {host}:{server.sockets[0].getsockname()[1]}', flush=True)
+
+        try:
+            # Stops like Ctrl+C, so the socket is removed and unsaved files are reported
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        except NotImplementedError:
+            pass
+
+        async with server:
+            await server.serve_forever()
+
+def addArguments(parser):
+    parser.add_argument('--socket', metavar='PATH', help='listen on a Unix socket instead of TCP')
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f'TCP address to listen on (default: {DEFAULT_HOST})')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'TCP port to listen on (default: {DEFAULT_PORT})')
+    parser.add_argument('--cache-mb', type=int, default=DEFAULT_CACHE_BYTES // (1024 * 1024), help='estimated memory of parsed files kept warm, in MB')
+
+def removeSocket(path):
+    # Only a socket left behind by an earlier run, never another file
+    if path and os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+        os.remove(path)
+
+def run(args):
+    Batch.registerTypes()
+    server = Server(args.cache_mb * 1024 * 1024)
+
+    removeSocket(args.socket)
+    start = time.perf_counter()
+
+    try:
+        asyncio.run(server.serve(args.socket, args.host, args.port))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    finally:
+        removeSocket(args.socket)
+
+    dirty = [filename for filename, (bam, _, _) in server.workspace.entries.items() if bam.is_dirty()]
+
+    for filename in dirty:
+        print(f'{filename}: unsaved changes discarded')
+
+    print(f'Served for {time.perf_counter() - start:.0f}s')
+    return 0
@@ -0,0 +1,292 @@
+from panda3d.core import Filename, loadPrcFileData
+from panda3d.core import Texture as P3Texture
+from . import Batch
+import os, struct, time, traceback
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+"""
+  Regenerates the simple RAM images of textures, the small previews Panda shows
+  while the full texture is still loading.
+
+  The source image is read from the texture's filename and alpha_filename on
+  disk, or decoded from its embedded raw data, and box filtered down with NumPy.
+
+  python -m bamtex simple-image phase_3/ --model-path resources/
+"""
+
+# Panda's default simple-image-size
+DEFAULT_SIZE = 16
+
+# The config page of configureImageLoading(), added once per process
+imageConfig = None
+
+def requireNumpy():
+    if numpy is None:
+        raise ValueError('Regenerating simple RAM images requires NumPy.')
+
+def toBgra(pixels):
+    """
+    Expands (height, width, components) pixels in Panda's B, G, R, A order to four components.
+    """
+    height, width, components = pixels.shape
+
+    if components == 4:
+        return pixels
+
+    bgra = numpy.empty((height, width, 4), dtype=numpy.uint8)
+    bgra[..., 3] = 255
+
+    if components >= 3:
+        bgra[..., :3] = pixels[..., :3]
+    else:
+        # Luminance, with alpha in the second component
+        bgra[..., :3] = pixels[..., :1]
+
+        if components == 2:
+            bgra[..., 3] = pixels[..., 1]
+
+    return bgra
+
+def readRawData(texture):
+    """
+    Decodes the first RAM image of an embedded, uncompressed 8-bit 2D texture.
+    Returns BGRA pixels, bottom row first, or None if the data can not be used.
+    """
+    data = texture.texture_data
+    version = texture.bam_version
+    offset = 12
+    x_size, y_size, z_size = struct.unpack_from('<III', data, 0)
+
+    if version >= (6, 30):
+        offset += 12
+
+    num_views = 1
+
+    if version >= (6, 26):
+        num_views, = struct.unpack_from('<I', data, offset)
+        offset += 4
+
+    component_type, component_width = struct.unpack_from('<BB', data, offset)
+    offset += 2
+    compression = 0
+
+    if version >= (6, 1):
+        compression = data[offset]
+        offset += 1
+
+    if version >= (6, 3):
+        if data[offset] == 0:
+            return None
+
+        offset += 1
+
+    if version >= (6, 1):
+        offset += 4 # page size
+
+    size, = struct.unpack_from('<I', data, offset)
+    offset += 4
+    components = texture.num_components
+    expected = x_size * y_size * components
+
+    if component_type != P3Texture.T_unsigned_byte or component_width != 1 or compression != P3Texture.CM_off or z_size != 1 or num_views != 1:
+        return None
+
+    if size < expected or not 1 <= components <= 4:
+        return None
+
+    pixels = numpy.frombuffer(data, numpy.uint8, expected, offset).reshape(y_size, x_size, components)
+    return toBgra(pixels)
+
+def findImage(filename, searchPath):
+    if not filename:
+        return None
+
+    if os.path.isabs(filename):
+        return filename if os.path.isfile(filename) else None
+
+    for directory in searchPath:
+        candidate = os.path.join(directory, filename)
+
+        if os.path.isfile(candidate):
+            return candidate
+
+    return None
+
+def getSearchPath(bamFilename, modelPath):
+    # The model path first, then the model's own directory and every directory above it
+    searchPath = list(modelPath)
+    directory = os.path.dirname(os.path.abspath(bamFilename))
+
+    while True:
+        searchPath.append(directory)
+        parent = os.path.dirname(directory)
+
+        if parent == directory:
+            return searchPath
+
+        directory = parent
+
+def configureImageLoading():
+    global imageConfig
+
+    # Simple images are built from the image as stored, not rescaled to a power of two
+    if imageConfig is None:
+        imageConfig = loadPrcFileData('', 'textures-power-2 none')
+
+def readImageFiles(colorFilename, alphaFilename, texture):
+    """
+    Reads the color and alpha images the way Panda does when it loads the texture.
+    Returns BGRA pixels, bottom row first, or None.
+    """
+    image = P3Texture()
+
+    # An empty alpha filename reads the color image alone
+    alphaFilename = Filename.fromOsSpecific(alphaFilename) if alphaFilename else Filename()
+    loaded = image.read(Filename.fromOsSpecific(colorFilename), alphaFilename, texture.primary_file_num_channels, texture.alpha_file_channel)
+
+    if not loaded or image.getZSize() != 1:
+        return None
+
+    data = bytes(image.getRamImageAs('BGRA'))
+    return numpy.frombuffer(data, numpy.uint8).reshape(image.getYSize(), image.getXSize(), 4)
+
+def boxFilter(pixels, width, height):
+    """
+    Averages every source pixel into the destination pixel it falls in.
+    Images smaller than the destination are repeated up to it first.
+    """
+    sourceHeight, sourceWidth = pixels.shape[:2]
+
+    if sourceWidth < width:
+        pixels = pixels[:, numpy.arange(width) * sourceWidth // width]
+        sourceWidth = width
+
+    if sourceHeight < height:
+        pixels = pixels[numpy.arange(height) * sourceHeight // height]
+        sourceHeight = height
+
+    columns = numpy.arange(width) * sourceWidth // width
+    rows = numpy.arange(height) * sourceHeight // height
+    sums = numpy.add.reduceat(numpy.add.reduceat(pixels.astype(numpy.uint32), rows, axis=0), columns, axis=1)
+    counts = numpy.diff(numpy.append(rows, sourceHeight))[:, None] * numpy.diff(numpy.append(columns, sourceWidth))[None, :]
+    return ((sums + counts[..., None] // 2) // counts[..., None]).astype(numpy.uint8)
+
+class Skipped(Exception):
+    pass
+
+def findSource(texture, searchPath, source):
+    """
+    Returns a function reading the pixels of the best source of texture, and the
+    modification time of its image files (None for embedded raw data).
+    Raises Skipped with the reason if there is none.
+    """
+    if source != 'file' and texture.has_rawdata and len(texture.texture_data):
+        return lambda: readRawData(texture), None
+
+    if source == 'rawdata':
+        raise Skipped('no raw data')
+
+    colorFilename = findImage(texture.filename, searchPath)
+    alphaFilename = None
+
+    if colorFilename is None:
+        raise Skipped('image file not found')
+
+    if texture.alpha_filename:
+        alphaFilename = findImage(texture.alpha_filename, searchPath)
+
+        if alphaFilename is None:
+            raise Skipped('alpha file not found')
+
+    mtime = max(os.path.getmtime(filename) for filename in (colorFilename, alphaFilename) if filename)
+    return lambda: readImageFiles(colorFilename, alphaFilename, texture), mtime
+
+def isStale(texture, mtime):
+    return not texture.has_simple_ram_image or (mtime is not None and mtime > texture.simple_image_date_generated)
+
+def regenerateTexture(texture, searchPath, size, source, force, now):
+    read, mtime = findSource(texture, searchPath, source)
+
+    if not force and not isStale(texture, mtime):
+        raise Skipped('up to date')
+
+    pixels = read()
+
+    if pixels is None:
+        raise Skipped('unsupported image data')
+
+    # Existing simple images keep their size
+    width = texture.simple_x_size if texture.has_simple_ram_image and texture.simple_x_size else size
+    height = texture.simple_y_size if texture.has_simple_ram_image and texture.simple_y_size else size
+
+    texture.simple_ram_image = boxFilter(pixels, width, height).tobytes()
+    texture.simple_x_size = width
+    texture.simple_y_size = height
+    texture.simple_image_date_generated = now
+    texture.has_simple_ram_image = True
+    texture.dirty = True
+
+def regenerateFile(filename, modelPath, size, source, force):
+    start = time.perf_counter()
+    result = {'filename': filename, 'size': os.path.getsize(filename), 'changed': 0, 'skipped': {}, 'error': None}
+
+    try:
+        configureImageLoading()
+        bam = Batch.loadBamFile(filename)
+        searchPath = getSearchPath(filename, modelPath)
+        now = int(time.time())
+
+        for texture in Batch.getTextures(bam):
+            try:
+                regenerateTexture(texture, searchPath, size, source, force, now)
+            except Skipped as e:
+                reason = str(e)
+                result['skipped'][reason] = result['skipped'].get(reason, 0) + 1
+            else:
+                result['changed'] += 1
+
+        if result['changed']:
+            Batch.saveBamFile(bam, filename)
+    except Exception:
+        result['error'] = traceback.format_exc()
+
+    result['time'] = time.perf_counter() - start
+    return result
+
+def addArguments(parser):
+    parser.add_argument('paths', nargs='+', help='BAM files or directory trees to update')
+    parser.add_argument('--model-path', action='append', default=[], metavar='DIRECTORY', help='directory texture filenames are relative to; the directories of each model are searched too')
+    parser.add_argument('--size', type=int, default=DEFAULT_SIZE, help=f'edge length of new simple images (default: {DEFAULT_SIZE}); existing ones keep their size')
+    parser.add_argument('--source', choices=['auto', 'file', 'rawdata'], default='auto', help='where to read the image from; auto prefers embedded raw data over image files')
+    parser.add_argument('--force', action='store_true', help='regenerate simple images that are newer than their image files')
+    Batch.addPoolArguments(parser)
+
+def run(args):
+    requireNumpy()
+    files = list(Batch.findBamFiles(args.paths))
+    throughput = Batch.Throughput()
+    skipped = {}
+    failed = 0
+
+    for result in Batch.runInPool(regenerateFile, files, args.jobs, args.model_path, args.size, args.source, args.force):
+        throughput.add(result['size'])
+
+        if result['error']:
+            failed += 1
+            print(f'{result["filename"]}: FAILED in {result["time"] * 1000:.1f}ms\n{result["error"]}')
+            continue
+
+        for reason, count in result['skipped'].items():
+            skipped[reason] = skipped.get(reason, 0) + count
+
+        print(f'{result["filename"]}: {result["changed"]} simple images regenerated in {result["time"] * 1000:.1f}ms')
+
+    for reason, count in sorted(skipped.items()):
+        print(f'{count} textures skipped: {reason}')
+
+    print(throughput.summary())
+    return 1 if failed else 0
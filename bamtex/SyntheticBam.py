@@ -0,0 +1,134 @@
+from panda3d.core import ATS_unspecified, Geom
+from panda3d.core import Texture as P3Texture
+from p3bamboo.BamFile import BamFile
+from p3bamboo.StructDatagram import StructDatagram
+from p3bamboo import BamGlobals
+from .Texture import Texture
+import random
+
+"""
+  Generates BAM files made of Texture objects, for benchmarks and verification.
+
+  The object stream is well formed for every bam version from 4.2 on, with the
+  usual type handle hierarchy of a Texture. Raw texture data is filler: the files
+  exercise BamTeXEditor's loaders and writers, not Panda's image decoders.
+"""
+
+# Handle ids of Texture and its parent classes
+TYPE_HANDLES = {
+    1: {'name': 'Texture', 'parent_classes': [2]},
+    2: {'name': 'TypedWritableReferenceCount', 'parent_classes': [3, 4]},
+    3: {'name': 'TypedWritable', 'parent_classes': []},
+    4: {'name': 'ReferenceCount', 'parent_classes': []}
+}
+
+FILTERS = [P3Texture.FT_nearest, P3Texture.FT_linear, P3Texture.FT_nearest_mipmap_nearest, P3Texture.FT_linear_mipmap_linear]
+
+WRAP_MODES = [P3Texture.WM_clamp, P3Texture.WM_repeat, P3Texture.WM_mirror]
+
+def makeTexture(bam, version, index, simpleSize, dataSize, rng):
+    texture = Texture(bam, version)
+    texture.__dict__.update(
+        name=f'tex{index}',
+        filename=f'phase_{index % 14}/maps/texture_{index}.jpg',
+        alpha_filename=f'phase_{index % 14}/maps/texture_{index}_a.rgb' if index % 3 == 0 else '',
+        primary_file_num_channels=3,
+        alpha_file_channel=1 if index % 3 == 0 else 0,
+        has_rawdata=dataSize > 0,
+        texture_type=P3Texture.TT_2d_texture,
+        has_read_mipmaps=False,
+        wrap_u=rng.choice(WRAP_MODES),
+        wrap_v=rng.choice(WRAP_MODES),
+        wrap_w=P3Texture.WM_repeat,
+        minfilter=rng.choice(FILTERS),
+        magfilter=rng.choice(FILTERS[:2]),
+        anisotropic_degree=rng.choice([0, 1, 2, 4, 8, 16]),
+        border_color=(0.0, 0.0, 0.0, 1.0),
+        min_lod=-1000.0,
+        max_lod=1000.0,
+        lod_bias=0.0,
+        compression=P3Texture.CM_default,
+        quality_level=P3Texture.QL_default,
+        tex_format=P3Texture.F_rgba if index % 3 == 0 else P3Texture.F_rgb,
+        num_components=4 if index % 3 == 0 else 3,
+        usage_hint=Geom.UH_unspecified,
+        auto_texture_scale=ATS_unspecified,
+        orig_file_x_size=256,
+        orig_file_y_size=256,
+        has_simple_ram_image=simpleSize > 0,
+        simple_x_size=simpleSize,
+        simple_y_size=simpleSize,
+        simple_image_date_generated=1600000000 + index if simpleSize else 0,
+        simple_ram_image=rng.randbytes(simpleSize * simpleSize * 4),
+        has_clear_color=False,
+        clear_color=(0.0, 0.0, 0.0, 0.0),
+        texture_data=rng.randbytes(dataSize)
+    )
+    return texture
+
+def generateBam(count, version=(6, 45), simpleSize=16, dataSize=0, seed=0, stdfloatDouble=False):
+    """
+    Returns a BamFile holding count synthetic textures.
+    simpleSize is the edge length of each simple RAM image (0 for none), and
+    dataSize the number of raw texture data bytes of each texture.
+    stdfloatDouble writes floats as doubles, which bam 6.27 and later support.
+    """
+    rng = random.Random(seed)
+    bam = BamFile()
+    bam.version = version
+    bam.bam_major_ver, bam.bam_minor_ver = version
+    bam.file_endian = 1
+    bam.stdfloat_double = stdfloatDouble
+    bam.type_handles = dict(TYPE_HANDLES)
+
+    for i in range(count):
+        obj_id = i + 1
+        texture = makeTexture(bam, version, i, simpleSize, dataSize, rng)
+        bam.objects[obj_id] = {'handle_id': 1, 'handle_name': 'Texture', 'obj_id': obj_id, 'data': texture.to_binary(version)}
+
+    return bam
+
+def writeBam(bam, f):
+    """
+    Same as BamFile.write, but every datagram goes straight to f instead of
+    being appended to one growing datagram.
+    """
+    dg = StructDatagram()
+    dg.append_data(bam.HEADER)
+
+    if bam.version >= (6, 27):
+        header_size = 6
+    elif bam.version >= (5, 0):
+        header_size = 5
+    else:
+        header_size = 4
+
+    dg.add_uint32(header_size)
+    dg.add_uint16(bam.bam_major_ver)
+    dg.add_uint16(bam.bam_minor_ver)
+
+    if header_size >= 5:
+        dg.add_uint8(bam.file_endian)
+
+    if header_size >= 6:
+        dg.add_bool(bam.stdfloat_double)
+
+    f.write(dg.get_message())
+    written_handles = []
+    bam.write_long_pointers = False
+
+    for i, obj in enumerate(bam.objects.values()):
+        dg = StructDatagram()
+        bam.write_object(dg, BamGlobals.BOC_adjunct if i else BamGlobals.BOC_push, obj, written_handles)
+        f.write(dg.get_message())
+
+    if bam.version >= (6, 21):
+        dg = StructDatagram()
+        bam.write_object(dg, BamGlobals.BOC_pop)
+        f.write(dg.get_message())
+
+def generateBamFile(filename, count, version=(6, 45), simpleSize=16, dataSize=0, seed=0, stdfloatDouble=False):
+    bam = generateBam(count, version, simpleSize, dataSize, seed, stdfloatDouble)
+
+    with open(filename, 'wb') as f:
+        writeBam(bam, f)
@@ -2,16 +2,23 @@ from PyQt5.QtWidgets import QApplication
 from p3bamboo.BamFactory import BamFactory
 from .Texture import Texture
 from .MainWidget import MainWidget
+from . import Profiler
 import sys
 
 class TexEditor(object):
 
-    def __init__(self):
+    def __init__(self, traceFilename=None):
         self.app = QApplication(sys.argv)
 
+        if traceFilename:
+            Profiler.enable(traceFilename)
+        else:
+            Profiler.enableFromEnvironment()
+
     def run(self):
         self.main = MainWidget(self)
         self.main.resize(1200, 400)
         self.main.show()
         BamFactory.register_type('Texture', Texture)
+        Texture.zero_copy = True
         self.app.exec_()
@@ -1,7 +1,7 @@
-from panda3d.core import ATS_unspecified, Geom, LColorf
+from panda3d.core import Geom, LColorf
 from panda3d.core import Texture as P3Texture
 from p3bamboo.BamObject import BamObject
-from p3bamboo.BamGlobals import read_vec4, write_vec
+from .TextureCodec import get_codec
 
 """
   P3BAMBOO
@@ -10,10 +10,27 @@ from p3bamboo.BamGlobals import read_vec4, write_vec
   Author: Disyer
   Date: 2020/10/16
 """
+def extract_payload(di, size):
+    if not Texture.zero_copy:
+        return bytes(di.extract_bytes(size))
+
+    # Keep a view over the object datagram instead of copying the payload
+    start = di.get_current_index()
+    di.skip_bytes(size)
+    return memoryview(di.data)[start:start + size]
+
+def append_payload(dg, data):
+    # append_data() stringifies anything that is not bytes, so views are appended directly
+    dg.data += data
+
 class Texture(BamObject):
+    # When enabled, simple_ram_image and texture_data stay as memoryviews
+    # over the loaded datagram until they are replaced by an edit.
+    zero_copy = False
 
     def __init__(self, bam_file, bam_version):
         BamObject.__init__(self, bam_file, bam_version)
+        self.dirty = False
 
     def load(self, di):
         BamObject.load(self, di)
@@ -22,78 +39,20 @@ class Texture(BamObject):
         self.filename = di.get_string()
         self.alpha_filename = di.get_string()
 
-        if self.bam_version >= (4, 2):
-            self.primary_file_num_channels = di.get_uint8()
-        else:
-            self.primary_file_num_channels = 0
-
-        if self.bam_version >= (4, 3):
-            self.alpha_file_channel = di.get_uint8()
-        else:
-            self.alpha_file_channel = 0
-
-        self.has_rawdata = di.get_bool()
-        self.texture_type = di.get_uint8() # TextureType
-
-        if self.bam_version >= (6, 32):
-            self.has_read_mipmaps = di.get_bool()
-        else:
-            self.has_read_mipmaps = False
-
-        # Fill in body
-
-        # SamplerState (default_sampler)
-        self.wrap_u = di.get_uint8() # WrapMode
-        self.wrap_v = di.get_uint8() # WrapMode
-        self.wrap_w = di.get_uint8() # WrapMode
-        self.minfilter = di.get_uint8() # FilterType
-        self.magfilter = di.get_uint8() # FilterType
-        self.anisotropic_degree = di.get_int16()
-        self.border_color = read_vec4(di)
-
-        if self.bam_version >= (6, 36):
-            self.min_lod = self.bam_file.read_stdfloat(di)
-            self.max_lod = self.bam_file.read_stdfloat(di)
-            self.lod_bias = self.bam_file.read_stdfloat(di)
-        else:
-            self.min_lod = -1000
-            self.max_lod = 1000
-            self.lod_bias = 0
-
-        # Rest of body
-        if self.bam_version >= (6, 1):
-            self.compression = di.get_uint8() # CompressionMode
-        else:
-            self.compression = P3Texture.CM_default
-
-        if self.bam_version >= (6, 16):
-            self.quality_level = di.get_uint8() # QualityLevel
-        else:
-            self.quality_level = P3Texture.QL_unspecified
-
-        self.tex_format = di.get_uint8() # Format
-        self.num_components = di.get_uint8()
+        codec = get_codec(self.bam_version, self.bam_file.stdfloat_double)
+        self.__dict__.update(codec.defaults)
+        codec.head.read(self, di)
 
         if self.texture_type == P3Texture.TT_buffer_texture:
             self.usage_hint = di.get_uint8()
         else:
             self.usage_hint = Geom.UH_unspecified
 
-        if self.bam_version >= (6, 28):
-            self.auto_texture_scale = di.get_uint8() # AutoTextureScale
-        else:
-            self.auto_texture_scale = ATS_unspecified
-
-        self.orig_file_x_size = di.get_uint32()
-        self.orig_file_y_size = di.get_uint32()
-
-        self.has_simple_ram_image = di.get_bool()
+        codec.body.read(self, di)
 
         if self.has_simple_ram_image:
-            self.simple_x_size = di.get_uint32()
-            self.simple_y_size = di.get_uint32()
-            self.simple_image_date_generated = di.get_int32()
-            self.simple_ram_image = di.extract_bytes(di.get_uint32())
+            codec.simple_image.read(self, di)
+            self.simple_ram_image = extract_payload(di, di.get_uint32())
         else:
             self.simple_x_size = 0
             self.simple_y_size = 0
@@ -103,13 +62,13 @@ class Texture(BamObject):
         self.has_clear_color = False
         self.clear_color = LColorf(1, 1, 1, 1)
 
-        if self.bam_version >= (6, 45):
+        if codec.has_clear_color:
             self.has_clear_color = di.get_bool()
 
             if self.has_clear_color:
-                self.clear_color = read_vec4(di)
+                codec.clear_color.read(self, di)
 
-        self.texture_data = di.extract_bytes(di.get_remaining_size())
+        self.texture_data = extract_payload(di, di.get_remaining_size())
 
     def write(self, write_version, dg):
         BamObject.write(self, write_version, dg)
@@ -118,69 +77,26 @@ class Texture(BamObject):
         dg.add_string(self.filename)
         dg.add_string(self.alpha_filename)
 
-        if write_version >= (4, 2):
-            dg.add_uint8(self.primary_file_num_channels)
-
-        if write_version >= (4, 3):
-            dg.add_uint8(self.alpha_file_channel)
-
-        dg.add_bool(self.has_rawdata)
-        dg.add_uint8(self.texture_type)
-
-        if write_version >= (6, 32):
-            dg.add_bool(self.has_read_mipmaps)
-
-        # Fill in body
-
-        # SamplerState (default_sampler)
-        dg.add_uint8(self.wrap_u) # WrapMode
-        dg.add_uint8(self.wrap_v) # WrapMode
-        dg.add_uint8(self.wrap_w) # WrapMode
-        dg.add_uint8(self.minfilter) # FilterType
-        dg.add_uint8(self.magfilter) # FilterType
-        dg.add_int16(self.anisotropic_degree)
-        write_vec(dg, self.border_color)
-
-        if write_version >= (6, 36):
-            self.bam_file.write_stdfloat(dg, self.min_lod)
-            self.bam_file.write_stdfloat(dg, self.max_lod)
-            self.bam_file.write_stdfloat(dg, self.lod_bias)
-
-        # Rest of body
-        if write_version >= (6, 1):
-            dg.add_uint8(self.compression) # CompressionMode
-
-        if write_version >= (6, 16):
-            dg.add_uint8(self.quality_level) # QualityLevel
-
-        dg.add_uint8(self.tex_format) # Format
-        dg.add_uint8(self.num_components)
+        codec = get_codec(write_version, self.bam_file.stdfloat_double)
+        codec.head.write(self, dg)
 
         if self.texture_type == P3Texture.TT_buffer_texture:
             dg.add_uint8(self.usage_hint)
 
-        if self.bam_version >= (6, 28):
-            dg.add_uint8(self.auto_texture_scale) # AutoTextureScale
-
-        dg.add_uint32(self.orig_file_x_size)
-        dg.add_uint32(self.orig_file_y_size)
-
-        dg.add_bool(self.has_simple_ram_image)
+        codec.body.write(self, dg)
 
         if self.has_simple_ram_image:
-            dg.add_uint32(self.simple_x_size)
-            dg.add_uint32(self.simple_y_size)
-            dg.add_int32(self.simple_image_date_generated)
+            codec.simple_image.write(self, dg)
             dg.add_uint32(len(self.simple_ram_image))
-            dg.append_data(self.simple_ram_image)
+            append_payload(dg, self.simple_ram_image)
 
-        if self.bam_version >= (6, 45):
+        if codec.has_clear_color:
             dg.add_bool(self.has_clear_color)
 
             if self.has_clear_color:
-                write_vec(self.clear_color)
+                codec.clear_color.write(self, dg)
 
-        dg.append_data(self.texture_data)
+        append_payload(dg, self.texture_data)
 
     def __str__(self):
         return (('Texture(name={0}, filename={1}, alpha_filename={2}, primary_file_num_channels={3}, alpha_file_channel={4}, has_rawdata={5}, texture_type={6}, has_read_mipmaps={7}, ' +
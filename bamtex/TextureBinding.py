@@ -0,0 +1,53 @@
+from . import Profiler
+import time
+
+class TextureBinding(object):
+    """
+    Binds the option widgets to the selected textures.
+
+    Widgets are refreshed with their signals blocked, so switching textures never
+    writes anything back. User edits arrive as explicit change sets that are
+    applied to every bound texture.
+    """
+
+    def __init__(self, options):
+        self.options = options
+        self.textures = []
+        self.lastRefreshTime = 0.0
+        self.changeCallback = None
+
+        for option in options:
+            option.setBinding(self)
+
+    def getTextures(self):
+        return self.textures
+
+    def setTextures(self, textures, bam_version):
+        start = time.perf_counter()
+        self.textures = textures
+
+        for option in self.options:
+            option.setObjects(textures)
+            option.enable(bam_version)
+            option.loadValue()
+
+        self.lastRefreshTime = time.perf_counter() - start
+
+    def clear(self):
+        self.textures = []
+
+        for option in self.options:
+            option.setObjects(self.textures)
+            option.clear()
+            option.disable()
+
+    def applyChanges(self, changes):
+        with Profiler.span('edit', textures=len(self.textures), fields=len(changes)):
+            for texture in self.textures:
+                for field, value in changes.items():
+                    setattr(texture, field, value)
+
+                texture.dirty = True
+
+        if self.changeCallback is not None:
+            self.changeCallback(self.textures, changes)
@@ -0,0 +1,190 @@
+from panda3d.core import ATS_unspecified
+from panda3d.core import Texture as P3Texture
+from operator import attrgetter
+import struct
+
+"""
+  Precompiled struct layouts for the fixed-width runs of a Texture datagram.
+
+  Every bam version gets its own codec, so the version checks happen once per
+  version instead of once per field of every texture, and every run of fields
+  is decoded with a single unpack and encoded with a single pack.
+"""
+
+class FieldRun(object):
+    """
+    A run of fixed-width fields packed back to back.
+    Vector fields take four float32 slots and are read back as tuples.
+    """
+
+    def __init__(self, fields):
+        self.fields = [name for name, _ in fields]
+        self.formats = [fmt for _, fmt in fields]
+        self.struct = struct.Struct('<' + ''.join(fmt for _, fmt in fields))
+        self.size = self.struct.size
+        self.getter = attrgetter(*self.fields) if len(self.fields) > 1 else lambda obj: (getattr(obj, self.fields[0]),)
+
+        # Vectors are handled back to front so earlier positions stay valid
+        vectors = [i for i, (_, fmt) in enumerate(fields) if fmt == '4f']
+        self.vector_fields = vectors[::-1]
+        self.vector_slots = [i + 3 * n for n, i in enumerate(vectors)][::-1]
+
+    def read(self, obj, di):
+        index = di.get_current_index()
+        di.skip_bytes(self.size)
+        values = self.struct.unpack_from(di.data, index)
+
+        if self.vector_slots:
+            values = list(values)
+
+            for slot in self.vector_slots:
+                values[slot:slot + 4] = [tuple(values[slot:slot + 4])]
+
+        obj.__dict__.update(zip(self.fields, values))
+
+    def write(self, obj, dg):
+        values = self.getter(obj)
+
+        if self.vector_fields:
+            values = list(values)
+
+            for i in self.vector_fields:
+                values[i:i + 1] = [values[i][j] for j in range(4)]
+
+        dg.append_data(self.struct.pack(*values))
+
+    def get_spans(self, offset):
+        spans = []
+
+        for i, field in enumerate(self.fields):
+            start = offset + struct.calcsize('<' + ''.join(self.formats[:i]))
+            spans.append((start, start + struct.calcsize('<' + self.formats[i]), field))
+
+        return spans
+
+class TextureCodec(object):
+
+    def __init__(self, bam_version, stdfloat_double):
+        stdfloat = 'd' if stdfloat_double else 'f'
+        self.defaults = {}
+
+        head = []
+
+        if bam_version >= (4, 2):
+            head.append(('primary_file_num_channels', 'B'))
+        else:
+            self.defaults['primary_file_num_channels'] = 0
+
+        if bam_version >= (4, 3):
+            head.append(('alpha_file_channel', 'B'))
+        else:
+            self.defaults['alpha_file_channel'] = 0
+
+        head.append(('has_rawdata', '?'))
+        head.append(('texture_type', 'B')) # TextureType
+
+        if bam_version >= (6, 32):
+            head.append(('has_read_mipmaps', '?'))
+        else:
+            self.defaults['has_read_mipmaps'] = False
+
+        # SamplerState (default_sampler)
+        head.append(('wrap_u', 'B')) # WrapMode
+        head.append(('wrap_v', 'B')) # WrapMode
+        head.append(('wrap_w', 'B')) # WrapMode
+        head.append(('minfilter', 'B')) # FilterType
+        head.append(('magfilter', 'B')) # FilterType
+        head.append(('anisotropic_degree', 'h'))
+        head.append(('border_color', '4f'))
+
+        if bam_version >= (6, 36):
+            head.append(('min_lod', stdfloat))
+            head.append(('max_lod', stdfloat))
+            head.append(('lod_bias', stdfloat))
+        else:
+            self.defaults['min_lod'] = -1000
+            self.defaults['max_lod'] = 1000
+            self.defaults['lod_bias'] = 0
+
+        # Rest of body
+        if bam_version >= (6, 1):
+            head.append(('compression', 'B')) # CompressionMode
+        else:
+            self.defaults['compression'] = P3Texture.CM_default
+
+        if bam_version >= (6, 16):
+            head.append(('quality_level', 'B')) # QualityLevel
+        else:
+            self.defaults['quality_level'] = P3Texture.QL_default
+
+        head.append(('tex_format', 'B')) # Format
+        head.append(('num_components', 'B'))
+
+        # usage_hint sits between the runs, only for buffer textures
+        body = []
+
+        if bam_version >= (6, 28):
+            body.append(('auto_texture_scale', 'B')) # AutoTextureScale
+        else:
+            self.defaults['auto_texture_scale'] = ATS_unspecified
+
+        body.append(('orig_file_x_size', 'I'))
+        body.append(('orig_file_y_size', 'I'))
+        body.append(('has_simple_ram_image', '?'))
+
+        self.head = FieldRun(head)
+        self.body = FieldRun(body)
+        self.simple_image = FieldRun([('simple_x_size', 'I'), ('simple_y_size', 'I'), ('simple_image_date_generated', 'i')])
+        self.has_clear_color = bam_version >= (6, 45)
+        self.clear_color = FieldRun([('clear_color', '4f')])
+
+    def get_field_spans(self, texture):
+        """
+        Returns (start, end, field) for every field of texture as it is laid out
+        in its datagram, for locating a byte offset.
+        """
+        spans = []
+        offset = 0
+
+        def add(field, size):
+            nonlocal offset
+            spans.append((offset, offset + size, field))
+            offset += size
+
+        for field in ('name', 'filename', 'alpha_filename'):
+            add(field, 2 + len(getattr(texture, field).encode('utf-8')))
+
+        spans.extend(self.head.get_spans(offset))
+        offset += self.head.size
+
+        if texture.texture_type == P3Texture.TT_buffer_texture:
+            add('usage_hint', 1)
+
+        spans.extend(self.body.get_spans(offset))
+        offset += self.body.size
+
+        if texture.has_simple_ram_image:
+            spans.extend(self.simple_image.get_spans(offset))
+            offset += self.simple_image.size
+            add('simple_ram_image', 4 + len(texture.simple_ram_image))
+
+        if self.has_clear_color:
+            add('has_clear_color', 1)
+
+            if texture.has_clear_color:
+                spans.extend(self.clear_color.get_spans(offset))
+                offset += self.clear_color.size
+
+        add('texture_data', len(texture.texture_data))
+        return spans
+
+CODECS = {}
+
+def get_codec(bam_version, stdfloat_double):
+    key = (bam_version, stdfloat_double)
+    codec = CODECS.get(key)
+
+    if codec is None:
+        codec = CODECS[key] = TextureCodec(bam_version, stdfloat_double)
+
+    return codec
@@ -0,0 +1,263 @@
+from p3bamboo.BamFactory import BamFactory
+from .Dedup import hashPayload
+from .MappedBamFile import MappedBamFile
+from .OptionGlobals import *
+from .Texture import Texture
+from .TextureRecord import toTuple
+from .Verify import hashFile
+from . import Batch, Globals
+import os, struct, time, traceback
+
+"""
+  Finds the texture settings that changed between two BAM files, or between two
+  directory trees of them.
+
+  Textures are matched by filename and name, then by whichever of the two is
+  set. Textures whose object bytes hash the same are skipped without decoding,
+  and the rest are compared field by field with the editor's labels.
+
+  python -m bamtex diff build_1/phase_3/ build_2/phase_3/
+  python -m bamtex diff old.bam new.bam
+"""
+
+def getLabel(key):
+    filename, name = key
+    return filename or name
+
+def readKey(data):
+    """
+    Reads the name and filename a Texture starts with, without decoding the rest.
+    """
+    length, = struct.unpack_from('<H', data, 0)
+    name = bytes(data[2:2 + length]).decode('utf-8', 'replace')
+    offset = 2 + length
+    length, = struct.unpack_from('<H', data, offset)
+    filename = bytes(data[offset + 2:offset + 2 + length]).decode('utf-8', 'replace')
+    return filename, name
+
+class TextureSource(object):
+    """
+    The raw Texture objects of one file, keyed by (filename, name), decoded on demand.
+    """
+
+    def __init__(self, filename):
+        self.bam = MappedBamFile()
+        self.entries = {}
+
+        with open(filename, 'rb') as f:
+            for obj_id, handle_name, data in self.bam.scan_raw(f, Texture):
+                key = readKey(data)
+                self.entries.setdefault(key, []).append((obj_id, handle_name, hashPayload(data), data))
+
+    def getFormat(self):
+        return self.bam.version, self.bam.stdfloat_double
+
+    def decode(self, entry):
+        obj_id, handle_name, _, data = entry
+        texture = BamFactory.create(self.bam, self.bam.version, handle_name)
+        self.bam.load_mapped_node(texture, {'obj_id': obj_id, 'data': data})
+        return texture
+
+def getOptions():
+    return [option for _, options in Globals.TextureFields for option in options]
+
+def formatDifference(option, value):
+    if option.field_type == BLOB:
+        return f'{len(value)} bytes'
+
+    return option.formatValue(value)
+
+def compareTextures(old, new):
+    """
+    Returns (label, old text, new text) of every field that differs.
+    """
+    differences = []
+
+    for option in getOptions():
+        oldValue = getattr(old, option.field)
+        newValue = getattr(new, option.field)
+
+        if option.field_type == COLOR:
+            same = toTuple(oldValue) == toTuple(newValue)
+        elif option.field_type == BLOB:
+            same = len(oldValue) == len(newValue) and bytes(oldValue) == bytes(newValue)
+        else:
+            same = oldValue == newValue
+
+        if not same:
+            oldText = formatDifference(option, oldValue)
+            newText = formatDifference(option, newValue)
+
+            if oldText == newText:
+                newText += ' (contents differ)'
+
+            differences.append((option.getName(), oldText, newText))
+
+    return differences
+
+def matchTextures(old, new):
+    """
+    Pairs the entries of two sources, first by (filename, name), then by label.
+    Returns (pairs, removed, added) lists of (key, entry).
+    """
+    pairs = []
+    removed = []
+    added = []
+    unmatchedNew = {}
+
+    for key, newEntries in new.items():
+        oldEntries = old.get(key, [])
+
+        for i, entry in enumerate(newEntries):
+            if i < len(oldEntries):
+                pairs.append((key, oldEntries[i], entry))
+            else:
+                unmatchedNew.setdefault(getLabel(key), []).append((key, entry))
+
+    for key, oldEntries in old.items():
+        for entry in oldEntries[len(new.get(key, [])):]:
+            candidates = unmatchedNew.get(getLabel(key))
+
+            if candidates:
+                newKey, newEntry = candidates.pop(0)
+                pairs.append((newKey, entry, newEntry))
+            else:
+                removed.append((key, entry))
+
+    for candidates in unmatchedNew.values():
+        added.extend(candidates)
+
+    return pairs, removed, added
+
+def diffFiles(pair):
+    """
+    Compares one (label, old filename, new filename) triple in a worker process.
+    Either filename may be None for files that only exist on one side.
+    """
+    label, oldFilename, newFilename = pair
+    start = time.perf_counter()
+    result = {'filename': label, 'old': oldFilename, 'new': newFilename, 'size': 0, 'textures': 0, 'identical': 0,
+              'identical_file': False, 'changed': [], 'added': [], 'removed': [], 'error': None}
+
+    try:
+        result['size'] = sum(os.path.getsize(filename) for filename in (oldFilename, newFilename) if filename)
+
+        if oldFilename and newFilename and os.path.getsize(oldFilename) == os.path.getsize(newFilename) and hashFile(oldFilename) == hashFile(newFilename):
+            result['identical_file'] = True
+            result['time'] = time.perf_counter() - start
+            return result
+
+        old = TextureSource(oldFilename) if oldFilename else None
+        new = TextureSource(newFilename) if newFilename else None
+        pairs, removed, added = matchTextures(old.entries if old else {}, new.entries if new else {})
+        sameFormat = old is not None and new is not None and old.getFormat() == new.getFormat()
+
+        if old and new and old.bam.version != new.bam.version:
+            result['versions'] = ('%d.%d' % old.bam.version, '%d.%d' % new.bam.version)
+
+        for key, oldEntry, newEntry in pairs:
+            result['textures'] += 1
+
+            # Identical bytes in the same format can only decode to identical fields.
+            # Matching hashes are confirmed, since they may be CRC32s
+            if sameFormat and oldEntry[2] == newEntry[2] and bytes(oldEntry[3]) == bytes(newEntry[3]):
+                result['identical'] += 1
+                continue
+
+            differences = compareTextures(old.decode(oldEntry), new.decode(newEntry))
+
+            if differences:
+                result['changed'].append((getLabel(key), newEntry[0], differences))
+            else:
+                result['identical'] += 1
+
+        result['removed'] = [getLabel(key) for key, _ in removed]
+        result['added'] = [(getLabel(key), entry[0]) for key, entry in added]
+    except Exception:
+        result['error'] = traceback.format_exc()
+
+    result['time'] = time.perf_counter() - start
+    return result
+
+def findPairs(old, new):
+    """
+    Returns (label, old filename, new filename) triples for two files or two directory trees.
+    """
+    if os.path.isfile(old) and os.path.isfile(new):
+        return [(new, old, new)]
+
+    if not os.path.isdir(old) or not os.path.isdir(new):
+        raise ValueError('Expected two BAM files or two directories.')
+
+    oldFiles = {os.path.relpath(filename, old): filename for filename in Batch.findBamFiles([old])}
+    newFiles = {os.path.relpath(filename, new): filename for filename in Batch.findBamFiles([new])}
+    return [(path, oldFiles.get(path), newFiles.get(path)) for path in sorted(set(oldFiles) | set(newFiles))]
+
+def isDifferent(result):
+    return bool(result['changed'] or result['added'] or result['removed'] or not result['old'] or not result['new'])
+
+def printResult(result):
+    if not isDifferent(result):
+        return
+
+    if not result['old']:
+        print(f'+ {result["filename"]} ({len(result["added"])} textures)')
+        return
+
+    if not result['new']:
+        print(f'- {result["filename"]} ({len(result["removed"])} textures)')
+        return
+
+    header = result['filename']
+
+    if 'versions' in result:
+        header += ' (bam %s -> %s)' % result['versions']
+
+    print(header)
+
+    for label, _, differences in result['changed']:
+        print(f'  ~ {label}')
+
+        for field, oldText, newText in differences:
+            print(f'      {field}: {oldText} -> {newText}')
+
+    for label in result['removed']:
+        print(f'  - {label}')
+
+    for label, _ in result['added']:
+        print(f'  + {label}')
+
+def addArguments(parser):
+    parser.add_argument('old', help='BAM file or directory tree to compare from')
+    parser.add_argument('new', help='BAM file or directory tree to compare to')
+    Batch.addPoolArguments(parser)
+
+def run(args):
+    pairs = findPairs(args.old, args.new)
+    throughput = Batch.Throughput()
+    counts = {'files': 0, 'identical_files': 0, 'identical': 0, 'changed': 0, 'added': 0, 'removed': 0}
+    different = False
+    failed = False
+
+    for result in Batch.runInPool(diffFiles, pairs, args.jobs, ordered=True):
+        throughput.add(result['size'])
+
+        if result['error']:
+            failed = True
+            print(f'{result["filename"]}: FAILED\n{result["error"]}')
+            continue
+
+        printResult(result)
+        different = different or isDifferent(result)
+        counts['files'] += 1
+        counts['identical_files'] += result['identical_file']
+        counts['identical'] += result['identical']
+        counts['changed'] += len(result['changed'])
+        counts['added'] += len(result['added'])
+        counts['removed'] += len(result['removed'])
+
+    print('{files} files compared, {identical_files} byte for byte identical; textures: {identical} identical, {changed} changed, {added} added, {removed} removed'.format(**counts))
+    print(throughput.summary())
+
+    # Like diff: 0 when nothing changed, 1 for differences and 2 for errors
+    return 2 if failed else 1 if different else 0
@@ -0,0 +1,256 @@
+from .OptionGlobals import *
+from .TextureScanner import scanTextures
+from . import Batch, Globals
+import csv, json, os, sys, time, traceback
+
+"""
+  Exports the fields of every texture to JSON Lines or CSV, and imports edited
+  copies of those files back into the models they came from.
+
+  Every row names its file and obj_id. Enums are written by name and colors as
+  #aarrggbb, like the editor shows them. Imports only apply the cells that differ
+  from the model, so a row may also hold just the fields to change.
+
+  python -m bamtex export phase_3/ -o textures.csv
+  python -m bamtex import textures.csv
+"""
+
+KEY_COLUMNS = ['file', 'obj_id']
+
+FORMATS = ['jsonl', 'csv']
+
+def getExportedOptions():
+    # Payloads stay in the models
+    return [option for _, options in Globals.TextureFields for option in options if option.field_type != BLOB]
+
+def getFormat(filename, fileFormat):
+    if fileFormat:
+        return fileFormat
+
+    return 'csv' if filename.lower().endswith('.csv') else 'jsonl'
+
+def toExported(option, value):
+    if option.field_type in (ENUM, COLOR):
+        return option.formatValue(value)
+    elif option.field_type == BOOL:
+        return bool(value)
+    elif option.field_type == FLOAT:
+        return float(value)
+    elif option.field_type == STRING:
+        return value
+
+    return int(value)
+
+def toCell(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+
+    return value
+
+def exportFile(filename):
+    """
+    Reads the rows of one file in a worker process.
+    """
+    options = getExportedOptions()
+    result = {'filename': filename, 'rows': [], 'error': None}
+
+    try:
+        for texture in scanTextures(filename):
+            row = [filename, texture.obj_id]
+            row.extend(toExported(option, getattr(texture, option.field)) for option in options)
+            result['rows'].append(row)
+    except Exception:
+        # Rows of a damaged file are left out entirely
+        result['rows'] = []
+        result['error'] = traceback.format_exc()
+
+    return result
+
+def parseCell(option, text):
+    # Enum values without a name (such as FT_shadow) are exported as numbers
+    if option.field_type == ENUM and text.isdigit() and int(text) <= 0xFF:
+        return int(text)
+
+    return option.parseText(text)
+
+def readRows(f, fileFormat):
+    """
+    Yields (line number, {column: value}) for every row of an exported file.
+    """
+    if fileFormat == 'csv':
+        reader = csv.DictReader(f)
+
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for i, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f'line {i}: {e}')
+
+            if not isinstance(row, dict):
+                raise ValueError(f'line {i}: Expected a JSON object.')
+
+            yield i, row
+
+def parseChanges(rows):
+    """
+    Returns {filename: {obj_id: {field: value}}} from exported rows.
+    Empty CSV cells leave their field alone, except for strings, which may be emptied.
+    """
+    options = {option.field: option for option in getExportedOptions()}
+    changes = {}
+
+    for line, row in rows:
+        try:
+            filename = row['file']
+            obj_id = int(row['obj_id'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f'line {line}: Every row needs a file and an obj_id.')
+
+        values = changes.setdefault(filename, {}).setdefault(obj_id, {})
+
+        for field, text in row.items():
+            if field in KEY_COLUMNS:
+                continue
+
+            option = options.get(field)
+
+            if option is None:
+                raise ValueError(f'line {line}: Unknown texture field "{field}".')
+
+            if text is None or (text == '' and option.field_type != STRING):
+                continue
+
+            if isinstance(text, bool):
+                text = 'true' if text else 'false'
+
+            try:
+                values[field] = parseCell(option, str(text))
+            except ValueError as e:
+                raise ValueError(f'line {line}: {field}: {e}')
+
+    return changes
+
+def importFile(update, dryRun):
+    """
+    Applies the changes of one (filename, {obj_id: {field: value}}) pair in a worker process,
+    and saves the file once if anything changed.
+    """
+    filename, textures = update
+    start = time.perf_counter()
+    result = {'filename': filename, 'size': 0, 'changed': 0, 'missing': 0, 'error': None}
+
+    try:
+        result['size'] = os.path.getsize(filename)
+        bam = Batch.loadBamFile(filename)
+        found = set()
+
+        for texture in Batch.getTextures(bam):
+            values = textures.get(texture.obj_id)
+
+            if values is None:
+                continue
+
+            found.add(texture.obj_id)
+
+            # Fields the texture does not store can not be changed, and values are
+            # compared as exported too, so unedited colors and floats are left alone
+            changed, _ = Batch.assignFields(texture, values, formatted=True)
+
+            if changed:
+                result['changed'] += 1
+
+        result['missing'] = len(textures) - len(found)
+
+        if result['changed'] and not dryRun:
+            Batch.saveBamFile(bam, filename)
+    except Exception:
+        result['error'] = traceback.format_exc()
+
+    result['time'] = time.perf_counter() - start
+    return result
+
+def addExportArguments(parser):
+    parser.add_argument('paths', nargs='+', help='BAM files or directory trees to export')
+    parser.add_argument('-o', '--output', default='-', help='file to write, - for standard output (default)')
+    parser.add_argument('--format', choices=FORMATS, help='output format (default: from the output extension, else jsonl)')
+    Batch.addPoolArguments(parser)
+
+def runExport(args):
+    fileFormat = getFormat(args.output, args.format)
+    columns = KEY_COLUMNS + [option.field for option in getExportedOptions()]
+    f = sys.stdout if args.output == '-' else open(args.output, 'w', newline='' if fileFormat == 'csv' else None)
+    textures = 0
+    failed = 0
+
+    try:
+        if fileFormat == 'csv':
+            writer = csv.writer(f)
+            writer.writerow(columns)
+
+        # Rows are written as each file is read, in the order the files were found
+        for result in Batch.runInPool(exportFile, Batch.findBamFiles(args.paths), args.jobs, ordered=True):
+            rows = result['rows']
+
+            if result['error']:
+                # Standard output may be the export itself
+                failed += 1
+                print(f'{result["filename"]}: FAILED\n{result["error"]}', file=sys.stderr)
+                continue
+
+            textures += len(rows)
+
+            if fileFormat == 'csv':
+                writer.writerows([toCell(value) for value in row] for row in rows)
+            else:
+                f.writelines(json.dumps(dict(zip(columns, row))) + '\n' for row in rows)
+    finally:
+        if f is not sys.stdout:
+            f.close()
+
+    print(f'{textures} textures exported', file=sys.stderr)
+    return 1 if failed else 0
+
+def addImportArguments(parser):
+    parser.add_argument('input', help='exported file to apply, - for standard input')
+    parser.add_argument('--format', choices=FORMATS, help='input format (default: from the input extension, else jsonl)')
+    parser.add_argument('-n', '--dry-run', action='store_true', help='report what would change without writing')
+    Batch.addPoolArguments(parser)
+
+def runImport(args):
+    fileFormat = getFormat(args.input, args.format)
+    f = sys.stdin if args.input == '-' else open(args.input, newline='' if fileFormat == 'csv' else None)
+
+    try:
+        changes = parseChanges(readRows(f, fileFormat))
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+    throughput = Batch.Throughput()
+    failed = 0
+
+    for result in Batch.runInPool(importFile, list(changes.items()), args.jobs, args.dry_run):
+        throughput.add(result['size'])
+
+        # Failures go to standard error, like those of exports
+        if result['error']:
+            failed += 1
+            print(f'{result["filename"]}: FAILED in {result["time"] * 1000:.1f}ms\n{result["error"]}', file=sys.stderr)
+            continue
+
+        line = f'{result["filename"]}: {result["changed"]} textures changed in {result["time"] * 1000:.1f}ms'
+
+        if result['missing']:
+            failed += 1
+            print(f'{line}, {result["missing"]} textures not found', file=sys.stderr)
+        else:
+            print(line)
+
+    print(throughput.summary())
+    return 1 if failed else 0
@@ -0,0 +1,202 @@
+from .OptionGlobals import *
+from .TextureRecord import scanRecords
+from . import Batch, Globals
+import os, shlex, sqlite3, time, traceback
+
+"""
+  A persistent SQLite index of every texture field across an asset directory.
+
+  python -m bamtex index phase_3/ --db textures.db
+  python -m bamtex query --db textures.db filename=phase_3/maps/foo.jpg
+  python -m bamtex query --db textures.db magfilter=Nearest
+"""
+
+DEFAULT_DATABASE = 'textures.db'
+
+COLUMN_TYPES = {
+    BOOL: 'INTEGER',
+    UINT8: 'INTEGER',
+    UINT32: 'INTEGER',
+    INT16: 'INTEGER',
+    INT32: 'INTEGER',
+    FLOAT: 'REAL',
+    COLOR: 'TEXT',
+    STRING: 'TEXT',
+    ENUM: 'INTEGER'
+}
+
+def getIndexedOptions():
+    # Blobs are not searchable, only their size is recorded
+    return [option for _, options in Globals.TextureFields for option in options if option.field_type != BLOB]
+
+def toColumn(option, value):
+    if option.field_type == COLOR:
+        return option.formatValue(value)
+    elif option.field_type == FLOAT:
+        return float(value)
+    elif option.field_type == STRING:
+        return value
+
+    return int(value)
+
+def indexFile(filename):
+    """
+    Reads the rows of one file in a worker process.
+    """
+    options = getIndexedOptions()
+    result = {'filename': filename, 'rows': [], 'version': None, 'error': None}
+
+    try:
+        stat = os.stat(filename)
+        result['mtime'] = stat.st_mtime
+        result['size'] = stat.st_size
+
+        for record in scanRecords(filename):
+            result['version'] = '%d.%d' % record.bam_version
+            row = [filename, record.obj_id, record.simple_ram_image_size]
+            row.extend(toColumn(option, getattr(record, option.field)) for option in options)
+            result['rows'].append(tuple(row))
+    except Exception:
+        result['error'] = traceback.format_exc()
+
+    return result
+
+class TextureIndex(object):
+
+    def __init__(self, path=DEFAULT_DATABASE):
+        self.options = getIndexedOptions()
+        self.connection = sqlite3.connect(path)
+        self.createTables()
+
+    def close(self):
+        self.connection.close()
+
+    def createTables(self):
+        columns = ', '.join(f'{option.field} {COLUMN_TYPES[option.field_type]}' for option in self.options)
+
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime REAL, size INTEGER, bam_version TEXT)')
+            self.connection.execute(f'CREATE TABLE IF NOT EXISTS textures (path TEXT, obj_id INTEGER, simple_ram_image_size INTEGER, {columns})')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS textures_path ON textures (path)')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS textures_filename ON textures (filename)')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS textures_name ON textures (name)')
+
+    def findStaleFiles(self, filenames):
+        known = {path: (mtime, size) for path, mtime, size in self.connection.execute('SELECT path, mtime, size FROM files')}
+        stale = []
+
+        for filename in filenames:
+            stat = os.stat(filename)
+
+            if known.get(filename) != (stat.st_mtime, stat.st_size):
+                stale.append(filename)
+
+        return stale
+
+    def update(self, paths, jobs=None):
+        """
+        Re-indexes the files under paths that changed since they were last indexed,
+        and forgets files that no longer exist. Files that fail to parse keep their
+        old rows and are tried again next time.
+        Returns the number of files parsed and removed, and the failed results.
+        """
+        filenames = [os.path.abspath(filename) for filename in Batch.findBamFiles(paths)]
+        stale = self.findStaleFiles(filenames)
+        roots = tuple(os.path.join(os.path.abspath(path), '') for path in paths if os.path.isdir(path))
+        existing = set(filenames)
+        removed = [path for path, in self.connection.execute('SELECT path FROM files') if path.startswith(roots) and path not in existing]
+        placeholders = ', '.join('?' * (len(self.options) + 3))
+        failed = []
+
+        with self.connection:
+            for path in removed:
+                self.removeFile(path)
+
+            for result in Batch.runInPool(indexFile, stale, jobs):
+                if result['error']:
+                    failed.append(result)
+                    continue
+
+                self.removeFile(result['filename'])
+                self.connection.execute('INSERT INTO files VALUES (?, ?, ?, ?)', (result['filename'], result['mtime'], result['size'], result['version']))
+                self.connection.executemany(f'INSERT INTO textures VALUES ({placeholders})', result['rows'])
+
+        return len(stale) - len(failed), len(removed), failed
+
+    def removeFile(self, path):
+        self.connection.execute('DELETE FROM files WHERE path = ?', (path,))
+        self.connection.execute('DELETE FROM textures WHERE path = ?', (path,))
+
+    def query(self, values, limit=None):
+        """
+        Finds textures by field values, as returned by Batch.parseAssignments().
+        String values may use glob wildcards.
+        Yields (path, obj_id, name, filename) tuples.
+        """
+        conditions = []
+        parameters = []
+
+        for field, value in values.items():
+            option = Batch.findOption(field)
+
+            if option.field_type == BLOB:
+                raise ValueError(f'{field} can not be queried.')
+
+            if option.field_type == STRING and any(char in value for char in '*?['):
+                conditions.append(f'{field} GLOB ?')
+            else:
+                conditions.append(f'{field} = ?')
+
+            parameters.append(toColumn(option, value))
+
+        return self.select(' AND '.join(conditions) or '1', parameters, limit)
+
+    def search(self, text, limit=None):
+        """
+        Finds textures whose filename or name contains text.
+        Text made of field=value assignments is run through query() instead.
+        """
+        if '=' in text:
+            return self.query(Batch.parseAssignments(shlex.split(text)), limit)
+
+        pattern = '%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        return self.select("filename LIKE ? ESCAPE '\\' OR name LIKE ? ESCAPE '\\'", [pattern, pattern], limit)
+
+    def select(self, where, parameters, limit):
+        sql = f'SELECT path, obj_id, name, filename FROM textures WHERE {where} ORDER BY path, filename, name'
+
+        if limit is not None:
+            sql += f' LIMIT {int(limit)}'
+
+        return self.connection.execute(sql, parameters)
+
+def addIndexArguments(parser):
+    parser.add_argument('paths', nargs='+', help='BAM files or directory trees to index')
+    parser.add_argument('--db', default=DEFAULT_DATABASE, help=f'index database (default: {DEFAULT_DATABASE})')
+    Batch.addPoolArguments(parser)
+
+def runIndex(args):
+    start = time.perf_counter()
+    index = TextureIndex(args.db)
+    parsed, removed, failed = index.update(args.paths, args.jobs)
+    index.close()
+
+    for result in failed:
+        print(f'{result["filename"]}: FAILED\n{result["error"]}')
+
+    print(f'{parsed} files indexed, {removed} removed, {len(failed)} failed in {time.perf_counter() - start:.2f}s')
+    return 1 if failed else 0
+
+def addQueryArguments(parser):
+    parser.add_argument('assignments', nargs='*', metavar='field=value', help='field values to match; strings may use glob wildcards')
+    parser.add_argument('--db', default=DEFAULT_DATABASE, help=f'index database (default: {DEFAULT_DATABASE})')
+    parser.add_argument('--limit', type=int, help='maximum number of results')
+
+def runQuery(args):
+    index = TextureIndex(args.db)
+
+    for path, obj_id, name, filename in index.query(Batch.parseAssignments(args.assignments), args.limit):
+        print(f'{path}\t{obj_id}\t{name}\t{filename}')
+
+    index.close()
+    return 0
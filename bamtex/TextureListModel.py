@@ -0,0 +1,150 @@
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, Qt
+from PyQt5.QtGui import QImage
+from .ThumbnailCache import THUMBNAIL_SIZE
+import bisect, threading
+
+# Lists this long build their search index on a background thread
+BACKGROUND_INDEX_SIZE = 5000
+
+def buildTrigrams(keys):
+    """
+    Maps every trigram of keys to the ascending indices of the keys containing it, in one pass.
+    """
+    trigrams = {}
+
+    for i, key in enumerate(keys):
+        for trigram in {key[j:j + 3] for j in range(len(key) - 2)}:
+            posting = trigrams.get(trigram)
+
+            if posting is None:
+                trigrams[trigram] = [i]
+            else:
+                posting.append(i)
+
+    return trigrams
+
+class TextureListModel(QAbstractListModel):
+    """
+    A list model that reads straight from the texture list instead of holding one
+    item per texture, with incremental substring filtering over filename and name.
+    """
+
+    def __init__(self, textures, parent=None):
+        QAbstractListModel.__init__(self, parent)
+        self.textures = textures
+        self.labels = [texture.filename or texture.name for texture in textures]
+        self.keys = [f'{texture.filename}\n{texture.name}'.lower() for texture in textures]
+        self.rows = range(len(textures))
+        self.filterText = ''
+        self.trigrams = None
+        self.thumbnails = None
+        self.objectRows = None
+        self.placeholder = None
+
+        if len(self.keys) < BACKGROUND_INDEX_SIZE:
+            self.buildIndex()
+        else:
+            # Filters scan every key until the index is ready
+            threading.Thread(target=self.buildIndex, daemon=True).start()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.rows):
+            return None
+
+        if role == Qt.DisplayRole or role == Qt.ToolTipRole:
+            return self.labels[self.rows[index.row()]]
+
+        if role == Qt.DecorationRole and self.thumbnails is not None:
+            # Views only ask for the rows they paint, so only visible thumbnails are decoded
+            return self.thumbnails.getThumbnail(self.textures[self.rows[index.row()]]) or self.placeholder
+
+        return None
+
+    def setThumbnails(self, thumbnails):
+        if self.thumbnails is not None:
+            self.thumbnails.ready.disconnect(self.thumbnailReady)
+
+        self.thumbnails = thumbnails
+
+        if thumbnails is not None:
+            thumbnails.ready.connect(self.thumbnailReady)
+
+            # Rows keep the same height while their thumbnails are decoded
+            self.placeholder = QImage(THUMBNAIL_SIZE, THUMBNAIL_SIZE, QImage.Format_ARGB32)
+            self.placeholder.fill(Qt.transparent)
+
+        self.refreshThumbnails()
+
+    def refreshThumbnails(self, textures=None):
+        if textures is None:
+            if self.rows:
+                self.dataChanged.emit(self.index(0), self.index(len(self.rows) - 1), [Qt.DecorationRole])
+
+            return
+
+        for texture in textures:
+            self.thumbnailReady(texture.obj_id)
+
+    def thumbnailReady(self, obj_id):
+        if self.objectRows is None:
+            self.objectRows = {texture.obj_id: i for i, texture in enumerate(self.textures)}
+
+        i = self.objectRows.get(obj_id)
+
+        if i is None:
+            return
+
+        # Filtered rows are kept in ascending order
+        row = bisect.bisect_left(self.rows, i)
+
+        if row < len(self.rows) and self.rows[row] == i:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+    def textureAt(self, row):
+        return self.textures[self.rows[row]]
+
+    def buildIndex(self):
+        # Assigned whole, so filters never see a partial index
+        self.trigrams = buildTrigrams(self.keys)
+
+    def findCandidates(self, text):
+        if self.filterText and text.startswith(self.filterText):
+            # Typing more can only narrow the current matches
+            return self.rows
+
+        trigrams = self.trigrams
+
+        if len(text) < 3 or trigrams is None:
+            return range(len(self.keys))
+
+        postings = sorted((trigrams.get(text[j:j + 3], []) for j in range(len(text) - 2)), key=len)
+        candidates = set(postings[0])
+
+        for posting in postings[1:]:
+            if not candidates:
+                break
+
+            candidates.intersection_update(posting)
+
+        return sorted(candidates)
+
+    def setFilter(self, text):
+        text = text.lower()
+
+        if text == self.filterText:
+            return
+
+        self.beginResetModel()
+
+        if text:
+            keys = self.keys
+            self.rows = [i for i in self.findCandidates(text) if text in keys[i]]
+        else:
+            self.rows = range(len(self.textures))
+
+        self.filterText = text
+        self.endResetModel()
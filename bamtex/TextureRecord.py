@@ -0,0 +1,89 @@
+from panda3d.core import LColorf
+from .TextureScanner import scanTextures
+
+"""
+  A compact, read-mostly copy of the fields of a Texture.
+
+  Corpus-wide tools keep hundreds of thousands of textures around. A Texture
+  carries an instance dictionary, a reference to its BamFile and its payloads;
+  a TextureRecord only has slots for the fields, keeps colors as float tuples
+  and remembers the size of the payloads instead of the payloads themselves.
+"""
+
+FIELDS = (
+    'name', 'filename', 'alpha_filename', 'primary_file_num_channels', 'alpha_file_channel',
+    'has_rawdata', 'texture_type', 'has_read_mipmaps', 'wrap_u', 'wrap_v', 'wrap_w',
+    'minfilter', 'magfilter', 'anisotropic_degree', 'border_color', 'min_lod', 'max_lod',
+    'lod_bias', 'compression', 'quality_level', 'tex_format', 'num_components', 'usage_hint',
+    'auto_texture_scale', 'orig_file_x_size', 'orig_file_y_size', 'has_simple_ram_image',
+    'simple_x_size', 'simple_y_size', 'simple_image_date_generated', 'has_clear_color', 'clear_color'
+)
+
+COLOR_FIELDS = ('border_color', 'clear_color')
+
+def toTuple(color):
+    return (float(color[0]), float(color[1]), float(color[2]), float(color[3]))
+
+class TextureRecord(object):
+    __slots__ = ('path', 'obj_id', 'bam_version', 'simple_ram_image_size', 'texture_data_size') + FIELDS
+
+    @classmethod
+    def fromTexture(cls, texture, path=None):
+        record = cls()
+        record.path = path
+        record.obj_id = texture.obj_id
+        record.bam_version = texture.bam_version
+        record.simple_ram_image_size = len(texture.simple_ram_image)
+        record.texture_data_size = len(texture.texture_data)
+
+        for field in FIELDS:
+            setattr(record, field, getattr(texture, field))
+
+        for field in COLOR_FIELDS:
+            setattr(record, field, toTuple(getattr(record, field)))
+
+        return record
+
+    def applyTo(self, texture):
+        """
+        Copies the fields that differ onto texture, converting colors back to
+        Panda types, and marks it dirty. Returns whether anything changed.
+        """
+        changed = False
+
+        for field in FIELDS:
+            value = getattr(self, field)
+
+            if field in COLOR_FIELDS:
+                if toTuple(getattr(texture, field)) == value:
+                    continue
+
+                value = LColorf(*value)
+            elif getattr(texture, field) == value:
+                continue
+
+            setattr(texture, field, value)
+            changed = True
+
+        if changed:
+            texture.dirty = True
+
+        return changed
+
+    def __repr__(self):
+        return f'TextureRecord(path={self.path!r}, obj_id={self.obj_id}, name={self.name!r}, filename={self.filename!r})'
+
+def scanRecords(filename):
+    """
+    Yields a record for every Texture in filename, lazily and in stream order.
+    No record refers to the file's mapping or to its payloads.
+    """
+    for texture in scanTextures(filename):
+        yield TextureRecord.fromTexture(texture, filename)
+
+def readRecords(filename):
+    """
+    Returns a record for every Texture in filename.
+    The file is only mapped while it is scanned.
+    """
+    return list(scanRecords(filename))
@@ -0,0 +1,43 @@
+from .MappedBamFile import MappedBamFile
+from .Texture import Texture
+from . import Batch
+import traceback
+
+"""
+  Streams the Texture objects out of BAM files without building their object maps,
+  for inventory, search and lint jobs over whole asset trees.
+"""
+
+def scanTextures(filename):
+    """
+    Yields every Texture in filename, lazily and in stream order.
+    Memory use does not grow with the number of objects in the file.
+    """
+    bam = MappedBamFile()
+
+    with open(filename, 'rb') as f:
+        yield from bam.scan(f, Texture)
+
+def addArguments(parser):
+    parser.add_argument('paths', nargs='+', help='BAM files or directory trees to scan')
+    Batch.addFilterArguments(parser)
+
+def run(args):
+    Batch.registerTypes()
+    textureFilter = Batch.TextureFilter(args.name, args.bam_version)
+    failed = 0
+
+    for filename in Batch.findBamFiles(args.paths):
+        try:
+            for texture in scanTextures(filename):
+                if not textureFilter.matchesFile(texture.bam_file):
+                    break
+
+                if textureFilter.matches(texture):
+                    print(f'{filename}\t{texture.obj_id}\t{texture.name}\t{texture.filename}')
+        except Exception:
+            # Textures read before the damage are already printed
+            failed += 1
+            print(f'{filename}: FAILED\n{traceback.format_exc()}')
+
+    return 1 if failed else 0
@@ -0,0 +1,319 @@
+from .OptionGlobals import *
+from .TextureRecord import toTuple
+from .TextureScanner import scanTextures
+from . import Batch, Globals
+import os, time, traceback
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+"""
+  A columnar table of every texture field across an asset directory, for audits.
+
+  Rows are (file, texture) pairs in a NumPy structured array, so filters are array
+  expressions over whole columns, and bulk assignments are written back only to
+  the files that hold an affected row.
+
+  python -m bamtex table phase_3/ --where "(minfilter >= 3) & ~has_read_mipmaps"
+  python -m bamtex table phase_3/ --where "anisotropic_degree > 8" --set anisotropic_degree=8
+"""
+
+COLUMN_DTYPES = {
+    BOOL: '?',
+    UINT8: 'u1',
+    UINT32: 'u4',
+    INT16: 'i2',
+    INT32: 'i4',
+    FLOAT: 'f8',
+    COLOR: ('f4', (4,)),
+    STRING: 'O',
+    ENUM: 'u1'
+}
+
+def requireNumpy():
+    if numpy is None:
+        raise ValueError('The texture table requires NumPy.')
+
+def getColumnOptions():
+    return [option for _, options in Globals.TextureFields for option in options if option.field_type != BLOB]
+
+def getDtype():
+    fields = [('file', 'i4'), ('obj_id', 'i4')]
+    fields.extend((option.field, COLUMN_DTYPES[option.field_type]) for option in getColumnOptions())
+    return numpy.dtype(fields)
+
+def readFileRows(filename):
+    """
+    Reads the rows of one file in a worker process, with the file column left at 0.
+    """
+    fields = [option.field for option in getColumnOptions()]
+    result = {'filename': filename, 'version': None, 'double': False, 'rows': None, 'error': None}
+    rows = []
+
+    try:
+        for texture in scanTextures(filename):
+            result['version'] = texture.bam_version
+            result['double'] = texture.bam_file.stdfloat_double
+            row = [0, texture.obj_id]
+            row.extend(getattr(texture, field) for field in fields)
+            rows.append(tuple(row))
+
+        result['rows'] = numpy.array(rows, dtype=getDtype())
+    except Exception:
+        result['error'] = traceback.format_exc()
+
+    return result
+
+def updateFile(update, values):
+    """
+    Assigns values to the textures of one (filename, obj_ids) pair in a worker process,
+    and saves the file if anything changed.
+    """
+    filename, obj_ids = update
+    start = time.perf_counter()
+    result = {'filename': filename, 'size': os.path.getsize(filename), 'changed': 0, 'error': None}
+
+    try:
+        bam = Batch.loadBamFile(filename)
+        obj_ids = set(obj_ids)
+
+        for texture in Batch.getTextures(bam):
+            # Fields the texture does not store would be dropped on save
+            if texture.obj_id in obj_ids and Batch.assignFields(texture, values)[0]:
+                result['changed'] += 1
+
+        if result['changed']:
+            Batch.saveBamFile(bam, filename)
+    except Exception:
+        result['error'] = traceback.format_exc()
+
+    result['time'] = time.perf_counter() - start
+    return result
+
+class TextureTable(object):
+
+    def __init__(self, files=None, rows=None, versions=None, doubles=None):
+        requireNumpy()
+        self.options = {option.field: option for option in getColumnOptions()}
+        self.files = files or []
+        self.versions = versions or [None] * len(self.files)
+        self.doubles = numpy.array(doubles or [False] * len(self.files), dtype=bool)
+        self.rows = rows if rows is not None else numpy.zeros(0, dtype=getDtype())
+        self.failed = []
+
+    @classmethod
+    def load(cls, paths, jobs=None):
+        """
+        Loads the rows of every file under paths.
+        Files that fail to load are left out and their results kept in failed.
+        """
+        requireNumpy()
+        files = []
+        versions = []
+        doubles = []
+        parts = []
+        failed = []
+
+        for result in Batch.runInPool(readFileRows, list(Batch.findBamFiles(paths)), jobs):
+            if result['error']:
+                failed.append(result)
+                continue
+
+            rows = result['rows']
+            rows['file'] = len(files)
+            files.append(result['filename'])
+            versions.append(result['version'])
+            doubles.append(result['double'])
+            parts.append(rows)
+
+        table = cls(files, numpy.concatenate(parts) if parts else None, versions, doubles)
+        table.failed = failed
+        return table
+
+    def __len__(self):
+        return len(self.rows)
+
+    def getColumns(self):
+        return {name: self.rows[name] for name in self.rows.dtype.names}
+
+    def where(self, expression):
+        """
+        Evaluates a NumPy expression over the columns, such as
+        (minfilter >= 3) & ~has_read_mipmaps, and returns the row mask.
+        """
+        namespace = self.getColumns()
+        namespace['numpy'] = numpy
+
+        try:
+            mask = eval(expression, {'__builtins__': {}}, namespace)
+        except Exception as e:
+            raise ValueError(f'Invalid expression "{expression}": {e}')
+
+        return numpy.broadcast_to(numpy.asarray(mask, dtype=bool), self.rows.shape)
+
+    def match(self, values):
+        """
+        Returns the mask of rows equal to values, as returned by Batch.parseAssignments(),
+        once encoded in the file of each row.
+        """
+        mask = numpy.ones(len(self.rows), dtype=bool)
+
+        for field, value in values.items():
+            if field not in self.options:
+                raise ValueError(f'{field} is not a column.')
+
+            column = self.rows[field]
+
+            if self.options[field].field_type == COLOR:
+                mask &= numpy.all(column == numpy.array(value, dtype='f4'), axis=1)
+            else:
+                mask &= column == self.getStoredValues(field, value)
+
+        return mask
+
+    def getStoredValues(self, field, value):
+        """
+        Returns value as every row reads it back once encoded in its file.
+        """
+        option = self.options[field]
+
+        if option.field_type != FLOAT:
+            return value
+
+        doubles = self.doubles[self.rows['file']]
+        return numpy.where(doubles, Batch.toStored(option, value, True), Batch.toStored(option, value, False))
+
+    def getStoredMask(self, field, values=None):
+        """
+        Returns the mask of rows that store field once values are assigned to them.
+        """
+        values = values or {}
+        option = self.options[field]
+        stored = [i for i, version in enumerate(self.versions) if version is not None and Batch.storesVersion(option, version)]
+        mask = numpy.isin(self.rows['file'], stored)
+
+        # Optional fields also depend on other fields of each row
+        return mask & Batch.storesField(option, lambda field: values[field] if field in values else self.rows[field])
+
+    def findChanges(self, mask, values):
+        """
+        Returns the mask of rows in mask that would change if values were assigned,
+        leaving out fields their rows do not store.
+        """
+        changes = numpy.zeros(len(self.rows), dtype=bool)
+
+        for field, value in values.items():
+            if field not in self.options:
+                raise ValueError(f'{field} is not a column.')
+
+            changes |= mask & self.getStoredMask(field, values) & ~self.match({field: value})
+
+        return changes
+
+    def countBy(self, field, mask=None):
+        column = self.rows[field] if mask is None else self.rows[field][mask]
+        # Colors are counted per distinct RGBA row
+        values, counts = numpy.unique(column, return_counts=True, axis=0 if column.ndim > 1 else None)
+        return list(zip(values, counts))
+
+    def assign(self, mask, values, jobs=None):
+        """
+        Assigns values to the rows in mask and returns an iterator that writes them
+        to the files holding those rows, in parallel, yielding the result of every file.
+        Rows that already hold the values are skipped, so untouched files are never rewritten,
+        and so are fields their file's bam version does not store.
+        """
+        for field in values:
+            if field not in self.options:
+                raise ValueError(f'{field} is not a column.')
+
+        values = {field: toTuple(value) if self.options[field].field_type == COLOR else value for field, value in values.items()}
+        pending = self.findChanges(mask, values)
+
+        stored = {field: mask & self.getStoredMask(field, values) for field in values}
+
+        for field, value in values.items():
+            value = self.getStoredValues(field, value)
+            rows = stored[field]
+            self.rows[field][rows] = value[rows] if isinstance(value, numpy.ndarray) else value
+
+        updates = []
+
+        for file in numpy.unique(self.rows['file'][pending]):
+            obj_ids = self.rows['obj_id'][pending & (self.rows['file'] == file)]
+            updates.append((self.files[file], obj_ids.tolist()))
+
+        return Batch.runInPool(updateFile, updates, jobs, values)
+
+    def describe(self, mask):
+        for row in self.rows[mask]:
+            yield self.files[row['file']], int(row['obj_id']), row['name'], row['filename']
+
+def addArguments(parser):
+    parser.add_argument('paths', nargs='+', help='BAM files or directory trees to load')
+    parser.add_argument('--where', default='True', metavar='EXPRESSION', help='NumPy expression over the field columns selecting the rows')
+    parser.add_argument('--count-by', metavar='FIELD', help='print the number of selected rows per value of FIELD')
+    parser.add_argument('--set', action='append', default=[], metavar='field=value', help='assign a field on the selected rows and save their files')
+    parser.add_argument('-n', '--dry-run', action='store_true', help='report what would change without writing')
+    parser.add_argument('--limit', type=int, help='maximum number of rows printed')
+    Batch.addPoolArguments(parser)
+
+def run(args):
+    requireNumpy()
+    values = Batch.parseAssignments(args.set)
+    start = time.perf_counter()
+    table = TextureTable.load(args.paths, args.jobs)
+
+    for result in table.failed:
+        print(f'{result["filename"]}: FAILED\n{result["error"]}')
+
+    print(f'{len(table)} textures in {len(table.files)} files loaded in {time.perf_counter() - start:.2f}s')
+
+    start = time.perf_counter()
+    mask = table.where(args.where)
+    print(f'{numpy.count_nonzero(mask)} textures selected in {(time.perf_counter() - start) * 1000:.1f}ms')
+
+    if args.count_by:
+        if args.count_by not in table.options:
+            raise ValueError(f'{args.count_by} is not a column.')
+
+        for value, count in table.countBy(args.count_by, mask):
+            print(f'{table.options[args.count_by].formatValue(value)}\t{count}')
+    elif not values:
+        for i, (path, obj_id, name, filename) in enumerate(table.describe(mask)):
+            if args.limit is not None and i >= args.limit:
+                break
+
+            print(f'{path}\t{obj_id}\t{name}\t{filename}')
+
+    failed = len(table.failed)
+
+    if not values:
+        return 1 if failed else 0
+
+    for field in values:
+        skipped = numpy.count_nonzero(mask & ~table.getStoredMask(field, values))
+
+        if skipped:
+            print(f'{field}: {skipped} selected textures do not store it, skipped')
+
+    if args.dry_run:
+        affected = table.findChanges(mask, values)
+        print(f'{numpy.count_nonzero(affected)} textures in {len(numpy.unique(table.rows["file"][affected]))} files would change')
+        return 1 if failed else 0
+
+    throughput = Batch.Throughput()
+
+    for result in table.assign(mask, values, args.jobs):
+        throughput.add(result['size'])
+
+        if result['error']:
+            failed += 1
+            print(f'{result["filename"]}: FAILED in {result["time"] * 1000:.1f}ms\n{result["error"]}')
+        else:
+            print(f'{result["filename"]}: {result["changed"]} textures changed in {result["time"] * 1000:.1f}ms')
+
+    print(throughput.summary())
+    return 1 if failed else 0
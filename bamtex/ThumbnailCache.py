@@ -0,0 +1,143 @@
+from PyQt5.QtCore import QObject, QThread, Qt, pyqtSignal
+from PyQt5.QtGui import QImage
+from collections import OrderedDict
+import queue, zlib
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Edge length of the thumbnails shown in the texture list
+THUMBNAIL_SIZE = 32
+
+# Decoded images are evicted least recently used first beyond this many bytes
+DEFAULT_CACHE_BYTES = 32 * 1024 * 1024
+
+def decodeSimpleImage(data, width, height):
+    """
+    Converts a simple RAM image, which is BGRA stored bottom row first, into a QImage.
+    Returns None if the image does not match its size.
+    """
+    size = width * height * 4
+
+    if not width or not height or len(data) < size:
+        return None
+
+    if numpy is None:
+        return QImage(bytes(data[:size]), width, height, width * 4, QImage.Format_ARGB32).mirrored()
+
+    # BGRA bytes are exactly ARGB32 pixels in memory, so only the rows need flipping
+    pixels = numpy.frombuffer(data, numpy.uint8, size).reshape(height, width, 4)[::-1]
+    return QImage(pixels.tobytes(), width, height, width * 4, QImage.Format_ARGB32).copy()
+
+def getSignature(texture):
+    # Keyed on the contents, since the identity of a freed payload can be reused by its replacement
+    return (texture.simple_x_size, texture.simple_y_size, len(texture.simple_ram_image), zlib.crc32(texture.simple_ram_image))
+
+class ThumbnailWorker(QThread):
+    decoded = pyqtSignal(object, object, object, object)
+
+    def __init__(self):
+        QThread.__init__(self)
+        self.requests = queue.Queue()
+
+    def request(self, key, signature, data, width, height):
+        self.requests.put((key, signature, data, width, height))
+
+    def stop(self):
+        self.requests.put(None)
+        self.wait()
+
+    def run(self):
+        while True:
+            request = self.requests.get()
+
+            if request is None:
+                break
+
+            key, signature, data, width, height = request
+            image = decodeSimpleImage(data, width, height)
+            thumbnail = None
+
+            if image is not None:
+                thumbnail = image.scaled(THUMBNAIL_SIZE, THUMBNAIL_SIZE, Qt.KeepAspectRatio, Qt.FastTransformation)
+
+            self.decoded.emit(key, signature, image, thumbnail)
+
+class ThumbnailCache(QObject):
+    """
+    Decoded simple RAM images keyed by object id, in a size-bounded LRU.
+    Missing images are decoded on a background thread; ready is emitted with
+    the object id once they can be fetched.
+    """
+    ready = pyqtSignal(object)
+
+    def __init__(self, maxBytes=DEFAULT_CACHE_BYTES, parent=None):
+        QObject.__init__(self, parent)
+        self.maxBytes = maxBytes
+        self.totalBytes = 0
+        self.entries = OrderedDict()
+        self.pending = {}
+        self.worker = ThumbnailWorker()
+        self.worker.decoded.connect(self.imageDecoded)
+        self.worker.start()
+
+    def stop(self):
+        self.worker.stop()
+
+    def clear(self):
+        # Requests still in flight are dropped when they come back
+        self.entries.clear()
+        self.pending.clear()
+        self.totalBytes = 0
+
+    def getEntry(self, texture):
+        if not texture.has_simple_ram_image:
+            return None
+
+        key = texture.obj_id
+        signature = getSignature(texture)
+        entry = self.entries.get(key)
+
+        if entry is not None and entry[0] == signature:
+            self.entries.move_to_end(key)
+            return entry
+
+        if self.pending.get(key) != signature:
+            # Only the small simple image is copied; the map may be released while it decodes
+            self.pending[key] = signature
+            self.worker.request(key, signature, bytes(texture.simple_ram_image), texture.simple_x_size, texture.simple_y_size)
+
+        return None
+
+    def getImage(self, texture):
+        entry = self.getEntry(texture)
+        return entry[1] if entry else None
+
+    def getThumbnail(self, texture):
+        entry = self.getEntry(texture)
+        return entry[2] if entry else None
+
+    def imageDecoded(self, key, signature, image, thumbnail):
+        if self.pending.get(key) != signature:
+            return
+
+        del self.pending[key]
+        self.evict(key)
+
+        # Images that can not be decoded are remembered too, so they are not requested again
+        size = image.sizeInBytes() + thumbnail.sizeInBytes() if image is not None else 0
+        self.entries[key] = (signature, image, thumbnail, size)
+        self.totalBytes += size
+
+        while self.totalBytes > self.maxBytes and len(self.entries) > 1:
+            self.evict(next(iter(self.entries)))
+
+        self.ready.emit(key)
+
+    def evict(self, key):
+        entry = self.entries.pop(key, None)
+
+        if entry is not None:
+            self.totalBytes -= entry[3]
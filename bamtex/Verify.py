@@ -0,0 +1,143 @@
+from .MappedBamFile import COPY_CHUNK_SIZE
+from .TextureCodec import get_codec
+from . import Batch
+import hashlib, os, time, traceback
+
+"""
+  Proves that re-encoding every texture reproduces the original bytes.
+
+  Every file is loaded, every Texture is written again through Texture.write,
+  and the rebuilt file is hashed against the original. Files that differ are
+  narrowed down to the textures, offsets and fields that changed.
+
+  python -m bamtex verify phase_3/ phase_4/
+"""
+
+class HashWriter(object):
+    """
+    A write-only file that only keeps a running hash of what it was given.
+    """
+
+    def __init__(self):
+        self.hash = hashlib.blake2b()
+
+    def write(self, data):
+        self.hash.update(data)
+
+    def hexdigest(self):
+        return self.hash.hexdigest()
+
+def hashFile(filename):
+    writer = HashWriter()
+
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b''):
+            writer.write(chunk)
+
+    return writer.hexdigest()
+
+def findDifference(original, written):
+    """
+    Returns the first offset at which original and written differ, or None.
+    """
+    for i, (a, b) in enumerate(zip(original, written)):
+        if a != b:
+            return i
+
+    if len(original) != len(written):
+        return min(len(original), len(written))
+
+    return None
+
+def findField(spans, offset):
+    for start, end, field in spans:
+        if start <= offset < end:
+            return field
+
+    return 'trailing data'
+
+def verifyFile(filename):
+    start = time.perf_counter()
+    result = {'filename': filename, 'size': os.path.getsize(filename), 'textures': 0, 'failures': [], 'error': None}
+
+    try:
+        bam = Batch.loadBamFile(filename)
+        textures = Batch.getTextures(bam)
+        codec = get_codec(bam.version, bam.stdfloat_double)
+        result['version'] = bam.version
+        result['textures'] = len(textures)
+
+        for texture in textures:
+            texture.dirty = True
+
+        changes = bam.get_changes()
+        writer = HashWriter()
+        bam.write_changes(writer, changes)
+
+        if writer.hexdigest() != hashFile(filename):
+            for texture in textures:
+                original = bytes(bam.objects[texture.obj_id]['data'])
+                written = changes[texture.obj_id]
+
+                if original == written:
+                    continue
+
+                offset = findDifference(original, written)
+                result['failures'].append({
+                    'obj_id': texture.obj_id,
+                    'name': texture.name,
+                    'offset': offset,
+                    'field': findField(codec.get_field_spans(texture), offset),
+                    'original_size': len(original),
+                    'written_size': len(written)
+                })
+
+            if not result['failures']:
+                result['error'] = 'The rebuilt file differs outside of the textures.'
+
+        bam.release()
+    except Exception:
+        result['error'] = traceback.format_exc()
+
+    result['time'] = time.perf_counter() - start
+    return result
+
+def addArguments(parser):
+    parser.add_argument('paths', nargs='+', help='BAM files or directory trees to verify')
+    Batch.addPoolArguments(parser)
+
+def run(args):
+    files = list(Batch.findBamFiles(args.paths))
+    throughput = Batch.Throughput()
+    versions = {}
+    failed = 0
+    textures = 0
+
+    for result in Batch.runInPool(verifyFile, files, args.jobs):
+        throughput.add(result['size'])
+        textures += result['textures']
+
+        if result['error']:
+            failed += 1
+            print(f'{result["filename"]}: FAILED\n{result["error"]}')
+            continue
+
+        version = '%d.%d' % result['version']
+        passed, total = versions.get(version, (0, 0))
+        versions[version] = (passed + (not result['failures']), total + 1)
+
+        if not result['failures']:
+            continue
+
+        failed += 1
+
+        for failure in result['failures']:
+            print(f'{result["filename"]}: texture {failure["obj_id"]} ({failure["name"]}) differs at offset {failure["offset"]} in {failure["field"]} ' +
+                  f'({failure["original_size"]} bytes read, {failure["written_size"]} written)')
+
+    for version, (passed, total) in sorted(versions.items()):
+        print(f'bam {version}: {passed}/{total} files round trip byte for byte')
+
+    print(f'{textures} textures verified')
+    print(throughput.summary())
+    return 1 if failed else 0
@@ -0,0 +1,101 @@
+from collections import OrderedDict
+from .Texture import Texture
+
+"""
+  The BAM files kept open at once, in an LRU capped by their estimated memory.
+
+  Files are evicted least recently used first once the estimate goes over the
+  cap. Files with unsaved changes, pinned files (such as the one on screen) and
+  the most recently used file are never evicted; evicted files are simply parsed
+  again when asked for.
+"""
+
+# Estimated memory of all open files before the least recently used are dropped
+DEFAULT_CACHE_BYTES = 512 * 1024 * 1024
+
+# Rough Python memory held per parsed object, on top of its bytes
+TEXTURE_OVERHEAD = 3000
+OBJECT_OVERHEAD = 600
+
+def estimateSize(bam):
+    if bam.view is not None:
+        # Mapped pages count too, since anything that touched them keeps them resident
+        size = len(bam.view)
+    else:
+        size = sum(len(obj['data']) for obj in bam.objects.values())
+
+    textures = sum(1 for node in bam.object_map.values() if isinstance(node, Texture))
+    return size + textures * TEXTURE_OVERHEAD + (len(bam.objects) - textures) * OBJECT_OVERHEAD
+
+class Workspace(object):
+
+    def __init__(self, maxBytes=DEFAULT_CACHE_BYTES):
+        self.maxBytes = maxBytes
+        self.entries = OrderedDict()
+        self.pinned = set()
+        self.totalBytes = 0
+
+    def __contains__(self, filename):
+        return filename in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, filename):
+        """
+        Returns (bam, textures) of an open file, or None if it has to be parsed again.
+        """
+        entry = self.entries.get(filename)
+
+        if entry is None:
+            return None
+
+        self.entries.move_to_end(filename)
+        return entry[0], entry[1]
+
+    def put(self, filename, bam, textures):
+        """
+        Adds or refreshes an open file. Returns the filenames evicted to make room for it.
+        """
+        self.remove(filename)
+        size = estimateSize(bam)
+        self.entries[filename] = (bam, textures, size)
+        self.totalBytes += size
+        return self.evict()
+
+    def remove(self, filename):
+        entry = self.entries.pop(filename, None)
+
+        if entry is not None:
+            self.totalBytes -= entry[2]
+
+        return entry is not None
+
+    def pin(self, filename):
+        self.pinned.add(filename)
+
+    def unpin(self, filename):
+        self.pinned.discard(filename)
+        self.evict()
+
+    def isEvictable(self, filename):
+        return filename not in self.pinned and not self.entries[filename][0].is_dirty()
+
+    def evict(self):
+        """
+        Drops least recently used files until the estimate fits the cap, or
+        nothing else can be dropped. Returns the evicted filenames.
+        """
+        evicted = []
+
+        # The most recently used file stays even if it is bigger than the cap alone
+        for filename in list(self.entries)[:-1]:
+            if self.totalBytes <= self.maxBytes:
+                break
+
+            if self.isEvictable(filename):
+                # The map is closed once the objects are collected
+                self.remove(filename)
+                evicted.append(filename)
+
+        return evicted
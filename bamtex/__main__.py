@@ -1,6 +1,18 @@
-from p3bamboo.BamFactory import BamFactory
 from .TexEditor import TexEditor
+from . import Commands
+import sys
 
 if __name__ == '__main__':
-    base = TexEditor()
-    base.run()
\ No newline at end of file
+    argv = sys.argv[1:]
+    traceFilename = None
+
+    if argv[:1] == ['--trace']:
+        if len(argv) != 2:
+            sys.exit('usage: python -m bamtex --trace TRACE.json')
+
+        traceFilename = argv[1]
+    elif argv:
+        sys.exit(Commands.main(argv))
+
+    base = TexEditor(traceFilename)
+    base.run()
@@ -0,0 +1,48 @@
+from bamtex.SyntheticBam import generateBamFile
+from bamtex import Batch
+import os, pytest, shutil
+
+"""
+  Shared fixtures: synthetic BAM files generated once per session, and copies
+  of them for tests that save over their input.
+
+  python -m pytest tests
+"""
+
+# The editor is driven without a display
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+@pytest.fixture(scope='session', autouse=True)
+def registerTypes():
+    Batch.registerTypes()
+
+@pytest.fixture(scope='session')
+def syntheticFile(tmp_path_factory):
+    """
+    Returns a function that generates a synthetic BAM file for its arguments,
+    once per session, and returns its filename.
+    """
+    directory = tmp_path_factory.mktemp('synthetic')
+    files = {}
+
+    def getFile(count, version=(6, 45), simpleSize=16, dataSize=0, stdfloatDouble=False):
+        key = (count, version, simpleSize, dataSize, stdfloatDouble)
+
+        if key not in files:
+            filename = str(directory / f'synthetic_{len(files)}_{version[0]}_{version[1]}.bam')
+            generateBamFile(filename, count, version, simpleSize, dataSize, stdfloatDouble=stdfloatDouble)
+            files[key] = filename
+
+        return files[key]
+
+    return getFile
+
+@pytest.fixture
+def copyFile(tmp_path):
+    """
+    Returns a function that copies a file into the test's own directory.
+    """
+    def copy(filename):
+        return str(shutil.copy(filename, tmp_path / os.path.basename(filename)))
+
+    return copy
@@ -0,0 +1,101 @@
+from bamtex.Verify import hashFile
+from bamtex import Batch, BatchEdit
+import pytest
+
+"""
+  Batch edits only touch fields a texture's datagram stores, and only when the
+  value reads back differently once encoded, so repeated runs change nothing.
+"""
+
+def edit(filename, *assignments):
+    result = BatchEdit.editFile(filename, Batch.parseAssignments(assignments), Batch.TextureFilter(), False)
+    assert result['error'] is None
+    return result
+
+def testBatchEditSkipsFieldsOlderVersionsLack(syntheticFile, copyFile):
+    filename = copyFile(syntheticFile(50, (6, 14)))
+    before = hashFile(filename)
+
+    result = edit(filename, 'has_read_mipmaps=true', 'min_lod=3')
+    assert result['changed'] == 0
+    assert result['skipped'] == ['has_read_mipmaps', 'min_lod']
+    assert hashFile(filename) == before
+
+@pytest.mark.parametrize('version', [(6, 14), (6, 44)], ids=lambda version: '%d.%d' % version)
+def testBatchEditSkipsClearColorBefore645(syntheticFile, copyFile, version):
+    filename = copyFile(syntheticFile(50, version))
+    before = hashFile(filename)
+
+    result = edit(filename, 'has_clear_color=true', 'clear_color=#ff102030')
+    assert result['changed'] == 0
+    assert result['skipped'] == ['has_clear_color', 'clear_color']
+    assert hashFile(filename) == before
+
+def testBatchEditSkipsUsageHintOfNonBufferTextures(syntheticFile, copyFile):
+    filename = copyFile(syntheticFile(50))
+    before = hashFile(filename)
+
+    result = edit(filename, 'usage_hint=Static')
+    assert result['changed'] == 0
+    assert result['skipped'] == ['usage_hint']
+    assert hashFile(filename) == before
+
+    # Turning a texture into a buffer texture makes it store a usage hint
+    result = edit(filename, 'texture_type=Buffer Texture', 'usage_hint=Static')
+    assert result['changed'] == 50
+    assert result['skipped'] == []
+
+    for texture in Batch.getTextures(Batch.loadBamFile(filename)):
+        assert texture.usage_hint == 3
+
+def testBatchEditSkipsSimpleImageFieldsWithoutOne(syntheticFile, copyFile):
+    filename = copyFile(syntheticFile(50, simpleSize=0))
+    before = hashFile(filename)
+
+    result = edit(filename, 'simple_x_size=8', 'simple_image_date_generated=5')
+    assert result['changed'] == 0
+    assert result['skipped'] == ['simple_x_size', 'simple_image_date_generated']
+    assert hashFile(filename) == before
+
+def testBatchEditSetsClearColorWithItsFlag(syntheticFile, copyFile):
+    filename = copyFile(syntheticFile(50))
+
+    result = edit(filename, 'clear_color=#ff102030')
+    assert result['changed'] == 0
+    assert result['skipped'] == ['clear_color']
+
+    result = edit(filename, 'clear_color=#ff102030', 'has_clear_color=true')
+    assert result['changed'] == 50
+    assert result['skipped'] == []
+
+    after = hashFile(filename)
+    result = edit(filename, 'has_clear_color=true', 'clear_color=#ff102030')
+    assert result['changed'] == 0
+    assert hashFile(filename) == after
+
+@pytest.mark.parametrize('stdfloatDouble', [False, True], ids=['float', 'double'])
+def testBatchEditComparesFloatsAsStored(syntheticFile, copyFile, stdfloatDouble):
+    filename = copyFile(syntheticFile(50, stdfloatDouble=stdfloatDouble))
+
+    result = edit(filename, 'min_lod=0.1', 'border_color=#4c1a334d')
+    assert result['changed'] == 50
+
+    after = hashFile(filename)
+    result = edit(filename, 'min_lod=0.1', 'border_color=#4c1a334d')
+    assert result['changed'] == 0
+    assert hashFile(filename) == after
+
+def testTableComparesFloatsAsStored(syntheticFile, copyFile):
+    TextureTable = pytest.importorskip('bamtex.TextureTable')
+    pytest.importorskip('numpy')
+    filename = copyFile(syntheticFile(50))
+    values = Batch.parseAssignments(['min_lod=0.1', 'usage_hint=Static'])
+
+    table = TextureTable.TextureTable.load([filename], 1)
+    mask = table.where('True')
+    assert not table.getStoredMask('usage_hint', values).any()
+    assert table.findChanges(mask, values).all()
+    assert all(result['changed'] == 50 for result in table.assign(mask, values, 1))
+
+    table = TextureTable.TextureTable.load([filename], 1)
+    assert not table.findChanges(mask, values).any()
@@ -0,0 +1,72 @@
+from bamtex.Dedup import DedupReport, confirmPayloads, hashPayloads, stripFile
+from bamtex.Verify import hashFile
+from bamtex import Batch, Dedup
+import os, shutil
+
+"""
+  Finding repeated payloads across files, confirming weak hash matches, and
+  stripping duplicated raw data.
+"""
+
+def makeTree(syntheticFile, tmp_path, count=10):
+    # The same textures twice, and a file whose payloads differ
+    filenames = [str(tmp_path / name) for name in ('a.bam', 'b.bam', 'c.bam')]
+    shutil.copy(syntheticFile(count, dataSize=256), filenames[0])
+    shutil.copy(syntheticFile(count, dataSize=256), filenames[1])
+    shutil.copy(syntheticFile(count, (6, 14), dataSize=256), filenames[2])
+    return filenames
+
+def getReport(filenames):
+    report = DedupReport()
+
+    for filename in filenames:
+        result = hashPayloads(filename)
+        assert result['error'] is None
+        report.add(result)
+
+    report.confirm([confirmPayloads(update) for update in report.getCandidates().items()])
+    return report
+
+def testDuplicatesAcrossFiles(syntheticFile, tmp_path):
+    filenames = makeTree(syntheticFile, tmp_path)
+    report = getReport(filenames)
+
+    # Same seed, so the 6.14 file repeats the payloads too
+    duplicates = report.getDuplicates()
+    assert len(duplicates) == 20
+    assert all(len(members) == 3 for _, _, members in duplicates)
+    assert report.getRedundantBytes('texture_data') == 10 * 256 * 2
+    assert report.getRedundantBytes('simple_ram_image') == 10 * 16 * 16 * 4 * 2
+
+def testCollisionsAreSplit(syntheticFile, tmp_path, monkeypatch):
+    filenames = makeTree(syntheticFile, tmp_path)[:1]
+
+    # Every payload of one size collides
+    monkeypatch.setattr(Dedup, 'hashPayload', lambda data: '00000000')
+    report = DedupReport()
+    report.add(hashPayloads(filenames[0]))
+    assert len(report.getDuplicates()) == 2
+
+    report.confirm([confirmPayloads(update) for update in report.getCandidates().items()])
+    assert report.getDuplicates() == []
+
+def testStripDuplicatedRawData(syntheticFile, tmp_path):
+    filenames = makeTree(syntheticFile, tmp_path)
+    strippable = getReport(filenames).getStrippable()
+    assert sorted(strippable) == filenames
+    assert all(len(obj_ids) == 10 for obj_ids in strippable.values())
+
+    size = os.path.getsize(filenames[0])
+    result = stripFile((filenames[0], strippable[filenames[0]]))
+    assert result['error'] is None
+    assert (result['changed'], result['saved']) == (10, 10 * 256)
+    assert os.path.getsize(filenames[0]) == size - 10 * 256
+
+    for texture in Batch.getTextures(Batch.loadBamFile(filenames[0])):
+        assert not texture.has_rawdata
+        assert len(texture.texture_data) == 0
+
+    # Stripping again changes nothing
+    before = hashFile(filenames[0])
+    assert stripFile((filenames[0], strippable[filenames[0]]))['changed'] == 0
+    assert hashFile(filenames[0]) == before
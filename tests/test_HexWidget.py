@@ -0,0 +1,68 @@
+from bamtex.OptionGlobals import BLOB
+from bamtex import Batch
+import pytest, time
+
+"""
+  The hex view of BLOB fields: byte edits kept over the shown payload, and the
+  payload staying readable across saves, which unmap the file it points into.
+"""
+
+@pytest.fixture(scope='module')
+def app():
+    from PyQt5.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
+def testEditsAreKeptOverThePayload(app):
+    from bamtex.HexWidget import HexWidget
+
+    widget = HexWidget(None)
+    applied = []
+    widget.connect(applied.append)
+    data = memoryview(bytes(range(64)))
+    widget.loadData(data)
+
+    widget.view.cursor = 3
+    widget.view.setByte(0xaa)
+    widget.view.cursor = 4
+    widget.view.setByte(4)
+    assert widget.view.edits == {3: 0xaa}
+    assert widget.view.getByte(3) == 0xaa
+    assert data[3] == 3
+
+    widget.applyEdits()
+    assert applied == [bytes(range(3)) + b'\xaa' + bytes(range(4, 64))]
+    widget.close()
+
+def testSaveWhileBlobIsShown(app, syntheticFile, copyFile, monkeypatch):
+    from PyQt5.QtWidgets import QMessageBox
+    from bamtex.MainWidget import MainWidget
+
+    monkeypatch.setattr(QMessageBox, 'question', lambda *args: QMessageBox.Yes)
+    monkeypatch.setattr(QMessageBox, 'information', lambda *args: QMessageBox.Ok)
+
+    filename = copyFile(syntheticFile(20))
+    bam = Batch.loadBamFile(filename)
+    textures = Batch.getTextures(bam)
+    widget = MainWidget(None)
+
+    try:
+        widget.showFile(filename, bam, textures)
+        widget.openTextures(textures[:1])
+        option = next(option for option in widget.options if option.field_type == BLOB)
+        view = option.getWidget().view
+        assert isinstance(view.data, memoryview)
+
+        widget.binding.applyChanges({'anisotropic_degree': 3})
+        widget.saveBamFile()
+        deadline = time.monotonic() + 10
+
+        while widget.worker is not None and time.monotonic() < deadline:
+            app.processEvents()
+
+        assert not bam.is_dirty()
+        assert bytes(view.data) == bytes(textures[0].simple_ram_image)
+        assert option.getObjects() == textures[:1]
+        view.viewport().repaint()
+        app.processEvents()
+    finally:
+        widget.close()
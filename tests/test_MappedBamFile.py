@@ -0,0 +1,77 @@
+from p3bamboo.BamGlobals import BAMException
+from bamtex.Verify import hashFile
+from bamtex import Batch
+import io, os, pytest
+
+"""
+  Loading mapped BAM files, and saves that splice re-encoded objects between
+  the untouched bytes of the mapped original.
+"""
+
+@pytest.mark.parametrize('data', [b'', b'pbj', b'not a bam file'], ids=['empty', 'short', 'junk'])
+def testLoadRejectsNonBamFiles(tmp_path, data):
+    filename = tmp_path / 'broken.bam'
+    filename.write_bytes(data)
+
+    with pytest.raises(BAMException, match='Invalid BAM header'):
+        Batch.loadBamFile(str(filename))
+
+def testWriteChangesWithoutChanges(syntheticFile):
+    filename = syntheticFile(200, dataSize=64)
+    bam = Batch.loadBamFile(filename)
+    f = io.BytesIO()
+    bam.write_changes(f, {})
+
+    with open(filename, 'rb') as original:
+        assert f.getvalue() == original.read()
+
+def testWriteChangesSplices(syntheticFile, copyFile):
+    filename = copyFile(syntheticFile(200, dataSize=64))
+    bam = Batch.loadBamFile(filename)
+    original = {obj_id: bytes(obj['data']) for obj_id, obj in bam.objects.items()}
+    textures = Batch.getTextures(bam)
+
+    # The first, a middle and the last object, growing, shrinking and keeping their size
+    edits = {
+        textures[0].obj_id: {'filename': 'phase_3/maps/a_much_longer_texture_name.jpg'},
+        textures[100].obj_id: {'filename': 'x.jpg', 'anisotropic_degree': 8},
+        textures[-1].obj_id: {'minfilter': 1, 'simple_ram_image': bytes(16 * 16 * 4)}
+    }
+
+    for texture in textures:
+        if texture.obj_id in edits:
+            texture.__dict__.update(edits[texture.obj_id])
+            texture.dirty = True
+
+    changes = bam.get_changes()
+    tempFilename, spans = bam.write_temp_file(filename, changes)
+    bam.release()
+    os.replace(tempFilename, filename)
+
+    with open(filename, 'rb') as f:
+        bam.remap(f, spans)
+
+    # Remapped spans point at exactly the bytes that were written
+    for obj_id, obj in bam.objects.items():
+        assert bytes(obj['data']) == changes.get(obj_id, original[obj_id])
+
+    reloaded = Batch.loadBamFile(filename)
+
+    for texture in Batch.getTextures(reloaded):
+        data = bytes(reloaded.objects[texture.obj_id]['data'])
+
+        if texture.obj_id in edits:
+            for field, value in edits[texture.obj_id].items():
+                current = getattr(texture, field)
+                assert (bytes(current) if isinstance(value, bytes) else current) == value
+        else:
+            assert data == original[texture.obj_id]
+
+    # Saving again without edits writes the same bytes
+    before = hashFile(filename)
+
+    for texture in Batch.getTextures(reloaded):
+        texture.dirty = True
+
+    Batch.saveBamFile(reloaded, filename)
+    assert hashFile(filename) == before
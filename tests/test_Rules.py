@@ -0,0 +1,56 @@
+from bamtex.Rules import Rule, RuleSet, applyRules
+from bamtex.Verify import hashFile
+import pytest
+
+"""
+  Rule matching, and round trips of rules applied to files in place.
+"""
+
+RULES = [
+    {'name': 'filters', 'match': {'name': 'tex1*'}, 'set': {'minfilter': 'Linear', 'anisotropic_degree': 4}},
+    {'name': 'lod', 'match': {'filename': '*maps/*'}, 'set': {'min_lod': 3, 'border_color': '#ff00ff00'}}
+]
+
+@pytest.mark.parametrize('version', [(6, 14), (6, 45)], ids=lambda version: '%d.%d' % version)
+def testApplyRulesIsIdempotent(syntheticFile, copyFile, version):
+    filename = copyFile(syntheticFile(200, version))
+    ruleSet = RuleSet([Rule(i, rule) for i, rule in enumerate(RULES)])
+
+    result = applyRules(filename, ruleSet, False)
+    assert result['error'] is None
+    assert result['changed'] > 0
+    assert result['skipped'] == (set() if version >= (6, 36) else {'min_lod'})
+
+    after = hashFile(filename)
+    result = applyRules(filename, ruleSet, False)
+    assert result['error'] is None
+    assert result['changed'] == 0
+    assert hashFile(filename) == after
+
+def getMatches(rules, field, texts):
+    ruleSet = RuleSet([Rule(i, {'match': {field: pattern}, 'set': {'min_lod': 0}}) for i, pattern in enumerate(rules)])
+    return ruleSet, [ruleSet.getStringMask(field, text) for text in texts]
+
+def testMergedPatterns():
+    ruleSet, masks = getMatches(['tex1*', 're:ex[23]$', '*_3'], 'name', ['tex1', 'tex2', 'tex_3', 'other'])
+    assert ruleSet.matchers['name'][0] is not None
+    assert masks == [0b001, 0b010, 0b100, 0]
+
+@pytest.mark.parametrize('pattern, texts, expected', [
+    # Inline flags are only allowed at the start of a regex
+    ('re:(?i)GROUND', ['ground_01', 'Ground', 'sky'], [True, True, False]),
+    # Numbered backreferences refer to the pattern's own groups
+    (r're:(\d)\1', ['tex11', 'tex12', '22'], [True, False, True])
+])
+def testUnmergeablePatterns(pattern, texts, expected):
+    ruleSet, masks = getMatches(['tex1*', pattern], 'name', texts)
+    assert ruleSet.matchers['name'][0] is None
+    assert [bool(mask & 0b10) for mask in masks] == expected
+    assert [bool(mask & 0b01) for mask in masks] == [text.startswith('tex1') for text in texts]
+
+def testInvalidRegexNamesRule():
+    with pytest.raises(ValueError, match='^ground: Invalid regex'):
+        Rule(0, {'name': 'ground', 'match': {'name': 're:ground(?i)'}, 'set': {'min_lod': 0}})
+
+    with pytest.raises(ValueError, match='^rule 2: Invalid regex'):
+        Rule(1, {'match': {'filename': 're:(maps'}, 'set': {'min_lod': 0}})
@@ -0,0 +1,110 @@
+from bamtex.Server import INVALID_PARAMS, METHOD_NOT_FOUND, PARSE_ERROR, RpcError, Server
+from bamtex import Batch
+import asyncio, json, pytest
+
+"""
+  The JSON-RPC server, called directly on an event loop: per-file locks, edits
+  that stay in memory until saved, and fields a file can not store.
+"""
+
+def call(server, method, **params):
+    return asyncio.run(server.methods[method](params))
+
+def testLockSerializesRequests():
+    server = Server()
+    events = []
+
+    async def hold(name):
+        async with server.lockFile('a.bam'):
+            events.append(f'{name} start')
+            await asyncio.sleep(0.01)
+            events.append(f'{name} end {server.locks["a.bam"][1]}')
+
+    async def main():
+        await asyncio.gather(hold('first'), hold('second'))
+
+    asyncio.run(main())
+    # The second request waits on the lock, and is counted meanwhile
+    assert events == ['first start', 'first end 2', 'second start', 'second end 1']
+
+    # Nobody uses the lock of a file that is not open
+    assert server.locks == {}
+
+def testSetFieldsAndSave(syntheticFile, copyFile):
+    filename = copyFile(syntheticFile(20))
+    server = Server()
+    textures = call(server, 'list-textures', file=filename, fields=['anisotropic_degree'])
+    obj_ids = [texture['obj_id'] for texture in textures[:3]]
+
+    assert call(server, 'set-fields', file=filename, obj_ids=obj_ids, values={'anisotropic_degree': 16, 'magfilter': 'Nearest'}) == {'changed': 3}
+    assert call(server, 'get-fields', file=filename, obj_id=obj_ids[0], fields=['anisotropic_degree', 'magfilter']) == {'anisotropic_degree': 16, 'magfilter': 'Nearest'}
+
+    # Resending the same values changes nothing
+    assert call(server, 'set-fields', file=filename, obj_ids=obj_ids, values={'anisotropic_degree': 16}) == {'changed': 0}
+
+    stats = call(server, 'stats')
+    assert (stats['files'], stats['locks'], stats['dirty']) == (1, 1, [filename])
+
+    with pytest.raises(RpcError, match='unsaved changes'):
+        call(server, 'close', file=filename)
+
+    assert call(server, 'save', file=filename) == {'saved': True}
+    assert call(server, 'save', file=filename) == {'saved': False}
+    assert call(server, 'stats')['dirty'] == []
+
+    saved = {texture.obj_id: texture for texture in Batch.getTextures(Batch.loadBamFile(filename))}
+    assert [saved[obj_id].anisotropic_degree for obj_id in obj_ids] == [16] * 3
+    assert call(server, 'close', file=filename) == {'closed': True}
+    assert call(server, 'stats')['locks'] == 0
+
+@pytest.mark.parametrize('version, values', [
+    ((6, 14), {'min_lod': 2}),
+    ((6, 45), {'clear_color': '#ff00ff00'})
+], ids=['old-version', 'guarded'])
+def testSetFieldsRejectsFieldsNotStored(syntheticFile, copyFile, version, values):
+    filename = copyFile(syntheticFile(20, version))
+    server = Server()
+    obj_ids = [texture['obj_id'] for texture in call(server, 'list-textures', file=filename)]
+
+    with pytest.raises(RpcError, match='is not stored by texture') as info:
+        call(server, 'set-fields', file=filename, obj_ids=obj_ids, values=dict(values, anisotropic_degree=16))
+
+    # Nothing was assigned, not even the fields that are stored
+    assert info.value.code == INVALID_PARAMS
+    assert call(server, 'stats')['dirty'] == []
+
+def testSetFieldsStoresGuardedFieldsWithTheirGuard(syntheticFile, copyFile):
+    filename = copyFile(syntheticFile(20))
+    server = Server()
+    obj_id = call(server, 'list-textures', file=filename)[0]['obj_id']
+
+    assert call(server, 'set-fields', file=filename, obj_id=obj_id, values={'has_clear_color': True, 'clear_color': '#ff00ff00'}) == {'changed': 1}
+    assert call(server, 'get-fields', file=filename, obj_id=obj_id, fields=['clear_color']) == {'clear_color': '#ff00ff00'}
+
+def testLocksDroppedOnEviction(syntheticFile, copyFile):
+    first, second = copyFile(syntheticFile(20)), copyFile(syntheticFile(20, (6, 14)))
+    server = Server(1)
+
+    call(server, 'list-textures', file=first)
+    assert list(server.locks) == [first]
+
+    # Only the most recently used file fits
+    call(server, 'list-textures', file=second)
+    assert list(server.locks) == [second]
+    assert list(server.workspace.entries) == [second]
+
+    # Files with unsaved changes stay open, and so do their locks
+    obj_id = call(server, 'list-textures', file=first)[0]['obj_id']
+    call(server, 'set-fields', file=first, obj_id=obj_id, values={'anisotropic_degree': 16})
+    call(server, 'list-textures', file=second)
+    assert sorted(server.locks) == sorted([first, second])
+    assert call(server, 'stats')['dirty'] == [first]
+
+def testHandleLine():
+    server = Server()
+    assert asyncio.run(server.handleLine(b'{'))['error']['code'] == PARSE_ERROR
+    assert asyncio.run(server.handleLine(b'{"jsonrpc": "2.0", "id": 1, "method": "nope"}'))['error']['code'] == METHOD_NOT_FOUND
+
+    batch = [{'jsonrpc': '2.0', 'id': 1, 'method': 'stats'}, {'jsonrpc': '2.0', 'method': 'stats'}]
+    responses = asyncio.run(server.handleLine(json.dumps(batch).encode('utf-8')))
+    assert [(response['id'], response['result']['files']) for response in responses] == [(1, 0)]
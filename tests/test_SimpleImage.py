@@ -0,0 +1,88 @@
+from bamtex import Batch, SimpleImage
+import os, pytest
+
+"""
+  Regenerating simple RAM images from image files: box filtering, Panda's
+  bottom-up BGRA layout, and the staleness check.
+"""
+
+numpy = pytest.importorskip('numpy')
+
+def writeImage(filename, width, height):
+    # Red on top, blue at the bottom
+    from panda3d.core import PNMImage
+
+    image = PNMImage(width, height, 3)
+
+    for y in range(height):
+        for x in range(width):
+            image.setXel(x, y, (1, 0, 0) if y < height // 2 else (0, 0, 1))
+
+    assert image.write(filename)
+
+def testBoxFilter():
+    pixels = numpy.arange(4 * 4 * 4, dtype=numpy.uint8).reshape(4, 4, 4)
+    filtered = SimpleImage.boxFilter(pixels, 2, 2)
+
+    assert filtered.shape == (2, 2, 4)
+    assert filtered[0, 0].tolist() == pixels[:2, :2].reshape(-1, 4).mean(axis=0).round().astype(int).tolist()
+
+    # Smaller images are repeated up to the destination
+    assert SimpleImage.boxFilter(pixels[:1, :1], 3, 3).tolist() == [[pixels[0, 0].tolist()] * 3] * 3
+
+def testToBgra():
+    luminanceAlpha = numpy.array([[[10, 20]]], dtype=numpy.uint8)
+    assert SimpleImage.toBgra(luminanceAlpha).tolist() == [[[10, 10, 10, 20]]]
+    assert SimpleImage.toBgra(numpy.array([[[1, 2, 3]]], dtype=numpy.uint8)).tolist() == [[[1, 2, 3, 255]]]
+
+def makeFile(syntheticFile, copyFile, tmp_path):
+    """
+    Returns a file of four textures that all name one 48x24 image file.
+    """
+    filename = copyFile(syntheticFile(4))
+    maps = tmp_path / 'maps'
+    maps.mkdir()
+    bam = Batch.loadBamFile(filename)
+
+    # Not a power of two, which Panda would otherwise rescale
+    writeImage(str(maps / 'texture.png'), 48, 24)
+    os.utime(maps / 'texture.png', (1600000000, 1600000000))
+
+    for texture in Batch.getTextures(bam):
+        texture.filename = 'maps/texture.png'
+        texture.alpha_filename = ''
+        texture.dirty = True
+
+    Batch.saveBamFile(bam, filename)
+    return filename
+
+def testRegenerateFromImageFiles(syntheticFile, copyFile, tmp_path):
+    filename = makeFile(syntheticFile, copyFile, tmp_path)
+
+    result = SimpleImage.regenerateFile(filename, [], 16, 'file', True)
+    assert result['error'] is None
+    assert result['changed'] == 4
+
+    for texture in Batch.getTextures(Batch.loadBamFile(filename)):
+        pixels = numpy.frombuffer(texture.simple_ram_image, numpy.uint8).reshape(16, 16, 4)
+
+        # Bottom row first, in BGRA
+        assert (pixels[:8] == [255, 0, 0, 255]).all()
+        assert (pixels[8:] == [0, 0, 255, 255]).all()
+
+    # Up to date now, unless forced
+    result = SimpleImage.regenerateFile(filename, [], 16, 'file', False)
+    assert result['changed'] == 0
+    assert result['skipped'] == {'up to date': 4}
+
+def testImageLoadingIsConfiguredOnce(syntheticFile, copyFile, tmp_path):
+    from panda3d.core import ConfigPageManager
+
+    filename = makeFile(syntheticFile, copyFile, tmp_path)
+    SimpleImage.regenerateFile(filename, [], 16, 'file', True)
+    pages = ConfigPageManager.getGlobalPtr().getNumExplicitPages()
+
+    for _ in range(3):
+        assert SimpleImage.regenerateFile(filename, [], 16, 'file', True)['changed'] == 4
+
+    assert ConfigPageManager.getGlobalPtr().getNumExplicitPages() == pages
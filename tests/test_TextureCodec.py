@@ -0,0 +1,59 @@
+from p3bamboo.StructDatagram import StructDatagramIterator
+from bamtex.CodecBenchmark import VERSIONS, legacyLoad, makeDatagram
+from bamtex.OptionGlobals import *
+from bamtex.Texture import Texture
+from bamtex.TextureRecord import toTuple
+from bamtex import Batch, Globals
+import pytest
+
+"""
+  The precompiled Texture codec decodes what the reference loader decodes, and
+  re-encodes every datagram byte for byte.
+"""
+
+def getFields(texture):
+    values = {}
+
+    for _, options in Globals.TextureFields:
+        for option in options:
+            value = getattr(texture, option.field)
+
+            if option.field_type == COLOR:
+                value = toTuple(value)
+            elif option.field_type == BLOB:
+                value = bytes(value)
+
+            values[option.field] = value
+
+    return values
+
+def decode(bam, version, data, load):
+    texture = Texture(bam, version)
+    load(texture, StructDatagramIterator(bytes(data)))
+    return texture
+
+@pytest.mark.parametrize('version', VERSIONS, ids=lambda version: '%d.%d' % version)
+def testCodecMatchesReference(syntheticFile, version):
+    bam = Batch.loadBamFile(syntheticFile(40, version))
+
+    for obj_id, obj in bam.objects.items():
+        expected = decode(bam, version, obj['data'], legacyLoad)
+        assert getFields(bam.object_map[obj_id]) == getFields(expected)
+
+@pytest.mark.parametrize('version', VERSIONS, ids=lambda version: '%d.%d' % version)
+def testCodecRoundTrip(syntheticFile, version):
+    bam = Batch.loadBamFile(syntheticFile(40, version, dataSize=64))
+
+    for texture in Batch.getTextures(bam):
+        assert texture.to_binary(version) == bytes(bam.objects[texture.obj_id]['data'])
+
+    # Clear colors and every optional run set at once
+    bam, data = makeDatagram(version)
+    assert decode(bam, version, data, Texture.load).to_binary(version) == data
+
+def testCodecRoundTripDoubles(syntheticFile):
+    bam = Batch.loadBamFile(syntheticFile(40, (6, 45), stdfloatDouble=True))
+    assert bam.stdfloat_double
+
+    for texture in Batch.getTextures(bam):
+        assert texture.to_binary(bam.version) == bytes(bam.objects[texture.obj_id]['data'])
@@ -0,0 +1,94 @@
+from bamtex.TextureDiff import diffFiles, run
+from bamtex import Batch
+import argparse, os, shutil
+
+"""
+  Differences between two BAM files: changed fields, added and removed
+  textures, and files written with different bam versions.
+"""
+
+def getName(field):
+    return Batch.findOption(field).getName()
+
+def editFile(filename, index, values):
+    bam = Batch.loadBamFile(filename)
+    texture = Batch.getTextures(bam)[index]
+    Batch.assignFields(texture, values)
+    Batch.saveBamFile(bam, filename)
+    return texture
+
+def testIdenticalFiles(syntheticFile, copyFile):
+    filename = syntheticFile(20)
+    result = diffFiles(('a.bam', filename, copyFile(filename)))
+
+    assert result['error'] is None
+    assert result['identical_file']
+    assert (result['changed'], result['added'], result['removed']) == ([], [], [])
+
+def testChangedFields(syntheticFile, copyFile):
+    filename = copyFile(syntheticFile(20))
+    texture = editFile(filename, 4, {'anisotropic_degree': 100, 'min_lod': 3.5})
+    result = diffFiles(('a.bam', syntheticFile(20), filename))
+
+    assert result['error'] is None
+    assert not result['identical_file']
+    assert (result['textures'], result['identical']) == (20, 19)
+
+    (label, obj_id, differences), = result['changed']
+    assert (label, obj_id) == (texture.filename, texture.obj_id)
+    assert [field for field, _, _ in differences] == [getName('anisotropic_degree'), getName('min_lod')]
+    assert differences[0][2] == '100'
+
+def testRenamedTextureIsMatchedByFilename(syntheticFile, copyFile):
+    filename = copyFile(syntheticFile(20))
+    editFile(filename, 2, {'name': 'renamed'})
+    result = diffFiles(('a.bam', syntheticFile(20), filename))
+
+    assert result['error'] is None
+    assert (result['added'], result['removed']) == ([], [])
+    (label, _, differences), = result['changed']
+    assert label == 'phase_2/maps/texture_2.jpg'
+    assert differences == [(getName('name'), 'tex2', 'renamed')]
+
+def testAddedAndRemovedTextures(syntheticFile):
+    # The first 20 textures of both files are the same
+    old, new = syntheticFile(20), syntheticFile(25)
+    result = diffFiles(('a.bam', old, new))
+
+    assert result['error'] is None
+    assert (result['textures'], result['identical'], result['changed']) == (20, 20, [])
+    assert [label for label, _ in result['added']] == [f'phase_{i % 14}/maps/texture_{i}.jpg' for i in range(20, 25)]
+    assert result['removed'] == []
+
+    result = diffFiles(('a.bam', new, old))
+    assert result['added'] == []
+    assert result['removed'] == [f'phase_{i % 14}/maps/texture_{i}.jpg' for i in range(20, 25)]
+
+def testVersionDifference(syntheticFile):
+    # Fields both versions store are decoded and compared, rather than their bytes
+    result = diffFiles(('a.bam', syntheticFile(20, (6, 14)), syntheticFile(20)))
+
+    assert result['error'] is None
+    assert result['versions'] == ('6.14', '6.45')
+    assert (result['textures'], result['identical'], result['changed']) == (20, 20, [])
+
+def testRunDirectories(syntheticFile, tmp_path, capsys):
+    old, new = tmp_path / 'old', tmp_path / 'new'
+
+    for directory in (old, new):
+        os.makedirs(directory / 'phase_3')
+        shutil.copy(syntheticFile(20), directory / 'phase_3' / 'same.bam')
+
+    shutil.copy(syntheticFile(20), old / 'phase_3' / 'changed.bam')
+    shutil.copy(syntheticFile(20), new / 'phase_3' / 'changed.bam')
+    shutil.copy(syntheticFile(20), new / 'added.bam')
+    editFile(str(new / 'phase_3' / 'changed.bam'), 0, {'min_lod': 2})
+
+    assert run(argparse.Namespace(old=str(old), new=str(new), jobs=1)) == 1
+    out = capsys.readouterr().out
+    assert '+ added.bam (20 textures)' in out
+    assert os.path.join('phase_3', 'changed.bam') + '\n  ~ phase_0/maps/texture_0.jpg\n' in out
+    assert 'same.bam' not in out
+    assert '3 files compared, 1 byte for byte identical; textures: 19 identical, 1 changed, 20 added, 0 removed' in out
+
+    assert run(argparse.Namespace(old=str(old), new=str(old), jobs=1)) == 0
@@ -0,0 +1,85 @@
+from argparse import Namespace
+from bamtex.TextureExport import runExport, runImport
+from bamtex.Verify import hashFile
+from bamtex import Batch
+import csv, json, pytest, shutil
+
+"""
+  Exporting texture fields and importing edited exports back, in both formats.
+"""
+
+def export(paths, output):
+    return runExport(Namespace(paths=paths, output=output, format=None, jobs=1))
+
+def apply(filename, dryRun=False):
+    return runImport(Namespace(input=filename, format=None, dry_run=dryRun, jobs=1))
+
+@pytest.mark.parametrize('fileFormat', ['jsonl', 'csv'])
+def testExportImportRoundTrip(syntheticFile, copyFile, tmp_path, fileFormat):
+    filename = copyFile(syntheticFile(20))
+    output = str(tmp_path / f'textures.{fileFormat}')
+    before = hashFile(filename)
+
+    assert export([filename], output) == 0
+
+    # Importing an unedited export changes nothing
+    assert apply(output) == 0
+    assert hashFile(filename) == before
+
+    with open(output, newline='') as f:
+        if fileFormat == 'csv':
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f]
+
+    assert len(rows) == 20
+    rows[4]['minfilter'] = 'Mipmap Trilinear'
+    rows[7]['filename'] = 'phase_3/maps/renamed.jpg'
+    rows[7]['min_lod'] = 0.25
+
+    with open(output, 'w', newline='') as f:
+        if fileFormat == 'csv':
+            writer = csv.DictWriter(f, rows[0].keys())
+            writer.writeheader()
+            writer.writerows(rows)
+        else:
+            f.writelines(json.dumps(row) + '\n' for row in rows)
+
+    assert apply(output, dryRun=True) == 0
+    assert hashFile(filename) == before
+
+    assert apply(output) == 0
+    textures = {texture.obj_id: texture for texture in Batch.getTextures(Batch.loadBamFile(filename))}
+    assert textures[int(rows[4]['obj_id'])].minfilter == 6
+    assert textures[int(rows[7]['obj_id'])].filename == 'phase_3/maps/renamed.jpg'
+    assert textures[int(rows[7]['obj_id'])].min_lod == 0.25
+
+    # And applying it again changes nothing more
+    after = hashFile(filename)
+    assert apply(output) == 0
+    assert hashFile(filename) == after
+
+def testFailuresGoToStandardError(syntheticFile, tmp_path, capsys):
+    good = str(shutil.copy(syntheticFile(20), tmp_path / 'good.bam'))
+    broken = str(shutil.copy(syntheticFile(20), tmp_path / 'broken.bam'))
+    output = str(tmp_path / 'textures.jsonl')
+    assert export([good, broken], output) == 0
+
+    with open(broken, 'r+b') as f:
+        f.truncate(100)
+
+    capsys.readouterr()
+    assert export([good, broken], '-') == 1
+    out, err = capsys.readouterr()
+    assert len(out.splitlines()) == 20
+    assert 'broken.bam: FAILED' in err
+
+    # Rows of textures that no longer exist, and of a file that can not be read
+    with open(output, 'a') as f:
+        f.write(json.dumps({'file': good, 'obj_id': 12345, 'minfilter': 'Linear'}) + '\n')
+
+    assert apply(output) == 1
+    out, err = capsys.readouterr()
+    assert 'FAILED' not in out
+    assert 'broken.bam: FAILED' in err
+    assert 'good.bam: 0 textures changed' in err and '1 textures not found' in err
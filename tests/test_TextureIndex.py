@@ -0,0 +1,75 @@
+from bamtex.TextureIndex import TextureIndex
+from bamtex import Batch
+import os, pytest, shutil
+
+"""
+  The SQLite texture index: searches, incremental updates, and the search
+  dialog that keeps it open.
+"""
+
+@pytest.fixture
+def indexedTree(syntheticFile, tmp_path):
+    tree = tmp_path / 'tree'
+    tree.mkdir()
+
+    for i, count in enumerate((30, 20)):
+        shutil.copy(syntheticFile(count), tree / f'file{i}.bam')
+
+    index = TextureIndex(str(tmp_path / 'textures.db'))
+    yield str(tree), index
+    index.close()
+
+def testIndexSearch(indexedTree):
+    tree, index = indexedTree
+    assert index.update([tree], 1) == (2, 0, [])
+
+    results = index.search('texture_7.jpg').fetchall()
+    assert [(os.path.basename(path), name) for path, _, name, _ in results] == [('file0.bam', 'tex7'), ('file1.bam', 'tex7')]
+
+    # Only the 30 texture file has a texture 25
+    assert len(index.search('tex25').fetchall()) == 1
+    assert len(index.search('filename=phase_3/maps/*').fetchall()) == 4
+    assert len(index.search('tex_format=RGBA num_components=4', 5).fetchall()) == 5
+    assert index.search('100%').fetchall() == []
+
+def testIndexUpdatesOnlyChangedFiles(indexedTree, syntheticFile):
+    tree, index = indexedTree
+    index.update([tree], 1)
+    assert index.update([tree], 1) == (0, 0, [])
+
+    shutil.copy(syntheticFile(40), os.path.join(tree, 'file1.bam'))
+    os.remove(os.path.join(tree, 'file0.bam'))
+    assert index.update([tree], 1) == (1, 1, [])
+    assert len(index.query({}).fetchall()) == 40
+
+def testIndexKeepsRowsOfBrokenFiles(indexedTree):
+    tree, index = indexedTree
+    index.update([tree], 1)
+
+    with open(os.path.join(tree, 'file1.bam'), 'r+b') as f:
+        f.truncate(100)
+
+    parsed, removed, failed = index.update([tree], 1)
+    assert (parsed, removed) == (0, 0)
+    assert [result['filename'] for result in failed] == [os.path.join(tree, 'file1.bam')]
+    assert len(index.query({}).fetchall()) == 50
+
+def testSearchDialogReopensItsIndex(indexedTree):
+    from PyQt5.QtWidgets import QApplication
+    from bamtex.IndexSearchDialog import IndexSearchDialog
+
+    app = QApplication.instance() or QApplication([])
+    tree, index = indexedTree
+    index.update([tree], 1)
+    filename = index.connection.execute('PRAGMA database_list').fetchone()[2]
+
+    dialog = IndexSearchDialog(None, lambda path: None)
+    dialog.openDatabase(filename)
+
+    for _ in range(2):
+        dialog.show()
+        dialog.searchEdit.setText('tex1')
+        assert dialog.resultList.count() == 22
+        dialog.close()
+        dialog.searchEdit.clear()
+        app.processEvents()
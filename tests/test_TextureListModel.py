@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+from bamtex.TextureListModel import TextureListModel, buildTrigrams
+import pytest
+
+"""
+  Filtering the texture list through its trigram index must find exactly the
+  rows a plain substring scan finds, however the filter text is typed.
+"""
+
+def makeTextures(count):
+    return [SimpleNamespace(filename=f'phase_{i % 14}/maps/Texture_{i}.jpg' if i % 5 else '', name=f'tex{i}') for i in range(count)]
+
+def scan(textures, text):
+    text = text.lower()
+    return [i for i, texture in enumerate(textures) if text in f'{texture.filename}\n{texture.name}'.lower()]
+
+def testBuildTrigrams():
+    trigrams = buildTrigrams(['abcd', 'bcd', 'xabc'])
+    assert trigrams['abc'] == [0, 2]
+    assert trigrams['bcd'] == [0, 1]
+    assert 'cdx' not in trigrams
+
+@pytest.mark.parametrize('indexed', [True, False], ids=['indexed', 'scanning'])
+def testFilterMatchesSubstringScan(indexed):
+    textures = makeTextures(500)
+    model = TextureListModel(textures)
+
+    if not indexed:
+        # As while a large list still builds its index in the background
+        model.trigrams = None
+
+    # Narrowing, widening, case changes and texts spanning filename and name
+    for text in ['t', 'te', 'tex', 'tex1', 'tex12', 'tex1', 'MAPS/TEX', 'phase_3/', 'ure_42', 'jpg\ntex4', '', 'nothing', 'e']:
+        model.setFilter(text)
+        assert list(model.rows) == scan(textures, text)
+        assert model.rowCount() == len(model.rows)
+
+def testFilteredRowsMapToTextures():
+    textures = makeTextures(100)
+    model = TextureListModel(textures)
+
+    model.setFilter('texture_13.')
+    assert [model.textureAt(row).name for row in range(model.rowCount())] == ['tex13']
+    assert model.data(model.index(0)) == 'phase_13/maps/Texture_13.jpg'
+
+    # Textures without a filename are listed by name
+    model.setFilter('tex10\n')
+    assert model.rowCount() == 0
+    model.setFilter('\ntex10')
+    assert [model.data(model.index(row)) for row in range(model.rowCount())] == ['tex10']
@@ -0,0 +1,31 @@
+from bamtex.TextureRecord import FIELDS, readRecords
+from bamtex import Batch
+
+"""
+  Records hold the fields of the textures they are read from, without their
+  payloads, and write back only what was changed on them.
+"""
+
+def testRecordsMatchTextures(syntheticFile):
+    filename = syntheticFile(50, dataSize=64)
+    records = readRecords(filename)
+    textures = Batch.getTextures(Batch.loadBamFile(filename))
+    assert len(records) == len(textures)
+
+    for record, texture in zip(records, textures):
+        assert record.path == filename
+        assert (record.simple_ram_image_size, record.texture_data_size) == (16 * 16 * 4, 64)
+        assert all(getattr(record, field) == getattr(texture, field) for field in FIELDS)
+
+def testRecordsApplyOnlyChanges(syntheticFile):
+    filename = syntheticFile(50)
+    records = readRecords(filename)
+    textures = Batch.getTextures(Batch.loadBamFile(filename))
+
+    assert not any(record.applyTo(texture) for record, texture in zip(records, textures))
+    assert not any(texture.dirty for texture in textures)
+
+    records[3].border_color = (1.0, 0.0, 0.0, 1.0)
+    assert records[3].applyTo(textures[3])
+    assert textures[3].dirty
+    assert tuple(textures[3].border_color) == (1.0, 0.0, 0.0, 1.0)
@@ -0,0 +1,74 @@
+from bamtex.Verify import hashFile
+from bamtex import Batch
+import os, pytest, shutil
+
+"""
+  The columnar texture table: expressions over columns, counts, and bulk
+  assignments written back only to the files holding affected rows.
+"""
+
+numpy = pytest.importorskip('numpy')
+
+from bamtex.TextureTable import TextureTable
+
+@pytest.fixture
+def tree(syntheticFile, tmp_path):
+    for name, count, version in [('a.bam', 30, (6, 45)), ('b.bam', 20, (6, 45)), ('old.bam', 10, (6, 14))]:
+        shutil.copy(syntheticFile(count, version), tmp_path / name)
+
+    return str(tmp_path)
+
+def getColumn(table, field):
+    # Files load in whichever order the workers finish
+    return {(table.files[row['file']], int(row['obj_id'])): row[field] for row in table.rows}
+
+def testWhereAndCount(tree):
+    table = TextureTable.load([tree], 1)
+    assert len(table) == 60
+    assert table.failed == []
+
+    mask = table.where('(num_components == 4) & (anisotropic_degree >= 0)')
+    assert numpy.count_nonzero(mask) == 10 + 7 + 4
+    assert dict(table.countBy('num_components')) == {3: 39, 4: 21}
+
+    with pytest.raises(ValueError):
+        table.where('no_such_column > 1')
+
+def testAssignOnlyRewritesAffectedFiles(tree):
+    table = TextureTable.load([tree], 1)
+    hashes = {filename: hashFile(filename) for filename in table.files}
+
+    mask = numpy.array([name.startswith('tex2') for name in table.rows['name']]) & (table.rows['file'] == table.files.index(os.path.join(tree, 'a.bam')))
+    pending = numpy.count_nonzero(mask & (table.rows['anisotropic_degree'] != 16))
+    assert 0 < pending <= 11
+
+    results = list(table.assign(mask, Batch.parseAssignments(['anisotropic_degree=16']), 1))
+    assert [(os.path.basename(result['filename']), result['changed']) for result in results] == [('a.bam', pending)]
+
+    for filename, digest in hashes.items():
+        assert (hashFile(filename) != digest) == filename.endswith('a.bam')
+
+    # The table and the files agree
+    reloaded = TextureTable.load([tree], 1)
+    assert getColumn(reloaded, 'anisotropic_degree') == getColumn(table, 'anisotropic_degree')
+    assert list(table.assign(mask, Batch.parseAssignments(['anisotropic_degree=16']), 1)) == []
+
+def testAssignSkipsFieldsOlderFilesLack(tree):
+    table = TextureTable.load([tree], 1)
+    values = Batch.parseAssignments(['min_lod=2'])
+    mask = table.where('True')
+    old = table.rows['file'] == table.files.index(os.path.join(tree, 'old.bam'))
+    before = hashFile(os.path.join(tree, 'old.bam'))
+
+    assert numpy.array_equal(table.getStoredMask('min_lod'), ~old)
+    assert sorted(os.path.basename(result['filename']) for result in table.assign(mask, values, 1)) == ['a.bam', 'b.bam']
+    assert hashFile(os.path.join(tree, 'old.bam')) == before
+    assert (table.rows['min_lod'][old] == -1000).all()
+
+def testBrokenFilesAreReported(tree):
+    with open(os.path.join(tree, 'b.bam'), 'r+b') as f:
+        f.truncate(100)
+
+    table = TextureTable.load([tree], 1)
+    assert len(table) == 40
+    assert [os.path.basename(result['filename']) for result in table.failed] == ['b.bam']
@@ -0,0 +1,87 @@
+from types import SimpleNamespace
+from bamtex.ThumbnailCache import THUMBNAIL_SIZE, ThumbnailCache, decodeSimpleImage
+import pytest, time
+
+"""
+  Decoding simple RAM images, and the thumbnail cache that decodes them on
+  a background thread.
+"""
+
+@pytest.fixture(scope='module')
+def app():
+    from PyQt5.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
+@pytest.fixture
+def cache(app):
+    cache = ThumbnailCache()
+    yield cache
+    cache.stop()
+
+def makeTexture(obj_id, size, fill):
+    return SimpleNamespace(obj_id=obj_id, has_simple_ram_image=True, simple_x_size=size, simple_y_size=size, simple_ram_image=bytes(fill) * (size * size))
+
+def waitFor(app, function):
+    deadline = time.monotonic() + 5
+
+    while time.monotonic() < deadline:
+        app.processEvents()
+        value = function()
+
+        if value is not None:
+            return value
+
+        time.sleep(0.001)
+
+    raise AssertionError('Timed out waiting for a thumbnail.')
+
+def testDecodeSimpleImage(app):
+    # Two rows of BGRA pixels, the bottom one first
+    data = bytes([0, 0, 255, 255] * 2 + [255, 0, 0, 128] * 2)
+    image = decodeSimpleImage(data, 2, 2)
+
+    assert (image.width(), image.height()) == (2, 2)
+    assert image.pixel(0, 0) == 0x80_0000ff
+    assert image.pixel(1, 1) == 0xff_ff0000
+    assert decodeSimpleImage(data[:-1], 2, 2) is None
+    assert decodeSimpleImage(data, 0, 2) is None
+
+def testThumbnailsAreDecodedInTheBackground(app, cache):
+    texture = makeTexture(1, 64, [10, 20, 30, 255])
+    ready = []
+    cache.ready.connect(ready.append)
+
+    assert cache.getThumbnail(texture) is None
+    thumbnail = waitFor(app, lambda: cache.getThumbnail(texture))
+    assert ready == [1]
+    assert (thumbnail.width(), thumbnail.height()) == (THUMBNAIL_SIZE, THUMBNAIL_SIZE)
+    assert cache.getImage(texture).pixel(5, 5) == 0xff_1e140a
+
+    # New contents under the same object id are decoded again
+    texture.simple_ram_image = bytes([30, 20, 10, 255]) * (64 * 64)
+    assert cache.getImage(texture) is None
+    assert waitFor(app, lambda: cache.getImage(texture)).pixel(5, 5) == 0xff_0a141e
+
+def testBrokenImagesAreRemembered(app, cache):
+    texture = makeTexture(1, 8, [0, 0, 0, 0])
+    texture.simple_x_size = 9
+
+    waitFor(app, lambda: cache.getEntry(texture))
+    assert cache.getImage(texture) is None
+    assert cache.getEntry(texture) is not None
+    assert not cache.pending
+
+def testCacheStaysWithinItsBudget(app):
+    # Room for three images and their thumbnails
+    cache = ThumbnailCache(maxBytes=3 * (64 * 64 + THUMBNAIL_SIZE * THUMBNAIL_SIZE) * 4)
+
+    try:
+        textures = [makeTexture(i, 64, [i, i, i, 255]) for i in range(6)]
+
+        for texture in textures:
+            waitFor(app, lambda: cache.getImage(texture))
+
+        assert cache.totalBytes <= cache.maxBytes
+        assert list(cache.entries) == [3, 4, 5]
+    finally:
+        cache.stop()
@@ -0,0 +1,50 @@
+from bamtex.TextureCodec import get_codec
+from bamtex.Verify import findDifference, hashFile, verifyFile
+from bamtex import Batch
+import pytest
+
+"""
+  Verification re-encodes every texture and pins down the field of any byte
+  that does not come back.
+"""
+
+def testFindDifference():
+    assert findDifference(b'abc', b'abc') is None
+    assert findDifference(b'abc', b'abd') == 2
+    assert findDifference(b'abc', b'abcd') == 3
+
+@pytest.mark.parametrize('version', [(6, 14), (6, 45)], ids=lambda version: '%d.%d' % version)
+def testVerifyPasses(syntheticFile, version):
+    filename = syntheticFile(100, version, dataSize=64)
+    before = hashFile(filename)
+    result = verifyFile(filename)
+
+    assert result['error'] is None
+    assert result['failures'] == []
+    assert (result['version'], result['textures']) == (version, 100)
+    assert hashFile(filename) == before
+
+def testVerifyFindsTheFieldThatDiffers(syntheticFile, copyFile):
+    filename = copyFile(syntheticFile(20))
+    bam = Batch.loadBamFile(filename)
+    texture = Batch.getTextures(bam)[5]
+    start, _, _ = next(span for span in get_codec(bam.version, bam.stdfloat_double).get_field_spans(texture) if span[2] == 'has_read_mipmaps')
+    offset = bam.objects[texture.obj_id]['span'][1] + start
+    bam.release()
+
+    # Any non-zero byte reads as true, but true is written back as 1
+    with open(filename, 'r+b') as f:
+        f.seek(offset)
+        f.write(b'\x02')
+
+    result = verifyFile(filename)
+    assert result['error'] is None
+    assert [(failure['obj_id'], failure['field'], failure['offset']) for failure in result['failures']] == [(texture.obj_id, 'has_read_mipmaps', start)]
+
+def testVerifyReportsBrokenFiles(syntheticFile, copyFile):
+    filename = copyFile(syntheticFile(20))
+
+    with open(filename, 'r+b') as f:
+        f.truncate(200)
+
+    assert 'Truncated' in verifyFile(filename)['error']
@@ -0,0 +1,81 @@
+from bamtex.Workspace import Workspace, estimateSize
+from bamtex import Batch
+import pytest
+
+"""
+  The LRU of open BAM files: eviction order, and the files that are never evicted.
+"""
+
+@pytest.fixture
+def openFile(syntheticFile):
+    """
+    Returns a function that parses a synthetic file again, as (bam, textures).
+    """
+    filename = syntheticFile(50)
+
+    def load():
+        bam = Batch.loadBamFile(filename)
+        return bam, Batch.getTextures(bam)
+
+    return load
+
+def testEstimateSize(openFile):
+    bam, textures = openFile()
+    assert estimateSize(bam) > len(bam.view) + len(textures) * 1000
+
+def testEvictsLeastRecentlyUsed(openFile):
+    bam, textures = openFile()
+    workspace = Workspace(estimateSize(bam) * 2)
+
+    assert workspace.put('a.bam', bam, textures) == []
+    assert workspace.put('b.bam', *openFile()) == []
+    assert workspace.get('a.bam') == (bam, textures)
+
+    # b is older than a now
+    assert workspace.put('c.bam', *openFile()) == ['b.bam']
+    assert list(workspace.entries) == ['a.bam', 'c.bam']
+    assert workspace.get('b.bam') is None
+    assert workspace.totalBytes == estimateSize(bam) * 2
+
+def testPutRefreshesEntry(openFile):
+    workspace = Workspace()
+    workspace.put('a.bam', *openFile())
+    bam, textures = openFile()
+    workspace.put('a.bam', bam, textures)
+
+    assert len(workspace) == 1
+    assert workspace.get('a.bam') == (bam, textures)
+    assert workspace.totalBytes == estimateSize(bam)
+    assert workspace.remove('a.bam')
+    assert not workspace.remove('a.bam')
+    assert workspace.totalBytes == 0
+
+def testKeepsMostRecentlyUsed(openFile):
+    workspace = Workspace(1)
+
+    # Bigger than the cap alone, but still kept
+    assert workspace.put('a.bam', *openFile()) == []
+    assert 'a.bam' in workspace
+    assert workspace.put('b.bam', *openFile()) == ['a.bam']
+    assert list(workspace.entries) == ['b.bam']
+
+def testKeepsPinnedAndDirtyFiles(openFile):
+    workspace = Workspace(1)
+    workspace.pin('a.bam')
+    workspace.put('a.bam', *openFile())
+
+    bam, textures = openFile()
+    workspace.put('b.bam', bam, textures)
+    textures[0].dirty = True
+    assert bam.is_dirty()
+
+    assert workspace.put('c.bam', *openFile()) == []
+    assert list(workspace.entries) == ['a.bam', 'b.bam', 'c.bam']
+
+    # Unpinned files are evicted right away once they are over the cap
+    workspace.unpin('a.bam')
+    assert list(workspace.entries) == ['b.bam', 'c.bam']
+
+    textures[0].dirty = False
+    assert workspace.evict() == ['b.bam']
+    assert list(workspace.entries) == ['c.bam']
@@ -0,0 +1,85 @@
+from bamtex import Batch, Benchmark
+import os, pytest, tracemalloc
+
+"""
+  pytest-benchmark timings of the stages `python -m bamtex benchmark` measures,
+  through the same operations from bamtex.Benchmark. Results are compared with
+  a local run, never a committed one:
+
+  python -m pytest tests --benchmark-only --benchmark-autosave
+  python -m pytest tests --benchmark-only --benchmark-compare --benchmark-compare-fail=mean:25%
+
+  Every benchmark also records the peak Python memory of one traced run in its
+  extra info, and fails if it grows beyond a per-texture budget.
+"""
+
+pytest.importorskip('pytest_benchmark')
+
+COUNT = 2000
+
+DATA_SIZE = 4096
+
+VERSIONS = [(6, 14), (6, 45)]
+
+# Peak Python memory per texture, about 1.5 times what was measured. Parsed
+# payloads stay in the map, but saves copy the 5 KB of each texture's payloads.
+PEAK_BUDGETS = {
+    'parse': 5 * 1024,
+    'write': 16 * 1024,
+    'roundtrip': 24 * 1024,
+    'gui': 6 * 1024
+}
+
+def versionId(version):
+    return '%d.%d' % version
+
+def checkPeak(benchmark, stage, function, *args):
+    """
+    Runs function once under tracemalloc, records its peak in the benchmark
+    and checks it against the stage's budget.
+    """
+    tracemalloc.start()
+
+    try:
+        function(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    benchmark.extra_info['peak_bytes'] = peak
+    benchmark.extra_info['peak_bytes_per_texture'] = peak / COUNT
+    assert peak <= PEAK_BUDGETS[stage] * COUNT, f'{stage} peaked at {peak / COUNT:.0f} bytes per texture'
+
+@pytest.fixture(scope='module')
+def benchmarkFile(syntheticFile):
+    def getFile(version):
+        return syntheticFile(COUNT, version, dataSize=DATA_SIZE)
+
+    return getFile
+
+@pytest.mark.parametrize('version', VERSIONS, ids=versionId)
+def testParse(benchmark, benchmarkFile, version):
+    parse = Benchmark.prepareParse(benchmarkFile(version))
+    bam, textures = benchmark(parse)
+    assert len(textures) == COUNT
+    checkPeak(benchmark, 'parse', parse)
+
+@pytest.mark.parametrize('version', VERSIONS, ids=versionId)
+def testWrite(benchmark, benchmarkFile, version):
+    write = Benchmark.prepareWrite(benchmarkFile(version))
+    assert len(benchmark(write).getvalue()) == os.path.getsize(benchmarkFile(version))
+    checkPeak(benchmark, 'write', write)
+
+@pytest.mark.parametrize('version', VERSIONS, ids=versionId)
+def testRoundTrip(benchmark, benchmarkFile, copyFile, version):
+    # Fails unless the written file matches the original byte for byte
+    roundTrip = Benchmark.prepareRoundTrip(copyFile(benchmarkFile(version)))
+    benchmark(roundTrip)
+    checkPeak(benchmark, 'roundtrip', roundTrip)
+
+def testGui(benchmark, benchmarkFile):
+    filename = benchmarkFile(VERSIONS[-1])
+    elapsed, populate = benchmark.pedantic(Benchmark.measureGui, args=(filename,), rounds=5, warmup_rounds=1)
+    benchmark.extra_info['populate_seconds'] = populate
+    assert populate <= elapsed
+    checkPeak(benchmark, 'gui', Benchmark.measureGui, filename)